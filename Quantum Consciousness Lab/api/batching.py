@@ -0,0 +1,97 @@
+import asyncio
+import os
+import numpy as np
+from dotenv import load_dotenv
+from api.executor import thread_pool
+
+load_dotenv()
+DEFAULT_BATCH_SIZE = int(os.getenv("QCL_BATCH_MAX_SIZE", "32"))
+MAX_LATENCY_MS = float(os.getenv("QCL_BATCH_MAX_LATENCY_MS", "5"))
+
+def _parse_sizes(value: str) -> dict:
+    sizes = {}
+    for part in value.split(","):
+        if "=" in part:
+            name, size = part.split("=")
+            sizes[name.strip()] = int(size)
+    return sizes
+
+# Per-model batch sizes, e.g. QCL_BATCH_SIZES="classify_eeg=64,hybrid_classifier=8".
+# The QNN simulates one circuit per row, so its batches are kept smaller.
+BATCH_SIZES = {"hybrid_classifier": 16, **_parse_sizes(os.getenv("QCL_BATCH_SIZES", ""))}
+
+class MicroBatcher:
+    """
+    Groups concurrent single-item predictions into one vectorized call.
+
+    Items are collected until `max_batch_size` are waiting or the oldest has
+    waited `max_latency_ms`, then `batch_fn` runs once on the stacked items in
+    the thread pool and each caller gets its own row of the result.
+    """
+    def __init__(self, name: str, batch_fn, max_batch_size: int = DEFAULT_BATCH_SIZE, max_latency_ms: float = MAX_LATENCY_MS):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_latency_ms = max_latency_ms
+        self.batches = 0
+        self.items = 0
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+
+    async def submit(self, item):
+        """
+        Queues one item (e.g. a feature vector) and waits for its result.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_latency_ms / 1000, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list):
+        self.batches += 1
+        self.items += len(batch)
+        futures = [future for _, future in batch]
+        try:
+            X = np.stack([item for item, _ in batch])
+            results = await asyncio.get_running_loop().run_in_executor(thread_pool(), self.batch_fn, X)
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future, result in zip(futures, results):
+            # callers that disconnected have cancelled their future
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {"batches": self.batches, "items": self.items, "waiting": len(self._pending),
+                "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+                "max_batch_size": self.max_batch_size, "max_latency_ms": self.max_latency_ms}
+
+_batchers = {}
+
+def batcher(name: str, batch_fn) -> MicroBatcher:
+    if name not in _batchers:
+        _batchers[name] = MicroBatcher(name, batch_fn, BATCH_SIZES.get(name, DEFAULT_BATCH_SIZE))
+    return _batchers[name]
+
+def batch_stats() -> dict:
+    return {name: b.stats() for name, b in _batchers.items()}
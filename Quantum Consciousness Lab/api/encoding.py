@@ -0,0 +1,138 @@
+import io
+import numpy as np
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse, Response
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+NPZ = "application/x-npz"
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+# analyze_eeg_band outputs that are full spectra, decompositions or channel x channel matrices.
+SPECTRA = ("fft_frequencies", "fft_power", "wavelet_coeffs", "wavelet_frequencies", "wavelet_scalogram",
+           "scalogram_frequencies", "tensor_factors", "wpli_matrix")
+
+# Decimated responses compute the scalogram instead of the full wavelet cube
+# and return it under the cube's names: feature -> response key.
+SCALOGRAM = {"wavelet_scalogram": "wavelet_coeffs", "scalogram_frequencies": "wavelet_frequencies"}
+
+def spectra_features(features, spectra: str = "full") -> list:
+    """
+    analyze_eeg_band features to compute for a response with full, decimated or summary spectra.
+    """
+    if spectra == "summary":
+        return [f for f in features if f not in SPECTRA]
+    if spectra == "decimated":
+        return [f for f in features if f not in SCALOGRAM.values()]
+    return [f for f in features if f not in SCALOGRAM]
+
+def _block_mean(values: np.ndarray, factor: int, axis: int) -> np.ndarray:
+    axis = axis % values.ndim
+    n = values.shape[axis] // factor * factor
+    trimmed = np.take(values, np.arange(n), axis=axis)
+    shape = trimmed.shape[:axis] + (n // factor, factor) + trimmed.shape[axis + 1:]
+    return trimmed.reshape(shape).mean(axis=axis + 1)
+
+def decimate_spectra(result: dict, factor: int = 8) -> dict:
+    """
+    Shrinks the spectra of an analyze_eeg_band result (computed with as_arrays=True).
+
+    The FFT is cut to non-negative frequencies and block-averaged over `factor`
+    bins; wavelet coefficients become float32 power block-averaged over `factor`
+    samples. A precomputed scalogram (see SCALOGRAM) is passed through under
+    the wavelet names instead.
+    """
+    if factor < 1:
+        raise ValueError("Decimation factor must be at least 1")
+    result = dict(result)
+    if "fft_frequencies" in result and "fft_power" in result:
+        freqs = np.asarray(result["fft_frequencies"])
+        positive = freqs >= 0
+        result["fft_frequencies"] = _block_mean(freqs[positive], factor, axis=0)
+        result["fft_power"] = _block_mean(np.asarray(result["fft_power"])[:, positive], factor, axis=1)
+    if any(feature in result for feature in SCALOGRAM):
+        for feature, name in SCALOGRAM.items():
+            if feature in result:
+                result[name] = result.pop(feature)
+    elif "wavelet_coeffs" in result:
+        power = np.abs(np.asarray(result["wavelet_coeffs"], dtype=np.float32))**2
+        result["wavelet_coeffs"] = _block_mean(power, factor, axis=-1)
+    return result
+
+def flatten(value, prefix: str = ""):
+    """
+    Yields ("/"-joined key, array) for every leaf of a nested result.
+    """
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from flatten(item, f"{prefix}{key}/")
+    elif isinstance(value, (list, tuple)) and any(isinstance(v, (np.ndarray, list, dict)) for v in value):
+        for i, item in enumerate(value):
+            yield from flatten(item, f"{prefix}{i}/")
+    else:
+        yield prefix.rstrip("/"), np.asarray(value)
+
+def _jsonable(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        return {k: _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    return value
+
+def _msgpack_default(value):
+    if isinstance(value, np.ndarray):
+        array = np.ascontiguousarray(value)
+        return {"__ndarray__": True, "dtype": array.dtype.str, "shape": list(array.shape), "data": array.tobytes()}
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Cannot serialize {type(value)}")
+
+def encode_msgpack(result: dict) -> bytes:
+    try:
+        import msgpack
+    except ImportError:
+        raise HTTPException(status_code=406, detail="msgpack responses require the msgpack package")
+    return msgpack.packb(result, default=_msgpack_default, use_bin_type=True)
+
+def encode_npz(result: dict) -> bytes:
+    buffer = io.BytesIO()
+    np.savez(buffer, **dict(flatten(result)))
+    return buffer.getvalue()
+
+def encode_arrow(result: dict) -> bytes:
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise HTTPException(status_code=406, detail="Arrow responses require pyarrow")
+    items = [(key, np.ascontiguousarray(value)) for key, value in flatten(result)]
+    batch = pa.record_batch([
+        pa.array([key for key, _ in items], pa.string()),
+        pa.array([value.dtype.str for _, value in items], pa.string()),
+        pa.array([list(value.shape) for _, value in items], pa.list_(pa.int64())),
+        pa.array([value.tobytes() for _, value in items], pa.binary()),
+    ], names=["key", "dtype", "shape", "data"])
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+def encode_response(result: dict, accept: str = None) -> Response:
+    """
+    Encodes a result with NumPy arrays according to the Accept header.
+
+    msgpack ships arrays as {"__ndarray__", "dtype", "shape", "data"} maps,
+    .npz and Arrow as one typed buffer per "/"-joined key; anything else
+    falls back to JSON. A binary type whose codec is not installed is 406.
+    """
+    accepted = [part.split(";")[0].strip().lower() for part in (accept or "").split(",")]
+    for media_type in accepted:
+        if media_type in MSGPACK_TYPES:
+            return Response(encode_msgpack(result), media_type=media_type)
+        if media_type == NPZ:
+            return Response(encode_npz(result), media_type=NPZ)
+        if media_type == ARROW_STREAM:
+            return Response(encode_arrow(result), media_type=ARROW_STREAM)
+    return JSONResponse(_jsonable(result))
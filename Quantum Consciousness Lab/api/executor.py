@@ -0,0 +1,112 @@
+import asyncio
+import functools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dotenv import load_dotenv
+from fastapi import HTTPException
+
+load_dotenv()
+PROCESS_WORKERS = int(os.getenv("QCL_PROCESS_WORKERS", str(os.cpu_count() or 1)))
+THREAD_WORKERS = int(os.getenv("QCL_THREAD_WORKERS", str(min(32, (os.cpu_count() or 1) + 4))))
+DEFAULT_CONCURRENCY = int(os.getenv("QCL_ENDPOINT_CONCURRENCY", "4"))
+DEFAULT_QUEUE_DEPTH = int(os.getenv("QCL_ENDPOINT_QUEUE_DEPTH", "16"))
+# torch and MNE are not fork-safe once initialized, so workers are spawned by default.
+PROCESS_START_METHOD = os.getenv("QCL_PROCESS_START_METHOD", "spawn")
+
+class EndpointLimiter:
+    """
+    Bounds running and queued calls for one endpoint.
+
+    Up to `concurrency` calls run at once and up to `queue_depth` more wait;
+    further calls are rejected with 429 instead of piling up.
+    """
+    def __init__(self, name: str, concurrency: int = DEFAULT_CONCURRENCY, queue_depth: int = DEFAULT_QUEUE_DEPTH):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_depth = queue_depth
+        self.running = 0
+        self.waiting = 0
+        self._semaphore = None
+
+    async def __aenter__(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        if self.running >= self.concurrency and self.waiting >= self.queue_depth:
+            raise HTTPException(
+                status_code=429,
+                detail=f"{self.name} is busy: {self.running} running, {self.waiting} queued",
+                headers={"Retry-After": "1", "X-Queue-Depth": str(self.waiting)}
+            )
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        self.running -= 1
+        self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {"running": self.running, "queued": self.waiting,
+                "concurrency": self.concurrency, "queue_depth": self.queue_depth}
+
+# Per-endpoint limits; heavy pipelines default to one run per process worker.
+ENDPOINT_LIMITS = {
+    "stabilize_coherence": 1,
+    "stabilize_coherence_dqn": 1,
+    "qaoa_feedback": 2,
+    "compute_c_sigma": PROCESS_WORKERS,
+    "optimize_frequencies": PROCESS_WORKERS,
+}
+
+_process_pool = None
+_thread_pool = None
+_limiters = {}
+
+def process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=PROCESS_WORKERS,
+                                            mp_context=multiprocessing.get_context(PROCESS_START_METHOD))
+    return _process_pool
+
+def thread_pool() -> ThreadPoolExecutor:
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(max_workers=THREAD_WORKERS, thread_name_prefix="qcl")
+    return _thread_pool
+
+def limiter(name: str) -> EndpointLimiter:
+    if name not in _limiters:
+        _limiters[name] = EndpointLimiter(name, ENDPOINT_LIMITS.get(name, DEFAULT_CONCURRENCY))
+    return _limiters[name]
+
+async def offload(name: str, fn, *args, kind: str = "thread", **kwargs):
+    """
+    Runs a blocking call off the event loop, subject to the endpoint's limits.
+    Args:
+        name: Endpoint name used for concurrency limits and back-pressure.
+        fn: Blocking callable; must be picklable (module-level) for kind="process".
+        kind: "process" for heavy pipelines, "thread" for GIL-releasing NumPy work.
+    Returns:
+        The callable's return value.
+    """
+    executor = process_pool() if kind == "process" else thread_pool()
+    async with limiter(name):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(fn, *args, **kwargs))
+
+def executor_stats() -> dict:
+    return {name: lim.stats() for name, lim in _limiters.items()}
+
+def shutdown():
+    global _process_pool, _thread_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(cancel_futures=True)
+    if _thread_pool is not None:
+        _thread_pool.shutdown(cancel_futures=True)
+    _process_pool = _thread_pool = None
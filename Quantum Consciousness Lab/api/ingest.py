@@ -0,0 +1,83 @@
+import io
+import numpy as np
+
+OCTET_STREAM = "application/octet-stream"
+NPY = "application/x-npy"
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+BINARY_TYPES = (OCTET_STREAM, NPY, ARROW_STREAM)
+
+# Raw buffers are little-endian floats only.
+RAW_DTYPES = {"float32": "<f4", "<f4": "<f4", "f4": "<f4", "float64": "<f8", "<f8": "<f8", "f8": "<f8"}
+
+def parse_shape(shape) -> tuple:
+    """
+    Parses an "X-EEG-Shape" value such as "64,600000" (or a sequence) into a tuple.
+    """
+    if shape is None:
+        raise ValueError("Binary EEG payloads need a shape (channels,samples)")
+    if isinstance(shape, str):
+        shape = [s for s in shape.replace("x", ",").split(",") if s.strip()]
+    shape = tuple(int(s) for s in shape)
+    if len(shape) != 2 or min(shape) <= 0:
+        raise ValueError("EEG shape must be (channels, samples)")
+    return shape
+
+def _decode_raw(buffer, shape, dtype) -> np.ndarray:
+    if str(dtype) not in RAW_DTYPES:
+        raise ValueError(f"Unsupported EEG dtype: {dtype}; use float32 or float64")
+    dtype = np.dtype(RAW_DTYPES[str(dtype)])
+    shape = parse_shape(shape)
+    if len(buffer) != dtype.itemsize * shape[0] * shape[1]:
+        raise ValueError(f"Buffer of {len(buffer)} bytes does not match shape {shape} and dtype {dtype}")
+    return np.frombuffer(buffer, dtype=dtype).reshape(shape)
+
+def _decode_npy(buffer) -> np.ndarray:
+    header = io.BytesIO(buffer)
+    version = np.lib.format.read_magic(header)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(header)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(header)
+    if dtype.kind != "f" or len(shape) != 2:
+        raise ValueError("npy payload must be a 2D float array (channels x samples)")
+    count = int(np.prod(shape))
+    data = np.frombuffer(buffer, dtype=dtype, count=count, offset=header.tell())
+    return data.reshape(shape, order="F" if fortran_order else "C")
+
+def _decode_arrow(buffer) -> np.ndarray:
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ValueError("Arrow payloads require pyarrow")
+    table = pa.ipc.open_stream(pa.py_buffer(buffer)).read_all()
+    # one float column per channel
+    return np.stack([column.to_numpy() for column in table.columns])
+
+def decode_eeg(buffer, content_type: str = OCTET_STREAM, shape=None, dtype="float32") -> np.ndarray:
+    """
+    Maps a binary EEG payload into a NumPy array without per-element Python objects.
+    Args:
+        buffer: Request body or socket.io attachment (bytes-like).
+        content_type: OCTET_STREAM (raw little-endian floats), NPY or ARROW_STREAM.
+        shape: (channels, samples) for raw buffers, e.g. "64,600000".
+        dtype: float32 or float64 for raw buffers.
+    Returns:
+        Read-only EEG array (channels x samples) backed by the buffer where possible.
+    """
+    content_type = (content_type or OCTET_STREAM).split(";")[0].strip().lower()
+    if content_type == OCTET_STREAM:
+        return _decode_raw(buffer, shape, dtype)
+    if content_type == NPY:
+        return _decode_npy(buffer)
+    if content_type == ARROW_STREAM:
+        return _decode_arrow(buffer)
+    raise ValueError(f"Unsupported EEG content type: {content_type}")
+
+def eeg_from_message(data: dict, key: str = "eeg_data") -> np.ndarray:
+    """
+    Reads EEG from a socket.io message, as a binary attachment or a nested list.
+    """
+    value = data[key]
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return decode_eeg(value, data.get("content_type", OCTET_STREAM), data.get("shape"), data.get("dtype", "float32"))
+    return np.asarray(value, dtype=float)
@@ -0,0 +1,281 @@
+import importlib
+import inspect
+import multiprocessing
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+from multiprocessing.connection import wait
+from dotenv import load_dotenv
+
+load_dotenv()
+JOBS_DB = os.getenv("QCL_JOBS_DB", os.path.join("data", "jobs", "jobs.sqlite3"))
+JOB_WORKERS = int(os.getenv("QCL_JOB_WORKERS", str(os.cpu_count() or 1)))
+
+# Long-running entry points that can be submitted as jobs: kind -> "module:function".
+JOB_KINDS = {
+    "stabilize_coherence": "models.optimization:stabilize_coherence",
+    "stabilize_coherence_dqn": "models.optimization:stabilize_coherence_dqn",
+    "qaoa_feedback": "models.optimization:qaoa_feedback",
+    "vqe_optimize_wave_packet": "models.quantum:vqe_optimize_wave_packet",
+    "compute_c_sigma": "models.consciousness:compute_c_sigma",
+}
+
+PENDING, RUNNING, DONE, FAILED, CANCELLED = "pending", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+class JobStore:
+    """
+    SQLite-backed job table; results are stored pickled.
+    """
+    def __init__(self, path: str = JOBS_DB):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, kind TEXT, status TEXT, progress REAL, "
+                "result BLOB, error TEXT, created REAL, updated REAL)"
+            )
+
+    def create(self, job_id: str, kind: str):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("INSERT INTO jobs VALUES (?, ?, ?, 0.0, NULL, NULL, ?, ?)",
+                               (job_id, kind, PENDING, now, now))
+
+    def update(self, job_id: str, **fields):
+        if "result" in fields:
+            fields["result"] = pickle.dumps(fields["result"])
+        fields["updated"] = time.time()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def fail_unfinished(self, error: str) -> int:
+        """
+        Marks every pending or running job failed; returns how many were.
+        """
+        with self._lock, self._conn:
+            return self._conn.execute("UPDATE jobs SET status = ?, error = ?, updated = ? WHERE status IN (?, ?)",
+                                      (FAILED, error, time.time(), PENDING, RUNNING)).rowcount
+
+    def get(self, job_id: str, with_result: bool = True) -> dict:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, kind, status, progress, result, error, created, updated FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(("job_id", "kind", "status", "progress", "result", "error", "created", "updated"), row))
+        job["result"] = pickle.loads(job["result"]) if with_result and job["result"] is not None else None
+        return job
+
+    def close(self):
+        self._conn.close()
+
+def _resolve(target: str):
+    module, name = target.split(":")
+    return getattr(importlib.import_module(module), name)
+
+def _accepts_progress(fn) -> bool:
+    try:
+        return "progress" in inspect.signature(fn).parameters
+    except (TypeError, ValueError):
+        return False
+
+def _worker_main(tasks, events):
+    # events is this worker's own pipe, so terminating it cannot corrupt other workers' channels
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        job_id, target, args, kwargs = task
+        last = [0.0]
+
+        def progress(fraction: float):
+            # throttle to ~1% steps so RL callbacks don't flood the queue
+            if fraction - last[0] >= 0.01 or fraction >= 1.0:
+                last[0] = fraction
+                events.send(("progress", job_id, float(fraction)))
+
+        try:
+            fn = _resolve(target)
+            if _accepts_progress(fn):
+                kwargs = {**kwargs, "progress": progress}
+            events.send(("done", job_id, fn(*args, **kwargs)))
+        except Exception:
+            events.send(("error", job_id, traceback.format_exc(limit=5)))
+
+class _Worker:
+    def __init__(self, ctx):
+        self.tasks = ctx.Queue()
+        self.events, child_events = ctx.Pipe(duplex=False)
+        self.process = ctx.Process(target=_worker_main, args=(self.tasks, child_events), daemon=True)
+        self.process.start()
+        child_events.close()
+        self.job_id = None
+
+class JobManager:
+    """
+    Runs registered long-running functions in a pool of worker processes.
+
+    Jobs are queued in memory and tracked in a JobStore. Each worker runs one
+    job at a time, so cancelling a running job terminates its worker and
+    starts a fresh one. The queue does not survive a restart, so jobs a
+    previous process left pending or running are marked failed on startup. Listeners are called with the job dict (without the
+    result) on every status or progress change, from the manager thread.
+    """
+    def __init__(self, max_workers: int = JOB_WORKERS, db_path: str = JOBS_DB, start_method: str = "spawn"):
+        self.store = JobStore(db_path)
+        self.store.fail_unfinished("Interrupted by a server restart")
+        self._ctx = multiprocessing.get_context(start_method)
+        self._workers = [_Worker(self._ctx) for _ in range(max_workers)]
+        self._pending = deque()
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="qcl-jobs", daemon=True)
+        self._thread.start()
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def _notify(self, job_id: str):
+        job = self.store.get(job_id, with_result=False)
+        for listener in self._listeners:
+            try:
+                listener(job)
+            except Exception:
+                pass
+
+    def submit(self, kind: str, *args, **kwargs) -> str:
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = uuid.uuid4().hex
+        self.store.create(job_id, kind)
+        # announce the pending job before the manager thread can dispatch it
+        self._notify(job_id)
+        with self._lock:
+            self._pending.append((job_id, JOB_KINDS[kind], args, kwargs))
+        return job_id
+
+    def status(self, job_id: str) -> dict:
+        job = self.store.get(job_id)
+        if job is not None and job["status"] == PENDING:
+            with self._lock:
+                ids = [pending[0] for pending in self._pending]
+            job["queue_position"] = ids.index(job_id) if job_id in ids else 0
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        with self._lock:
+            for pending in self._pending:
+                if pending[0] == job_id:
+                    self._pending.remove(pending)
+                    break
+            else:
+                worker = next((w for w in self._workers if w.job_id == job_id), None)
+                if worker is None:
+                    return False
+                self._replace(worker)
+            self.store.update(job_id, status=CANCELLED)
+        self._notify(job_id)
+        return True
+
+    def _replace(self, worker: _Worker):
+        worker.process.terminate()
+        self._workers[self._workers.index(worker)] = _Worker(self._ctx)
+
+    def _reap(self):
+        with self._lock:
+            dead = [worker for worker in self._workers if not worker.process.is_alive()]
+        for worker in dead:
+            # deliver whatever the worker sent before exiting
+            try:
+                while worker.events.poll():
+                    self._handle(*worker.events.recv())
+            except (EOFError, OSError):
+                pass
+            with self._lock:
+                job_id, worker.job_id = worker.job_id, None
+                if job_id is not None:
+                    self.store.update(job_id, status=FAILED, error="Worker process died")
+                self._replace(worker)
+            if job_id is not None:
+                self._notify(job_id)
+
+    def _dispatch(self):
+        started = []
+        with self._lock:
+            for worker in self._workers:
+                if not self._pending:
+                    break
+                if worker.job_id is None:
+                    job_id, target, args, kwargs = self._pending.popleft()
+                    worker.job_id = job_id
+                    worker.tasks.put((job_id, target, args, kwargs))
+                    self.store.update(job_id, status=RUNNING)
+                    started.append(job_id)
+        for job_id in started:
+            self._notify(job_id)
+
+    def _handle(self, event: str, job_id: str, payload):
+        with self._lock:
+            job = self.store.get(job_id, with_result=False)
+            if job is None or job["status"] in FINISHED:
+                return
+            if event == "progress":
+                self.store.update(job_id, progress=payload)
+            else:
+                for worker in self._workers:
+                    if worker.job_id == job_id:
+                        worker.job_id = None
+                if event == "done":
+                    self.store.update(job_id, status=DONE, progress=1.0, result=payload)
+                else:
+                    self.store.update(job_id, status=FAILED, error=payload)
+        self._notify(job_id)
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            self._reap()
+            self._dispatch()
+            with self._lock:
+                pipes = [worker.events for worker in self._workers]
+            for pipe in wait(pipes, timeout=0.1):
+                try:
+                    event = pipe.recv()
+                except (EOFError, OSError):
+                    continue
+                self._handle(*event)
+
+    def shutdown(self):
+        self._stopped.set()
+        self._thread.join(timeout=1.0)
+        for worker in self._workers:
+            worker.process.terminate()
+        self.store.close()
+
+_manager = None
+_manager_lock = threading.Lock()
+
+def job_manager() -> JobManager:
+    global _manager
+    # double-checked so concurrent first calls share one instance
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = JobManager()
+    return _manager
+
+def shutdown():
+    global _manager
+    with _manager_lock:
+        if _manager is not None:
+            _manager.shutdown()
+            _manager = None
@@ -0,0 +1,98 @@
+import importlib
+import os
+import threading
+import time
+from dotenv import load_dotenv
+from fastapi import HTTPException
+
+load_dotenv()
+# Import heavy backends in a background thread after startup instead of on the first request.
+PREWARM = os.getenv("QCL_PREWARM", "1") not in ("0", "false", "False")
+
+class ModuleUnavailable(HTTPException):
+    """
+    A route's backend failed to import (usually a missing optional dependency); served as 503.
+    """
+    def __init__(self, name: str, error: Exception):
+        super().__init__(status_code=503, detail=f"{name} is unavailable: {error}")
+        self.name = name
+        self.error = error
+
+class LazyModule:
+    """
+    Stand-in for a module that is imported on first attribute access.
+
+    The import runs once, under a lock, and is timed; an import failure is
+    remembered and re-raised as ModuleUnavailable on every use, so only the
+    routes that need the module fail.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self.seconds = None
+        self.error = None
+        self._module = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self._module is None and self.error is None:
+            with self._lock:
+                if self._module is None and self.error is None:
+                    started = time.perf_counter()
+                    try:
+                        self._module = importlib.import_module(self.name)
+                    except Exception as e:
+                        self.error = e
+                    self.seconds = time.perf_counter() - started
+        if self.error is not None:
+            raise ModuleUnavailable(self.name, self.error)
+        return self._module
+
+    def __getattr__(self, attr: str):
+        if attr.startswith("__"):
+            raise AttributeError(attr)
+        return getattr(self.load(), attr)
+
+    def stats(self) -> dict:
+        return {"loaded": self._module is not None, "seconds": self.seconds,
+                "error": None if self.error is None else f"{type(self.error).__name__}: {self.error}"}
+
+_modules = {}
+_modules_lock = threading.Lock()
+
+def lazy(name: str) -> LazyModule:
+    """
+    Shared lazy handle for a module, e.g. ml = lazy("models.ml").
+    """
+    with _modules_lock:
+        if name not in _modules:
+            _modules[name] = LazyModule(name)
+        return _modules[name]
+
+def prewarm(names: list = None, then=None) -> threading.Thread:
+    """
+    Imports registered modules in a background thread; failures are recorded, not raised.
+    Args:
+        names: Modules to import; all registered lazy modules by default.
+        then: Optional callable run after the imports, e.g. warming models.
+    """
+    def run():
+        for name in names or list(_modules):
+            try:
+                lazy(name).load()
+            except ModuleUnavailable:
+                pass
+        if then is not None:
+            try:
+                then()
+            except Exception:
+                pass
+
+    thread = threading.Thread(target=run, name="qcl-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+def import_stats() -> dict:
+    """
+    Per-module import state and timing in seconds.
+    """
+    return {name: module.stats() for name, module in sorted(_modules.items())}
@@ -1,7 +1,29 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, Field
-from models import consciousness, eeg, ml, optimization, connectivity, neuromorphic, multimodal
-from services import collaboration, cloud, blockchain, ar_vr
+from fastapi import APIRouter, HTTPException, Request, Depends
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field, ValidationError
+from typing import Literal, NamedTuple
+import numpy as np
+from api.ingest import decode_eeg, BINARY_TYPES
+from api.encoding import encode_response, decimate_spectra, spectra_features
+from api.executor import offload, executor_stats
+from api.batching import batcher, batch_stats
+from api.jobs import job_manager, JOB_KINDS
+from api.lazy import lazy, import_stats
+from database import clients, writebehind
+
+# Model and service backends pull in heavy optional dependencies, so they are
+# imported on first use; a missing one makes only its routes answer 503.
+consciousness = lazy("models.consciousness")
+eeg = lazy("models.eeg")
+ml = lazy("models.ml")
+optimization = lazy("models.optimization")
+connectivity = lazy("models.connectivity")
+neuromorphic = lazy("models.neuromorphic")
+multimodal = lazy("models.multimodal")
+collaboration = lazy("services.collaboration")
+cloud = lazy("services.cloud")
+blockchain = lazy("services.blockchain")
+ar_vr = lazy("services.ar_vr")
 
 router = APIRouter()
 
@@ -16,6 +38,36 @@ class EEGInput(BaseModel):
     eeg_data: list = Field(..., description="EEG data array")
     sfreq: float = Field(..., gt=0.0, description="Sampling frequency in Hz")
 
+class EEGArray(NamedTuple):
+    data: np.ndarray
+    sfreq: float
+
+async def read_eeg_input(request: Request) -> EEGArray:
+    """
+    Reads EEG from a JSON EEGInput body or a binary body (raw float32/float64,
+    .npy or Arrow IPC) described by X-EEG-Shape / X-EEG-Dtype / X-EEG-Sfreq headers.
+    """
+    content_type = request.headers.get("content-type", "application/json").split(";")[0].strip().lower()
+    try:
+        if content_type in BINARY_TYPES:
+            sfreq = float(request.headers.get("x-eeg-sfreq") or request.query_params["sfreq"])
+            if sfreq <= 0:
+                raise ValueError("Sampling frequency must be positive")
+            data = decode_eeg(await request.body(), content_type,
+                              request.headers.get("x-eeg-shape"), request.headers.get("x-eeg-dtype", "float32"))
+            return EEGArray(data=data, sfreq=sfreq)
+        payload = EEGInput(**await request.json())
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors())
+    except (KeyError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid EEG payload: {e}")
+    return EEGArray(data=np.asarray(payload.eeg_data, dtype=float), sfreq=payload.sfreq)
+
+EEG_BODY = {"requestBody": {"required": True, "content": {
+    "application/json": {"schema": EEGInput.model_json_schema()},
+    **{t: {"schema": {"type": "string", "format": "binary"}} for t in BINARY_TYPES}
+}}}
+
 class MultimodalInput(BaseModel):
     fmri_file: str = Field(..., description="Path to fMRI file")
     eeg_data: list = Field(..., description="EEG data array")
@@ -38,114 +90,192 @@ async def calculate_consciousness(input: ConsciousnessInput):
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.post("/compute_c_sigma")
-async def calculate_c_sigma(input: EEGInput):
+@router.post("/compute_c_sigma", openapi_extra=EEG_BODY)
+async def calculate_c_sigma(input: EEGArray = Depends(read_eeg_input)):
     try:
-        return consciousness.compute_c_sigma(np.array(input.eeg_data), input.sfreq)
+        return await offload("compute_c_sigma", consciousness.compute_c_sigma, input.data, input.sfreq, kind="process")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.post("/analyze_eeg")
-async def analyze_eeg(input: EEGInput):
+@router.post("/analyze_eeg", openapi_extra=EEG_BODY)
+async def analyze_eeg(request: Request, input: EEGArray = Depends(read_eeg_input),
+                      spectra: Literal["full", "decimated", "summary"] = "full", decimate: int = 8):
+    """
+    Responds with JSON, or msgpack / .npz / Arrow per the Accept header.
+    spectra="decimated" shrinks FFT and wavelet outputs; "summary" omits them.
+    """
     try:
-        return eeg.analyze_eeg_band(np.array(input.eeg_data), input.sfreq)
+        features = spectra_features(eeg.FEATURES, spectra)
+        result = await offload("analyze_eeg", eeg.analyze_eeg_band, input.data, input.sfreq,
+                               features=features, as_arrays=True, decimate=decimate, kind="process")
+        if spectra == "decimated":
+            result = decimate_spectra(result, decimate)
+        return await offload("encode_response", encode_response, result, request.headers.get("accept"))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.post("/classify_eeg")
-async def classify_eeg_data(input: EEGInput):
+@router.post("/classify_eeg", openapi_extra=EEG_BODY)
+async def classify_eeg_data(input: EEGArray = Depends(read_eeg_input)):
     try:
-        return ml.classify_eeg(np.array(input.eeg_data), input.sfreq)
+        features = await offload("classify_eeg", ml.eeg_feature_vector, input.data, input.sfreq)
+        return await batcher("classify_eeg", ml.classify_eeg_batch).submit(features)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.post("/classify_emotion")
-async def classify_emotion_data(input: EEGInput):
+@router.post("/classify_emotion", openapi_extra=EEG_BODY)
+async def classify_emotion_data(input: EEGArray = Depends(read_eeg_input)):
     try:
-        return ml.classify_emotion(np.array(input.eeg_data), input.sfreq)
+        features = await offload("classify_emotion", ml.emotion_feature_vector, input.data, input.sfreq)
+        return await batcher("classify_emotion", ml.classify_emotion_batch).submit(features)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.post("/hybrid_classifier")
-async def hybrid_classify(input: EEGInput):
+@router.post("/hybrid_classifier", openapi_extra=EEG_BODY)
+async def hybrid_classify(input: EEGArray = Depends(read_eeg_input)):
     try:
-        return ml.hybrid_classifier(np.array(input.eeg_data), input.sfreq)
+        features = await offload("hybrid_classifier", ml.hybrid_feature_vector, input.data, input.sfreq)
+        return await batcher("hybrid_classifier", ml.hybrid_classifier_batch).submit(features)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.post("/optimize_frequencies")
-async def optimize_f(input: EEGInput):
+@router.post("/optimize_frequencies", openapi_extra=EEG_BODY)
+async def optimize_f(input: EEGArray = Depends(read_eeg_input)):
     try:
-        return optimization.optimize_frequencies(np.array(input.eeg_data), input.sfreq)
+        return await offload("optimize_frequencies", optimization.optimize_frequencies, input.data, input.sfreq, kind="process")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.post("/stabilize_coherence")
-async def stabilize(input: EEGInput):
+@router.post("/stabilize_coherence", openapi_extra=EEG_BODY)
+async def stabilize(input: EEGArray = Depends(read_eeg_input)):
     try:
-        return optimization.stabilize_coherence(np.array(input.eeg_data), input.sfreq)
+        return await offload("stabilize_coherence", optimization.stabilize_coherence, input.data, input.sfreq, kind="process")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.post("/stabilize_coherence_dqn")
-async def stabilize_dqn(input: EEGInput):
+@router.post("/stabilize_coherence_dqn", openapi_extra=EEG_BODY)
+async def stabilize_dqn(input: EEGArray = Depends(read_eeg_input)):
     try:
-        return optimization.stabilize_coherence_dqn(np.array(input.eeg_data), input.sfreq)
+        return await offload("stabilize_coherence_dqn", optimization.stabilize_coherence_dqn, input.data, input.sfreq, kind="process")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.post("/qaoa_feedback")
-async def qaoa(input: EEGInput):
+@router.post("/qaoa_feedback", openapi_extra=EEG_BODY)
+async def qaoa(input: EEGArray = Depends(read_eeg_input)):
     try:
-        return optimization.qaoa_feedback(np.array(input.eeg_data), input.sfreq)
+        return await offload("qaoa_feedback", optimization.qaoa_feedback, input.data, input.sfreq, kind="process")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.post("/gnn_connectivity")
-async def gnn_connect(input: EEGInput):
+@router.post("/gnn_connectivity", openapi_extra=EEG_BODY)
+async def gnn_connect(input: EEGArray = Depends(read_eeg_input)):
     try:
-        return connectivity.gnn_connectivity(np.array(input.eeg_data), input.sfreq)
+        return await offload("gnn_connectivity", connectivity.gnn_connectivity, input.data, input.sfreq, kind="process")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.post("/neuromorphic_simulation")
-async def neuromorphic_sim(input: EEGInput):
+@router.post("/neuromorphic_simulation", openapi_extra=EEG_BODY)
+async def neuromorphic_sim(input: EEGArray = Depends(read_eeg_input)):
     try:
-        return neuromorphic.neuromorphic_simulation(np.array(input.eeg_data), input.sfreq)
+        return await offload("neuromorphic_simulation", neuromorphic.neuromorphic_simulation, input.data, input.sfreq)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/integrate_fmri")
 async def integrate_fmri_data(input: MultimodalInput):
     try:
-        return multimodal.integrate_fmri(input.fmri_file, np.array(input.eeg_data))
+        return await offload("integrate_fmri", multimodal.integrate_fmri, input.fmri_file, np.array(input.eeg_data))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.post("/stream_ar_vr")
-async def stream_ar_vr(input: EEGInput):
+@router.post("/stream_ar_vr", openapi_extra=EEG_BODY)
+async def stream_ar_vr(input: EEGArray = Depends(read_eeg_input)):
     try:
-        return ar_vr.stream_ar_vr_brain(np.array(input.eeg_data), input.sfreq)
+        return await offload("stream_ar_vr", ar_vr.stream_ar_vr_brain, input.data, input.sfreq)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/create_collaboration_session")
 async def create_session(input: CollaborationInput):
     try:
-        return collaboration.create_collaboration_session(input.user_id, input.data)
+        return await collaboration.create_collaboration_session_async(input.user_id, input.data)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/stream_to_aws")
 async def stream_aws(data: dict):
     try:
-        return cloud.stream_to_aws(data)
+        return await offload("stream_to_aws", cloud.stream_to_aws, data)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/record_provenance")
 async def record_provenance(input: ProvenanceInput):
     try:
-        return blockchain.record_data_provenance(input.data, input.contract_address)
+        return await offload("record_provenance", blockchain.record_data_provenance, input.data, input.contract_address)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/health")
+async def get_health():
+    status = await offload("health", clients.health)
+    return JSONResponse(status, status_code=200 if all(check["ok"] for check in status.values()) else 503)
+
+@router.get("/modules")
+async def get_modules():
+    return import_stats()
+
+@router.get("/executor_stats")
+async def get_executor_stats():
+    return {**executor_stats(), "batches": batch_stats(), "writes": writebehind.write_stats()}
+
+@router.post("/jobs/{kind}", openapi_extra=EEG_BODY)
+async def submit_job(kind: str, input: EEGArray = Depends(read_eeg_input)):
+    if kind not in JOB_KINDS:
+        raise HTTPException(status_code=404, detail=f"Unknown job kind: {kind}")
+    job_id = await offload("jobs", job_manager().submit, kind, np.ascontiguousarray(input.data), input.sfreq)
+    return {"job_id": job_id, "status": "pending"}
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await offload("jobs", job_manager().status, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    if not await offload("jobs", job_manager().cancel, job_id):
+        raise HTTPException(status_code=409, detail="Job is not pending or running")
+    return {"job_id": job_id, "status": "cancelled"}
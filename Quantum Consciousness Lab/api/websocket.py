@@ -1,25 +1,64 @@
+import asyncio
+import inspect
 from fastapi import APIRouter
 from fastapi_socketio import SocketManager
-from models import eeg, bci
+from api.ingest import eeg_from_message
+from api.lazy import lazy
+from api.jobs import job_manager
 import numpy as np
 
 ws_router = APIRouter()
 
+bci = lazy("models.bci")
+streaming = lazy("models.streaming")
+
 def setup_websocket(app):
     sio = SocketManager(app=app)
+    engines = {}
 
     @sio.on("eeg_stream")
     async def handle_eeg_stream(sid, data):
         try:
-            result = eeg.analyze_eeg_band(np.array(data["eeg_data"]), data["sfreq"])
-            await sio.emit("eeg_result", result, room=sid)
+            chunk = eeg_from_message(data)
+            engine = engines.get(sid)
+            if engine is None or engine.n_channels != chunk.shape[0] or engine.sfreq != data["sfreq"]:
+                # client settings are checked and clamped; invalid ones answer with an error event
+                window_seconds, hop_seconds = streaming.stream_settings(
+                    data["sfreq"], data.get("window_seconds", 2.0), data.get("hop_seconds", 0.25))
+                engine = engines[sid] = streaming.StreamingCEngine(
+                    chunk.shape[0], data["sfreq"], window_seconds=window_seconds, hop_seconds=hop_seconds
+                )
+            frames = engine.push(chunk)
+            if frames:
+                await sio.emit("eeg_result", {"frames": frames}, room=sid)
         except Exception as e:
             await sio.emit("error", {"detail": str(e)}, room=sid)
 
     @sio.on("bci_stream")
     async def handle_bci_stream(sid, data):
         try:
-            result = bci.analyze_bci_data(np.array(data["bci_data"]), data["sfreq"])
+            result = bci.analyze_bci_data(eeg_from_message(data, "bci_data"), data["sfreq"])
             await sio.emit("bci_result", result, room=sid)
         except Exception as e:
             await sio.emit("error", {"detail": str(e)}, room=sid)
+
+    job_listener = []
+
+    @sio.on("job_subscribe")
+    async def handle_job_subscribe(sid, data):
+        try:
+            if not job_listener:
+                loop = asyncio.get_running_loop()
+                job_listener.append(lambda job: asyncio.run_coroutine_threadsafe(
+                    sio.emit("job_progress", job, room=job["job_id"]), loop))
+                job_manager().add_listener(job_listener[0])
+            entered = sio.enter_room(sid, data["job_id"])
+            if inspect.isawaitable(entered):
+                await entered
+            await sio.emit("job_progress", job_manager().status(data["job_id"]), room=sid)
+        except Exception as e:
+            await sio.emit("error", {"detail": str(e)}, room=sid)
+
+    @sio.on("disconnect")
+    async def handle_disconnect(sid):
+        engines.pop(sid, None)
@@ -0,0 +1,175 @@
+import itertools
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+# name -> (factory, grid); factory(**params) does the setup and returns the callable to time
+BENCHMARKS = {}
+
+def benchmark(name: str, **grid):
+    """
+    Registers a benchmark parameterized over the product of `grid` values.
+
+    The decorated factory receives one value per grid key, prepares its
+    inputs and returns a zero-argument callable; only that callable is measured.
+    """
+    def register(factory):
+        BENCHMARKS[name] = (factory, grid)
+        return factory
+    return register
+
+def cases(names: str = None, quick: bool = False) -> list:
+    """
+    Expands registered benchmarks into (case name, factory, params).
+    Args:
+        names: Regular expression selecting benchmarks or cases by name.
+        quick: Use only the first value of each grid parameter.
+    """
+    expanded = []
+    for name, (factory, grid) in BENCHMARKS.items():
+        keys = list(grid)
+        values = [grid[key][:1] if quick else grid[key] for key in keys]
+        for combo in itertools.product(*values):
+            params = dict(zip(keys, combo))
+            case = name + ("[" + ",".join(f"{k}={v}" for k, v in params.items()) + "]" if params else "")
+            if names is None or re.search(names, case):
+                expanded.append((case, factory, params))
+    return expanded
+
+def _status_kb(field: str) -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def _reset_peak_rss() -> bool:
+    # Linux resets VmHWM (peak RSS) when 5 is written to clear_refs
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def peak_rss_bytes() -> int:
+    """
+    Peak resident set size: since the last reset on Linux, otherwise over the process lifetime.
+    """
+    kb = _status_kb("VmHWM")
+    if kb is not None:
+        return kb * 1024
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def measure(fn, repeats: int = 5, warmup: int = 1) -> dict:
+    """
+    Times fn and records its memory use.
+
+    Wall time comes from `repeats` timed calls after `warmup` untimed ones.
+    Peak RSS is the high-water mark during the timed calls, and, where it
+    can be reset (Linux), how far it rose above the RSS before them.
+    Allocations are the tracemalloc peak of one extra call; tracemalloc sees
+    Python and NumPy allocations but not those of native libraries such as torch.
+    """
+    for _ in range(warmup):
+        fn()
+    resettable = _reset_peak_rss()
+    rss_before = (_status_kb("VmRSS") or 0) * 1024
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    peak_rss = peak_rss_bytes()
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, alloc_peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "repeats": repeats,
+        "wall": {"min": min(times), "median": statistics.median(times), "mean": statistics.fmean(times),
+                 "stdev": statistics.stdev(times) if len(times) > 1 else 0.0},
+        "peak_rss_bytes": peak_rss,
+        "rss_growth_bytes": max(0, peak_rss - rss_before) if resettable else None,
+        "alloc_peak_bytes": alloc_peak
+    }
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {"time": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "commit": commit, "python": platform.python_version(),
+            "numpy": np.__version__, "platform": platform.platform(), "cpu_count": os.cpu_count()}
+
+def run(names: str = None, quick: bool = False, repeats: int = 5, warmup: int = 1, progress=None) -> dict:
+    """
+    Runs the selected cases; a case that fails (e.g. a missing optional dependency) records its error.
+    Returns:
+        Dictionary with "environment" and "results" (case -> params and measurements).
+    """
+    results = {}
+    for case, factory, params in cases(names, quick):
+        try:
+            result = {"params": params, **measure(factory(**params), repeats, warmup), "error": None}
+        except Exception as e:
+            result = {"params": params, "error": f"{type(e).__name__}: {e}"}
+        results[case] = result
+        if progress is not None:
+            progress(case, result)
+    return {"environment": environment(), "results": results}
+
+def save(report: dict, path: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+def _metric(result: dict, metric: str):
+    value = result
+    for part in metric.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+def compare(baseline: dict, current: dict, threshold: float = 0.2,
+            metrics: tuple = ("wall.median", "alloc_peak_bytes")) -> list:
+    """
+    Compares two reports case by case.
+    Args:
+        threshold: Relative increase above which a metric counts as a regression.
+    Returns:
+        One entry per case and metric present in both: case, metric, baseline,
+        current, ratio and regression (bool); worst ratio first.
+    """
+    rows = []
+    for case, result in current["results"].items():
+        before = baseline["results"].get(case)
+        if before is None or result.get("error") or before.get("error"):
+            continue
+        for metric in metrics:
+            old, new = _metric(before, metric), _metric(result, metric)
+            if not old or new is None:
+                continue
+            ratio = new / old
+            rows.append({"case": case, "metric": metric, "baseline": old, "current": new, "ratio": ratio,
+                         "regression": ratio > 1 + threshold})
+    return sorted(rows, key=lambda row: -row["ratio"])
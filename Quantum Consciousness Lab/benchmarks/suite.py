@@ -0,0 +1,126 @@
+import argparse
+import os
+import sys
+import tempfile
+import numpy as np
+from benchmarks.harness import benchmark, compare, load, run, save
+
+CHANNELS = [4, 32, 64]
+SECONDS = [4, 60]
+SFREQS = [256, 1000]
+
+# one representative output per analyze_eeg_band stage
+EEG_STAGE_FEATURES = {
+    "fft": "band_power",
+    "wavelet": "wavelet_power",
+    "scalogram": "wavelet_scalogram",
+    "wpli": "connectivity_wpli",
+    "hilbert": "phase_sync",
+    "tensor": "tensor_factors",
+    "errp": "errp_power",
+}
+
+def eeg(channels: int, seconds: float, sfreq: float) -> np.ndarray:
+    return np.random.default_rng(0).random((channels, int(seconds * sfreq)))
+
+@benchmark("analyze_eeg_band", stage=list(EEG_STAGE_FEATURES), channels=CHANNELS, seconds=SECONDS, sfreq=SFREQS)
+def analyze_stage(stage: str, channels: int, seconds: float, sfreq: float):
+    from models.eeg import analyze_eeg_band
+    data = eeg(channels, seconds, sfreq)
+    return lambda: analyze_eeg_band(data, sfreq, features=[EEG_STAGE_FEATURES[stage]], cache=False, as_arrays=True)
+
+@benchmark("compute_c_sigma", channels=CHANNELS, seconds=SECONDS, sfreq=SFREQS)
+def c_sigma(channels: int, seconds: float, sfreq: float):
+    from models.consciousness import compute_c_sigma
+    data = eeg(channels, seconds, sfreq)
+    return lambda: compute_c_sigma(data, sfreq)
+
+@benchmark("compute_consciousness", windows=[1, 1000, 100000])
+def consciousness(windows: int):
+    from models.consciousness import compute_consciousness, compute_consciousness_batch
+    rng = np.random.default_rng(0)
+    weights = rng.random((windows, 5))
+    weights /= weights.sum(axis=1, keepdims=True)
+    rho = weights[:, :, None] * np.eye(5)
+    values = [rng.random(windows) for _ in range(4)]
+    if windows == 1:
+        return lambda: compute_consciousness(rho[0].flatten().tolist(), *(float(v[0]) for v in values))
+    return lambda: compute_consciousness_batch(rho, *values)
+
+@benchmark("initialize_wave_packet", method=["analytic", "circuit"])
+def wave_packet(method: str):
+    from models.quantum import initialize_wave_packet
+    data = eeg(4, 4, 256)
+    # band power is cached after the warm-up, so this times the quantum state preparation
+    return lambda: initialize_wave_packet(data, 256, t=0.1, method=method)
+
+@benchmark("wave_packet_states", times=[100, 10000])
+def wave_packet_states(times: int):
+    from models.quantum import wave_packet_states
+    amplitudes = np.sqrt(np.full(5, 0.2))
+    t = np.linspace(0, 1, times)
+    return lambda: wave_packet_states(amplitudes, t)
+
+@benchmark("compute_lyapunov_exponent", points=[1000, 10000], batched=[True, False])
+def lyapunov(points: int, batched: bool):
+    from services.visualization import compute_lyapunov_exponent, compute_lyapunov_exponent_batched
+    trajectory = np.random.default_rng(0).random((points, 3))
+    fn = compute_lyapunov_exponent_batched if batched else compute_lyapunov_exponent
+    return lambda: fn(trajectory)
+
+@benchmark("write_eeg_timeseries", channels=CHANNELS, seconds=SECONDS, sfreq=SFREQS)
+def timeseries(channels: int, seconds: float, sfreq: float):
+    # the write_eeg_timeseries path (line protocol + batched flushes) into a discarding sink
+    from database.timeseries import EEGTimeseriesWriter, FileSink
+    data = eeg(channels, seconds, sfreq)
+    writer = EEGTimeseriesWriter(FileSink(os.devnull))
+    return lambda: writer.write(data, sfreq, start_ns=0)
+
+@benchmark("encode_response", format=["json", "msgpack", "npz"], channels=CHANNELS, seconds=SECONDS)
+def serialization(format: str, channels: int, seconds: float):
+    from api.encoding import encode_response
+    data = eeg(channels, seconds, 256)
+    n = data.shape[1]
+    result = {
+        "band_power": {band: float(v) for band, v in zip(["delta", "theta", "alpha", "beta", "gamma"], data[:5, 0])},
+        "fft_frequencies": np.fft.fftfreq(n, 1 / 256),
+        "fft_power": np.abs(np.fft.fft(data, axis=1))**2 / n,
+        "wavelet_frequencies": np.linspace(1, 100, 8),
+        "wavelet_coeffs": np.repeat(data[None].astype(np.float32), 8, axis=0),
+    }
+    accept = {"json": "application/json", "msgpack": "application/msgpack", "npz": "application/x-npz"}[format]
+    return lambda: encode_response(result, accept)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the analysis hot paths and flag regressions.")
+    parser.add_argument("--filter", "-k", default=None, help="regular expression selecting cases by name")
+    parser.add_argument("--quick", action="store_true", help="only the first value of each parameter")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", "-o", default=None, help="write the results as JSON")
+    parser.add_argument("--compare", default=None, help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative slowdown counted as a regression")
+    args = parser.parse_args(argv)
+
+    # artifact-correction models are fitted per montage; keep them out of the model directory
+    os.environ.setdefault("QCL_ARTIFACT_DIR", tempfile.mkdtemp(prefix="qcl-bench-"))
+
+    def progress(case, result):
+        if result["error"]:
+            print(f"{case}: {result['error']}", flush=True)
+        else:
+            print(f"{case}: {result['wall']['median'] * 1e3:.2f} ms, peak RSS {result['peak_rss_bytes'] / 2**20:.0f} MiB, "
+                  f"allocated {result['alloc_peak_bytes'] / 2**20:.1f} MiB", flush=True)
+
+    report = run(args.filter, args.quick, args.repeats, progress=progress)
+    if args.output:
+        save(report, args.output)
+    if args.compare:
+        regressions = [row for row in compare(load(args.compare), report, args.threshold) if row["regression"]]
+        for row in regressions:
+            print(f"REGRESSION {row['case']} {row['metric']}: {row['baseline']:.4g} -> {row['current']:.4g} "
+                  f"({row['ratio']:.2f}x)")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+import os
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_TIMEOUT_MS = int(os.getenv("MONGO_TIMEOUT_MS", "5000"))
+INFLUX_URL = os.getenv("INFLUX_URL", "http://influxdb:8086")
+INFLUX_TOKEN = os.getenv("INFLUX_TOKEN", "my-token")
+INFLUX_ORG = os.getenv("INFLUX_ORG", "my-org")
+INFLUX_POOL_SIZE = int(os.getenv("INFLUX_POOL_SIZE", "10"))
+INFLUX_TIMEOUT_MS = int(os.getenv("INFLUX_TIMEOUT_MS", "10000"))
+
+class ClientManager:
+    """
+    One lazily created, pooled MongoClient and InfluxDBClient per process.
+
+    Nothing connects at import time. Clients are created on first use and
+    dropped in forked children (both clients own sockets and background
+    threads that must not be shared across a fork), so each process opens
+    its own pool on demand.
+    """
+    def __init__(self):
+        self._pid = os.getpid()
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def _after_fork(self):
+        # the parent's clients stay open in the parent; the child only forgets them
+        self._pid = os.getpid()
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name: str, factory):
+        if os.getpid() != self._pid:
+            self._after_fork()
+        client = self._clients.get(name)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(name)
+                if client is None:
+                    client = self._clients[name] = factory()
+        return client
+
+    def mongo(self):
+        """
+        Shared MongoClient; pymongo pools connections per server internally.
+        """
+        def connect():
+            from pymongo import MongoClient
+            return MongoClient(MONGO_URI, maxPoolSize=MONGO_MAX_POOL_SIZE, minPoolSize=MONGO_MIN_POOL_SIZE,
+                               serverSelectionTimeoutMS=MONGO_TIMEOUT_MS, connectTimeoutMS=MONGO_TIMEOUT_MS)
+        return self._get("mongo", connect)
+
+    def mongo_db(self, name: str):
+        return self.mongo()[name]
+
+    def influx(self):
+        """
+        Shared InfluxDBClient with a bounded HTTP connection pool.
+        """
+        def connect():
+            from influxdb_client import InfluxDBClient
+            return InfluxDBClient(url=INFLUX_URL, token=INFLUX_TOKEN, org=INFLUX_ORG,
+                                  timeout=INFLUX_TIMEOUT_MS, connection_pool_maxsize=INFLUX_POOL_SIZE)
+        return self._get("influx", connect)
+
+    def health(self) -> dict:
+        """
+        Pings each backend.
+        Returns:
+            Dictionary of backend -> {"ok": bool, "error": str or None}.
+        """
+        def ping_influx():
+            if not self.influx().ping():
+                raise ConnectionError(f"InfluxDB at {INFLUX_URL} did not answer")
+
+        checks = {"mongo": lambda: self.mongo().admin.command("ping"), "influx": ping_influx}
+        status = {}
+        for name, check in checks.items():
+            try:
+                check()
+                status[name] = {"ok": True, "error": None}
+            except Exception as e:
+                status[name] = {"ok": False, "error": str(e)}
+        return status
+
+    def close(self):
+        with self._lock:
+            clients, self._clients = self._clients, {}
+        if os.getpid() == self._pid:
+            for client in clients.values():
+                client.close()
+
+clients = ClientManager()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=clients._after_fork)
+
+def mongo_db(name: str):
+    return clients.mongo_db(name)
+
+def influx_client():
+    return clients.influx()
+
+def health() -> dict:
+    return clients.health()
+
+def close():
+    clients.close()
@@ -1,15 +1,23 @@
-from pymongo import MongoClient
-import os
-from dotenv import load_dotenv
+from database.clients import mongo_db
+from database.writebehind import write_behind
 
-load_dotenv()
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
-
-client = MongoClient(MONGO_URI)
-db = client["consciousness_lab"]
+DB_NAME = "consciousness_lab"
 
 def insert_session(data: dict):
     """
     Inserts a session into MongoDB.
+    The insert is queued on the write-behind buffer; the returned _id is assigned client-side.
+    """
+    return write_behind(DB_NAME, "sessions").insert(data)
+
+def insert_sessions(sessions: list) -> list:
+    """
+    Inserts many sessions with one insert_many.
+    """
+    return mongo_db(DB_NAME)["sessions"].insert_many(sessions, ordered=False).inserted_ids
+
+async def insert_session_async(data: dict, wait: bool = False):
+    """
+    insert_session for async handlers; wait=True returns once the session is written.
     """
-    return db["sessions"].insert_one(data).inserted_id
+    return await write_behind(DB_NAME, "sessions").insert_async(data, wait)
@@ -0,0 +1,263 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dotenv import load_dotenv
+from database.clients import mongo_db
+
+load_dotenv()
+WRITE_BATCH_SIZE = int(os.getenv("QCL_WRITE_BATCH_SIZE", "500"))
+WRITE_MAX_DELAY = float(os.getenv("QCL_WRITE_MAX_DELAY", "0.5"))
+WRITE_MAX_PENDING = int(os.getenv("QCL_WRITE_MAX_PENDING", "100000"))
+WRITE_MAX_RETRIES = int(os.getenv("QCL_WRITE_MAX_RETRIES", "60"))
+
+# write error codes worth retrying: network/shutdown, not primary, primary stepped down
+RETRYABLE_CODES = {6, 7, 89, 91, 189, 9001, 10107, 11600, 11602, 13435, 13436}
+DUPLICATE_KEY = 11000
+
+def _object_id():
+    from bson import ObjectId
+    return ObjectId()
+
+def _retryable(error: Exception) -> bool:
+    # a whole-batch failure is retried only if it is a connection problem
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    try:
+        from pymongo.errors import ConnectionFailure
+    except ImportError:
+        return False
+    return isinstance(error, ConnectionFailure)
+
+class WriteBehindBuffer:
+    """
+    Buffers inserts for one collection and writes them with insert_many.
+
+    insert() assigns the _id client-side and returns at once; a background
+    thread flushes when `batch_size` documents are waiting or the oldest has
+    waited `max_delay` seconds. Documents that fail with a connection or
+    not-primary error go back to the front of the queue and are retried up to
+    `max_retries` times, so a Mongo outage delays writes instead of losing
+    them; only when `max_pending` documents are queued does insert() refuse.
+    Other failures (validation, oversized documents, ...) cannot succeed on a
+    retry: those documents are dropped into `dead_letters`, their futures
+    fail and stats() counts them.
+    """
+    def __init__(self, collection, batch_size: int = WRITE_BATCH_SIZE, max_delay: float = WRITE_MAX_DELAY,
+                 max_pending: int = WRITE_MAX_PENDING, id_factory=_object_id, retry_delay: float = 1.0,
+                 max_retries: int = WRITE_MAX_RETRIES):
+        self._collection = collection
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.id_factory = id_factory
+        self.retry_delay = retry_delay
+        self.max_retries = max_retries
+        self.inserted = 0
+        self.batches = 0
+        self.failures = 0
+        self.dropped = 0
+        self.dead_letters = deque(maxlen=1000)
+        self.last_flush = None
+        self.last_error = None
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._flushing = 0
+        self._force = False
+        self._thread = None
+        self._pid = None
+        self._stopped = False
+
+    def collection(self):
+        # a callable resolves the collection lazily, e.g. after a fork
+        return self._collection() if callable(self._collection) else self._collection
+
+    def _check_fork(self):
+        # a forked child must not re-write its parent's queue or wait on its thread
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._queue = deque()
+            self._flushing = 0
+            self._cond = threading.Condition()
+            self._thread = None
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name="qcl-write-behind", daemon=True)
+            self._thread.start()
+
+    def insert(self, doc: dict, wait: bool = False):
+        """
+        Queues a document and returns its _id; with wait=True, a Future that
+        resolves to the _id once the document is written.
+        """
+        doc = dict(doc)
+        doc.setdefault("_id", self.id_factory())
+        future = Future() if wait else None
+        self._check_fork()
+        with self._cond:
+            self._ensure_thread()
+            if len(self._queue) >= self.max_pending:
+                raise RuntimeError(f"Write-behind buffer is full ({len(self._queue)} documents pending)")
+            self._queue.append((time.monotonic(), doc, future, 0))
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify()
+        return future if wait else doc["_id"]
+
+    def insert_many(self, docs: list) -> list:
+        return [self.insert(doc) for doc in docs]
+
+    async def insert_async(self, doc: dict, wait: bool = False):
+        """
+        insert() for FastAPI handlers; wait=True awaits the write without blocking the loop.
+        """
+        if not wait:
+            return self.insert(doc)
+        return await asyncio.wrap_future(self.insert(doc, wait=True))
+
+    def _take(self) -> list:
+        batch = []
+        while self._queue and len(batch) < self.batch_size:
+            batch.append(self._queue.popleft())
+        self._flushing += len(batch)
+        return batch
+
+    def _insert(self, batch: list) -> tuple:
+        # -> (entries written, entries to retry, [(entry, error)] that cannot be written)
+        try:
+            self.collection().insert_many([entry[1] for entry in batch], ordered=False)
+            return batch, [], []
+        except Exception as e:
+            self.last_error = str(e)
+            errors = (getattr(e, "details", None) or {}).get("writeErrors")
+            if errors is None:
+                if _retryable(e):
+                    return [], batch, []
+                if len(batch) == 1:
+                    return [], [], [(batch[0], e)]
+                # a document the driver refused (e.g. too large) fails the whole call; isolate it
+                written, retry, dropped = [], [], []
+                for entry in batch:
+                    w, r, d = self._insert([entry])
+                    written += w
+                    retry += r
+                    dropped += d
+                return written, retry, dropped
+        # with ordered=False the other documents were written; duplicate _ids are
+        # documents an earlier, partly failed attempt already wrote
+        failed = {err["index"]: err for err in errors if err.get("code") != DUPLICATE_KEY}
+        retry = [batch[i] for i, err in failed.items() if err.get("code") in RETRYABLE_CODES]
+        dropped = [(batch[i], RuntimeError(err.get("errmsg", f"write error {err.get('code')}")))
+                   for i, err in failed.items() if err.get("code") not in RETRYABLE_CODES]
+        return [entry for i, entry in enumerate(batch) if i not in failed], retry, dropped
+
+    def _write(self, batch: list) -> bool:
+        started = time.monotonic()
+        done, retry, dropped = self._insert(batch)
+        exhausted = [entry for entry in retry if entry[3] >= self.max_retries]
+        retry = [entry[:3] + (entry[3] + 1,) for entry in retry if entry[3] < self.max_retries]
+        dropped += [(entry, RuntimeError(f"Not written after {self.max_retries} retries: {self.last_error}"))
+                    for entry in exhausted]
+        with self._cond:
+            if retry or dropped:
+                self.failures += 1
+            else:
+                self.last_error = None
+            self._queue.extendleft(reversed(retry))
+            for (_, doc, _, _), error in dropped:
+                self.dead_letters.append({"doc": doc, "error": str(error)})
+            self.dropped += len(dropped)
+            self.inserted += len(done)
+            self.batches += 1
+            self.last_flush = {"documents": len(done), "seconds": time.monotonic() - started, "at": time.time()}
+            self._flushing -= len(batch)
+            self._cond.notify_all()
+        for _, doc, future, _ in done:
+            if future is not None:
+                future.set_result(doc["_id"])
+        for (_, _, future, _), error in dropped:
+            if future is not None:
+                future.set_exception(error)
+        return not retry
+
+    def _due(self) -> bool:
+        return bool(self._queue) and (self._force or len(self._queue) >= self.batch_size
+                                      or time.monotonic() - self._queue[0][0] >= self.max_delay)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopped and not self._due():
+                    self._cond.wait(self.max_delay - (time.monotonic() - self._queue[0][0]) if self._queue else None)
+                if not self._queue:
+                    self._thread = None
+                    return
+                batch = self._take()
+            if not self._write(batch):
+                if self._stopped:
+                    with self._cond:
+                        self._thread = None
+                    return
+                time.sleep(self.retry_delay)
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Writes everything queued so far; returns False if it is not written within timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self._check_fork()
+        with self._cond:
+            self._force = True
+            self._cond.notify_all()
+            try:
+                while self._queue or self._flushing:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+            finally:
+                self._force = False
+        return True
+
+    async def flush_async(self, timeout: float = None) -> bool:
+        return await asyncio.to_thread(self.flush, timeout)
+
+    def stats(self) -> dict:
+        """
+        Flush and lag metrics: pending documents, age of the oldest one, totals and the last flush.
+        """
+        with self._cond:
+            lag = time.monotonic() - self._queue[0][0] if self._queue else 0.0
+            return {"pending": len(self._queue) + self._flushing, "lag_seconds": lag, "inserted": self.inserted,
+                    "batches": self.batches, "failures": self.failures, "dropped": self.dropped,
+                    "last_flush": self.last_flush,
+                    "last_error": self.last_error}
+
+    def close(self, timeout: float = 5.0) -> bool:
+        flushed = self.flush(timeout)
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        return flushed
+
+_buffers = {}
+_lock = threading.Lock()
+
+def write_behind(db_name: str, collection: str) -> WriteBehindBuffer:
+    """
+    Shared write-behind buffer for a Mongo collection.
+    """
+    with _lock:
+        if (db_name, collection) not in _buffers:
+            _buffers[(db_name, collection)] = WriteBehindBuffer(lambda: mongo_db(db_name)[collection])
+        return _buffers[(db_name, collection)]
+
+def write_stats() -> dict:
+    return {f"{db}.{collection}": buffer.stats() for (db, collection), buffer in _buffers.items()}
+
+def close(timeout: float = 5.0):
+    for buffer in list(_buffers.values()):
+        buffer.close(timeout)
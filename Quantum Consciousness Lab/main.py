@@ -2,6 +2,9 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from api.routes import router
 from api.websocket import setup_websocket
+from api import executor, jobs, lazy
+from models.registry import model_registry
+from database import clients, writebehind
 
 app = FastAPI(
     title="Quantum Consciousness Lab",
@@ -21,6 +24,18 @@ app.add_middleware(
 setup_websocket(app)
 app.include_router(router, prefix="/api")
 
+@app.on_event("startup")
+def prewarm_backends():
+    if lazy.PREWARM:
+        lazy.prewarm(then=lambda: model_registry().load_all())
+
+@app.on_event("shutdown")
+def shutdown_executors():
+    executor.shutdown()
+    jobs.shutdown()
+    writebehind.close()
+    clients.close()
+
 @app.get("/")
 async def read_root():
     return {"message": "Quantum Consciousness Lab API v2.4 - Open Source"}
@@ -0,0 +1,407 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+import warnings
+from contextlib import contextmanager
+import mne
+import numpy as np
+import torch
+import torch.nn as nn
+from mne.preprocessing import ICA
+from dotenv import load_dotenv
+from models.registry import MODEL_DIR
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; fits are then only serialised within a process
+    fcntl = None
+
+load_dotenv()
+ARTIFACT_DIR = os.getenv("QCL_ARTIFACT_DIR", os.path.join(MODEL_DIR, "artifacts"))
+ARTIFACT_EPOCHS = int(os.getenv("QCL_ARTIFACT_EPOCHS", "20"))
+# training sees at most this many single-channel windows, in minibatches
+ARTIFACT_TRAIN_WINDOWS = int(os.getenv("QCL_ARTIFACT_TRAIN_WINDOWS", "2048"))
+ARTIFACT_BATCH_WINDOWS = int(os.getenv("QCL_ARTIFACT_BATCH_WINDOWS", "64"))
+ARTIFACT_CHUNK_SAMPLES = int(os.getenv("QCL_ARTIFACT_CHUNK_SAMPLES", "16384"))
+
+class EEGCNN(nn.Module):
+    """
+    Fully convolutional residual denoiser.
+
+    Each channel is filtered independently with the same 1D kernels and
+    'same' padding, so (batch, channels, samples) maps to the same shape for
+    any channel count and window length. The network predicts the artifact
+    on the per-channel standardized signal, which is subtracted; the last
+    layer starts at zero, so an untrained model is the identity.
+    """
+    def __init__(self, hidden: int = 16, kernel_size: int = 7, layers: int = 3):
+        super().__init__()
+        padding = kernel_size // 2
+        blocks = [nn.Conv1d(1, hidden, kernel_size, padding=padding), nn.ReLU()]
+        for _ in range(layers - 2):
+            blocks += [nn.Conv1d(hidden, hidden, kernel_size, padding=padding), nn.ReLU()]
+        blocks.append(nn.Conv1d(hidden, 1, kernel_size, padding=padding))
+        self.net = nn.Sequential(*blocks)
+        # samples on each side that influence one output sample
+        self.radius = layers * padding
+        nn.init.zeros_(self.net[-1].weight)
+        nn.init.zeros_(self.net[-1].bias)
+
+    def forward(self, x):
+        batch, channels, samples = x.shape
+        x = x.reshape(batch * channels, 1, samples)
+        scale = x.std(dim=-1, unbiased=False, keepdim=True) + 1e-12
+        artifact = self.net(x / scale) * scale
+        return (x - artifact).reshape(batch, channels, samples)
+
+def montage_key(ch_names: list, sfreq: float, subject: str = None) -> str:
+    """
+    File-safe key for a subject's montage: channel names, in order, and sampling rate.
+    """
+    digest = hashlib.blake2b("\n".join(ch_names).encode(), digest_size=4).hexdigest()
+    return f"{_subject_slug(subject)}-{len(ch_names)}ch-{float(sfreq):g}Hz-{digest}"
+
+def _subject_slug(subject: str) -> str:
+    return re.sub(r"[^\w.-]", "_", subject or "default")
+
+def calibrations(subject: str = None, directory: str = None) -> dict:
+    """
+    Fingerprints of a subject's calibrated montages, by montage key.
+    """
+    directory = directory or artifact_store().directory
+    pattern = re.compile(rf"{re.escape(_subject_slug(subject))}-\d+ch-.*\.json")
+    names = sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+    entries = {name[:-5]: _read_manifest(os.path.join(directory, name)) for name in names if pattern.fullmatch(name)}
+    return {key: entry["fingerprint"] for key, entry in entries.items() if entry}
+
+def ica_affine(ica: ICA, info) -> tuple:
+    """
+    Extracts a fitted ICA's cleaning step as x -> P @ x + b.
+
+    ICA.apply is per-sample affine (centering, whitening, unmixing, dropping
+    the excluded sources and mixing back), so applying it once to a zero
+    column and the identity recovers b and P exactly.
+    """
+    n = info["nchan"]
+    probe = mne.io.RawArray(np.hstack([np.zeros((n, 1)), np.eye(n)]), info, verbose=False)
+    out = ica.apply(probe, verbose=False).get_data()
+    b = out[:, 0]
+    return out[:, 1:] - b[:, None], b
+
+def _windows(data: np.ndarray, window: int) -> np.ndarray:
+    window = min(window, data.shape[1])
+    n = data.shape[1] // window
+    return data[:, :n * window].reshape(data.shape[0], n, window).transpose(1, 0, 2)
+
+class ArtifactModel:
+    """
+    Artifact correction fitted once for one subject/montage.
+
+    The ICA is stored as the affine map (P, b), so correcting new data is one
+    matrix multiply; the EEGCNN denoiser then runs as plain inference.
+    """
+    def __init__(self, key: str, ch_names: list, sfreq: float, projection: np.ndarray, offset: np.ndarray,
+                 cnn: EEGCNN = None):
+        self.key = key
+        self.ch_names = list(ch_names)
+        self.sfreq = float(sfreq)
+        self.projection = np.asarray(projection)
+        self.offset = np.asarray(offset)
+        self.cnn = (cnn or EEGCNN()).eval()
+        self.fitted = True
+        self._fingerprint = None
+
+    @classmethod
+    def identity(cls, ch_names: list, sfreq: float, subject: str = None):
+        """
+        Uncalibrated stand-in that leaves the data unchanged.
+        """
+        model = cls(montage_key(ch_names, sfreq, subject), ch_names, sfreq, np.eye(len(ch_names)),
+                    np.zeros(len(ch_names)))
+        model.fitted = False
+        model._fingerprint = "identity"
+        return model
+
+    @classmethod
+    def fit(cls, eeg_data: np.ndarray, sfreq: float, ch_names: list = None, subject: str = None,
+            n_components: int = 20, exclude: list = None, epochs: int = ARTIFACT_EPOCHS, window: int = 512,
+            noise: float = 0.1):
+        """
+        Fits the ICA and trains the denoiser on a calibration recording.
+        Args:
+            eeg_data: EEG data (channels x samples).
+            sfreq: Sampling frequency (Hz).
+            ch_names: Channel names; ch1..chN by default.
+            subject: Subject identifier, part of the montage key.
+            n_components: ICA components (at most the channel count).
+            exclude: ICA components to remove.
+            epochs: Training epochs for the CNN, which learns to remove white
+                noise of `noise` x the channel std from the ICA-cleaned windows.
+        """
+        ch_names = ch_names or [f'ch{i+1}' for i in range(eeg_data.shape[0])]
+        info = mne.create_info(ch_names=ch_names, sfreq=sfreq, ch_types='eeg')
+        ica = ICA(n_components=min(n_components, len(ch_names)), random_state=42)
+        ica.fit(mne.io.RawArray(eeg_data, info, verbose=False), verbose=False)
+        ica.exclude = list(exclude or [])
+        projection, offset = ica_affine(ica, info)
+        model = cls(montage_key(ch_names, sfreq, subject), ch_names, sfreq, projection, offset)
+        model.train(model.unmix(eeg_data), epochs, window, noise)
+        return model
+
+    def train(self, clean: np.ndarray, epochs: int, window: int = 512, noise: float = 0.1, lr: float = 1e-3,
+              max_windows: int = ARTIFACT_TRAIN_WINDOWS, batch_size: int = ARTIFACT_BATCH_WINDOWS):
+        """
+        Trains the denoiser on up to `max_windows` random single-channel windows, in minibatches.
+
+        The network filters each channel independently, so windows of single
+        channels keep the activations at batch_size x hidden x window floats
+        whatever the montage and recording length.
+        """
+        if epochs <= 0:
+            return
+        windows = _windows(clean, window)
+        index = np.stack(np.unravel_index(np.arange(windows.shape[0] * windows.shape[1]), windows.shape[:2]), axis=1)
+        rng = np.random.default_rng(0)
+        if len(index) > max_windows:
+            index = index[rng.choice(len(index), max_windows, replace=False)]
+        target = torch.tensor(windows[index[:, 0], index[:, 1]][:, None, :], dtype=torch.float32)
+        scale = target.std(dim=-1, unbiased=False, keepdim=True)
+        optimizer = torch.optim.Adam(self.cnn.parameters(), lr=lr)
+        generator = torch.Generator().manual_seed(0)
+        self.cnn.train()
+        for _ in range(epochs):
+            order = torch.randperm(len(target), generator=generator)
+            for start in range(0, len(target), batch_size):
+                batch = order[start:start + batch_size]
+                noisy = target[batch] + noise * scale[batch] * torch.randn(target[batch].shape, generator=generator)
+                optimizer.zero_grad()
+                loss = nn.functional.mse_loss(self.cnn(noisy), target[batch])
+                loss.backward()
+                optimizer.step()
+        self.cnn.eval()
+        self._fingerprint = None
+
+    def fingerprint(self) -> str:
+        """
+        Hash of the fitted ICA map and CNN weights; changes whenever the model is refitted.
+        """
+        if self._fingerprint is None:
+            h = hashlib.blake2b(digest_size=8)
+            h.update(np.ascontiguousarray(self.projection).tobytes())
+            h.update(np.ascontiguousarray(self.offset).tobytes())
+            for tensor in self.cnn.state_dict().values():
+                h.update(tensor.detach().cpu().numpy().tobytes())
+            self._fingerprint = h.hexdigest()
+        return self._fingerprint
+
+    def unmix(self, eeg_data: np.ndarray) -> np.ndarray:
+        """
+        Applies the stored ICA cleaning: P @ x + b.
+        """
+        if eeg_data.shape[0] != len(self.ch_names):
+            raise ValueError(f"Artifact model {self.key} expects {len(self.ch_names)} channels, got {eeg_data.shape[0]}")
+        return self.projection @ eeg_data + self.offset[:, None]
+
+    def denoise(self, eeg_data: np.ndarray, chunk: int = ARTIFACT_CHUNK_SAMPLES) -> np.ndarray:
+        """
+        Runs the CNN over `chunk`-sample blocks overlapped by its receptive
+        field, which gives the same output as one pass over the whole recording.
+        """
+        if not self.fitted:
+            return np.asarray(eeg_data, dtype=np.float32)
+        x = torch.tensor(eeg_data, dtype=torch.float32).unsqueeze(1)   # channels x 1 x samples
+        n = x.shape[-1]
+        scale = x.std(dim=-1, unbiased=False, keepdim=True) + 1e-12
+        radius = self.cnn.radius
+        cleaned = np.empty(eeg_data.shape, dtype=np.float32)
+        with torch.inference_mode():
+            for start in range(0, n, chunk):
+                stop = min(start + chunk, n)
+                lo, hi = max(0, start - radius), min(n, stop + radius)
+                artifact = self.cnn.net(x[..., lo:hi] / scale) * scale
+                cleaned[:, start:stop] = (x[..., start:stop] - artifact[..., start - lo:stop - lo]).squeeze(1).numpy()
+        return cleaned
+
+    def apply(self, eeg_data: np.ndarray) -> np.ndarray:
+        """
+        Artifact-corrected copy of the data (channels x samples).
+        """
+        return self.denoise(self.unmix(eeg_data))
+
+    def save(self, directory: str = ARTIFACT_DIR):
+        """
+        Writes the pair as <key>-<fingerprint>.npz/.pth, each through a temporary
+        file, then points the <key>.json manifest at it, so readers see either
+        the old pair or the new one.
+        """
+        os.makedirs(directory, exist_ok=True)
+        stem = f"{self.key}-{self.fingerprint()}"
+        tmp = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        npz, pth = os.path.join(directory, f"{stem}.npz"), os.path.join(directory, f"{stem}.pth")
+        with open(npz + tmp, "wb") as f:
+            np.savez(f, projection=self.projection, offset=self.offset, ch_names=np.array(self.ch_names), sfreq=self.sfreq)
+        torch.save(self.cnn.state_dict(), pth + tmp)
+        os.replace(npz + tmp, npz)
+        os.replace(pth + tmp, pth)
+        manifest = os.path.join(directory, f"{self.key}.json")
+        previous = _read_manifest(manifest)
+        with open(manifest + tmp, "w") as f:
+            json.dump({"model": stem, "fingerprint": self.fingerprint()}, f)
+        os.replace(manifest + tmp, manifest)
+        if previous and previous["model"] != stem:
+            for ext in (".npz", ".pth"):
+                try:
+                    os.remove(os.path.join(directory, previous["model"] + ext))
+                except FileNotFoundError:
+                    pass
+
+    @classmethod
+    def load(cls, key: str, directory: str = ARTIFACT_DIR):
+        """
+        Loads the pair named by the key's manifest; None if the montage was never calibrated.
+        """
+        manifest = os.path.join(directory, f"{key}.json")
+        for _ in range(3):
+            entry = _read_manifest(manifest)
+            if entry is None:
+                return None
+            try:
+                with np.load(os.path.join(directory, f"{entry['model']}.npz")) as f:
+                    fields = {"ch_names": f["ch_names"].tolist(), "sfreq": float(f["sfreq"]),
+                              "projection": f["projection"], "offset": f["offset"]}
+                state = torch.load(os.path.join(directory, f"{entry['model']}.pth"))
+            except FileNotFoundError:
+                continue  # refitted between reading the manifest and the pair
+            cnn = EEGCNN()
+            cnn.load_state_dict(state)
+            model = cls(key, cnn=cnn, **fields)
+            if model.fingerprint() != entry["fingerprint"]:
+                raise ValueError(f"Artifact model {entry['model']} does not match its manifest")
+            return model
+        raise RuntimeError(f"Artifact model {key} kept changing while it was loaded")
+
+def _read_manifest(path: str) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+class ArtifactStore:
+    """
+    Calibrated artifact models by montage key, persisted in `directory`.
+
+    Models are fitted only by `fit` (the calibration step, see main); `model`
+    serves the calibrated model or, until there is one, an identity map.
+    Loaded models are kept in memory and reloaded when the manifest on disk
+    changes, so a calibration made by another process is picked up.
+    """
+    def __init__(self, directory: str = ARTIFACT_DIR):
+        self.directory = directory
+        self._models = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _version(self, key: str) -> tuple:
+        # the manifest is replaced, never rewritten, by each save
+        try:
+            stat = os.stat(os.path.join(self.directory, f"{key}.json"))
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def get(self, key: str) -> ArtifactModel:
+        version = self._version(key)
+        if version is None:
+            return None
+        with self._lock:
+            cached = self._models.get(key)
+            if cached is None or cached[1] != version:
+                model = ArtifactModel.load(key, self.directory)
+                if model is None:
+                    return None
+                cached = self._models[key] = (model, version)
+            return cached[0]
+
+    @contextmanager
+    def _fitting(self, key: str):
+        # one fit per montage at a time: a thread lock within this process, a file lock across processes
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, f"{key}.lock"), "w") as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                yield
+
+    def fit(self, eeg_data: np.ndarray, sfreq: float, ch_names: list = None, subject: str = None,
+            refit: bool = True, **kwargs) -> ArtifactModel:
+        """
+        Fits and persists the model for this recording's montage, replacing any
+        earlier one; with refit=False an existing calibration is kept.
+        """
+        ch_names = ch_names or [f'ch{i+1}' for i in range(eeg_data.shape[0])]
+        key = montage_key(ch_names, sfreq, subject)
+        with self._fitting(key):
+            # another thread or process may have calibrated while this one waited
+            model = None if refit else self.get(key)
+            if model is None:
+                model = ArtifactModel.fit(eeg_data, sfreq, ch_names, subject, **kwargs)
+                model.save(self.directory)
+                with self._lock:
+                    self._models[key] = (model, self._version(key))
+        return model
+
+    def model(self, eeg_data: np.ndarray, sfreq: float, ch_names: list = None, subject: str = None) -> ArtifactModel:
+        """
+        The montage's calibrated model, or an identity map with a warning if it has not been calibrated.
+        """
+        ch_names = ch_names or [f'ch{i+1}' for i in range(eeg_data.shape[0])]
+        key = montage_key(ch_names, sfreq, subject)
+        model = self.get(key)
+        if model is None:
+            warnings.warn(f"No artifact model calibrated for {key}; data is not artifact-corrected "
+                          f"(calibrate with python -m models.artifacts)")
+            model = ArtifactModel.identity(ch_names, sfreq, subject)
+        return model
+
+_store = None
+_store_lock = threading.Lock()
+
+def artifact_store() -> ArtifactStore:
+    global _store
+    # double-checked so concurrent first calls share one instance
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ArtifactStore()
+    return _store
+
+def correct_artifacts(eeg_data: np.ndarray, sfreq: float, ch_names: list = None, subject: str = None) -> np.ndarray:
+    """
+    Artifact-corrects a recording with its montage's calibrated ICA and CNN; unchanged if it has none.
+    """
+    return artifact_store().model(eeg_data, sfreq, ch_names, subject).apply(eeg_data)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calibrate artifact correction for a subject's montage.")
+    parser.add_argument("recording", help=".npz with eeg_data (channels x samples), sfreq and optional ch_names")
+    parser.add_argument("--subject", default=None)
+    parser.add_argument("--exclude", type=int, nargs="*", default=None, help="ICA components to remove")
+    parser.add_argument("--epochs", type=int, default=ARTIFACT_EPOCHS)
+    parser.add_argument("--keep", action="store_true", help="leave an existing calibration in place")
+    parser.add_argument("--artifact-dir", default=ARTIFACT_DIR)
+    args = parser.parse_args(argv)
+    with np.load(args.recording) as f:
+        eeg_data, sfreq = f["eeg_data"], float(f["sfreq"])
+        ch_names = f["ch_names"].tolist() if "ch_names" in f else None
+    model = ArtifactStore(args.artifact_dir).fit(eeg_data, sfreq, ch_names, args.subject, refit=not args.keep,
+                                                 exclude=args.exclude, epochs=args.epochs)
+    print(f"Calibrated {model.key} ({model.fingerprint()}) in {args.artifact_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -10,9 +10,9 @@ def connect_bci(board_id: int = BoardIds.SYNTHETIC_BOARD.value):
     board.prepare_session()
     return board
 
-def analyze_bci_data(bci_data: np.ndarray, sfreq: float) -> dict:
+def analyze_bci_data(bci_data: np.ndarray, sfreq: float, features: list = None) -> dict:
     """
     Analyzes BCI data using EEG pipeline.
     """
     from models.eeg import analyze_eeg_band
-    return analyze_eeg_band(bci_data, sfreq)
+    return analyze_eeg_band(bci_data, sfreq, features=features)
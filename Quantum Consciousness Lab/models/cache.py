@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+from collections import OrderedDict
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+CACHE_MAX_BYTES = int(os.getenv("QCL_CACHE_MAX_BYTES", str(512 * 1024 ** 2)))
+CACHE_DIR = os.getenv("QCL_CACHE_DIR")
+
+def feature_key(eeg_data: np.ndarray, sfreq: float, config: dict = None) -> str:
+    """
+    Content hash of an EEG array, its sampling frequency and the pipeline config.
+    """
+    data = np.ascontiguousarray(eeg_data)
+    h = hashlib.blake2b(digest_size=20)
+    h.update(f"{data.dtype.str}{data.shape}{float(sfreq)!r}".encode())
+    h.update(json.dumps(config or {}, sort_keys=True, default=str).encode())
+    h.update(memoryview(data).cast("B"))
+    return h.hexdigest()
+
+def nbytes(value) -> int:
+    """
+    Approximate in-memory size of a cached value.
+    """
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(nbytes(v) for v in value.values()) + 64 * len(value)
+    if isinstance(value, (list, tuple)):
+        return sum(nbytes(v) for v in value) + 8 * len(value)
+    return 32
+
+class LRUCache:
+    """
+    Thread-safe LRU cache bounded by the total byte size of its values.
+    """
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+
+    def _insert(self, key, value):
+        # caller holds the lock
+        size = nbytes(value)
+        if key in self._entries:
+            self.size -= self._entries.pop(key)[1]
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (value, size)
+        self.size += size
+        while self.size > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.size -= evicted
+
+    def put(self, key, value):
+        with self._lock:
+            self._insert(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+class FeatureCache(LRUCache):
+    """
+    LRU feature cache with an optional on-disk tier.
+
+    Entries are dicts of analysis outputs; put() merges new outputs into an
+    existing entry so callers requesting different features share one key.
+    """
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES, cache_dir: str = CACHE_DIR):
+        super().__init__(max_bytes)
+        self.cache_dir = cache_dir
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def _load(self, key: str):
+        if self.cache_dir and os.path.exists(self._path(key)):
+            with open(self._path(key), "rb") as f:
+                return pickle.load(f)
+        return None
+
+    def get(self, key, default=None):
+        value = super().get(key)
+        if value is None:
+            value = self._load(key)
+            if value is not None:
+                LRUCache.put(self, key, value)
+        return default if value is None else value
+
+    def put(self, key, value: dict):
+        # read-merge-write under the lock, without counting a lookup
+        with self._lock:
+            entry = self._entries.get(key)
+            merged = {**((entry[0] if entry else self._load(key)) or {}), **value}
+            self._insert(key, merged)
+            if self.cache_dir:
+                tmp = f"{self._path(key)}.{os.getpid()}.tmp"
+                with open(tmp, "wb") as f:
+                    pickle.dump(merged, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp, self._path(key))
+
+    def clear(self):
+        super().clear()
+        if self.cache_dir:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".pkl"):
+                    os.remove(os.path.join(self.cache_dir, name))
+
+feature_cache = FeatureCache()
@@ -1,18 +1,21 @@
 import torch
-import torch_geometric.nn as gnn
-from models.eeg import analyze_eeg_band
+from torch_geometric.nn import GCNConv
+from models.eeg import BANDS, analyze_eeg_band, clean_eeg, spectral_features
 import numpy as np
 
 def gnn_connectivity(eeg_data: np.ndarray, sfreq: float) -> float:
     """
     Computes connectivity using GNNs.
+    Channels are nodes with their band powers as features, connected by their pairwise WPLI.
     """
-    features = analyze_eeg_band(eeg_data, sfreq)
-    wpli = np.array(features["connectivity_wpli"])
-    
-    edge_index = torch.tensor([[i, j] for i in range(wpli.shape[0]) for j in range(wpli.shape[1]) if wpli[i, j] > 0], dtype=torch.long).t()
-    x = torch.tensor(list(features["band_power"].values()), dtype=torch.float)
-    data = torch_geometric.data.Data(x=x, edge_index=edge_index)
-    
-    model = gnn.GCNConv(in_channels=5, out_channels=1)
-    return model(data.x, data.edge_index).mean().item()
+    wpli = analyze_eeg_band(eeg_data, sfreq, features=["wpli_matrix"], as_arrays=True)["wpli_matrix"]
+    band_power = spectral_features(clean_eeg(eeg_data, sfreq)[:, None, :], sfreq)["band_power"]
+
+    src, dst = np.nonzero((wpli > 0) & ~np.eye(len(wpli), dtype=bool))
+    edge_index = torch.tensor(np.stack([src, dst]), dtype=torch.long)
+    edge_weight = torch.tensor(wpli[src, dst], dtype=torch.float)
+    x = torch.tensor(band_power, dtype=torch.float)
+
+    model = GCNConv(in_channels=len(BANDS), out_channels=1)
+    with torch.no_grad():
+        return model(x, edge_index, edge_weight).mean().item()
@@ -1,8 +1,16 @@
+import os
 import numpy as np
 import pennylane as qml
 from pennylane import numpy as pnp
+from numpy.lib.stride_tricks import sliding_window_view
+from models.eeg import analyze_eeg_band, clean_eeg, spectral_features, C_FEATURES
+from models import synchrony
 from models.quantum import initialize_wave_packet, sample_vacuum_fluctuations
-from models.optimization import optimize_frequencies
+from dotenv import load_dotenv
+
+load_dotenv()
+# windows transformed at once by the batched C(t) path; bounds its memory whatever the hop
+CT_BLOCK_WINDOWS = int(os.getenv("QCL_CT_BLOCK_WINDOWS", "64"))
 
 def compute_consciousness(density_matrix: list, entanglement: float, entropy: float,
                          qft_noise: float, decoherence: float) -> dict:
@@ -17,7 +25,8 @@ def compute_consciousness(density_matrix: list, entanglement: float, entropy: fl
     Returns:
         Dictionary with C(t) and component values.
     """
-    rho = pnp.array(density_matrix).reshape((-1, -1))
+    dim = int(np.sqrt(len(density_matrix)))
+    rho = pnp.array(density_matrix).reshape((dim, dim))
     if not np.allclose(rho, rho.conj().T) or not np.allclose(np.trace(rho), 1):
         raise ValueError("Invalid density matrix")
     
@@ -46,35 +55,120 @@ def compute_consciousness(density_matrix: list, entanglement: float, entropy: fl
         "gamma_dec": decoherence
     }
 
-def compute_c_sigma(eeg_data: np.ndarray, sfreq: float, time_windows: int = 10) -> dict:
+def compute_consciousness_batch(density_matrices: np.ndarray, entanglement: np.ndarray, entropy: np.ndarray,
+                                qft_noise: np.ndarray, decoherence: np.ndarray) -> dict:
+    """
+    Vectorized compute_consciousness over a stack of density matrices.
+    Args:
+        density_matrices: Density matrices (n x d x d).
+        entanglement, entropy, qft_noise, decoherence: Per-matrix values (n,).
+    Returns:
+        Dictionary with arrays of C(t) and component values.
+    """
+    rho = np.asarray(density_matrices)
+    if not np.allclose(rho, np.conj(np.swapaxes(rho, -1, -2))) or not np.allclose(np.trace(rho, axis1=-2, axis2=-1), 1):
+        raise ValueError("Invalid density matrix")
+
+    # rho is Hermitian PSD, so its singular values are |eigenvalues|
+    s = np.abs(np.linalg.eigvalsh(rho))
+    phi_qm = np.sum(s**2, axis=-1)
+    kept = s > 1e-10
+    s2 = np.where(kept, s**2, 1.0)
+    computed_entanglement = -np.sum(np.where(kept, s2 * np.log2(s2), 0.0), axis=-1)
+    entanglement = np.minimum(entanglement, computed_entanglement)
+    s_vn = -np.sum(np.where(kept, s * np.log2(s + 1e-10), 0.0), axis=-1)
+
+    denominator = s_vn + qft_noise + decoherence
+    if np.any(np.abs(denominator) < 1e-10):
+        raise ValueError("Denominator near zero.")
+
+    return {
+        "C(t)": phi_qm * entanglement / denominator,
+        "phi_qm": phi_qm,
+        "entanglement": entanglement,
+        "s_vn": s_vn,
+        "qft_noise": np.asarray(qft_noise),
+        "gamma_dec": np.asarray(decoherence)
+    }
+
+def _c_t_block(cleaned: np.ndarray, unmixed: np.ndarray, sfreq: float) -> np.ndarray:
+    # C(t) of a block of windows (windows x channels x samples)
+    spectral = spectral_features(cleaned, sfreq)
+    band_values = spectral["band_power"]
+    weights = band_values / band_values.sum(axis=-1, keepdims=True)
+    density_matrices = weights[:, :, None] * np.eye(band_values.shape[-1])
+    entropy = -np.sum(band_values * np.log2(band_values + 1e-10), axis=-1) / band_values.sum(axis=-1)
+
+    # the wpli stage's estimator, on the ICA-cleaned windows
+    pairs = synchrony.upper_triangle(synchrony.connectivity_matrix(unmixed, sfreq, "wpli", fmin=1, fmax=100))
+    connectivity = pairs.mean(axis=-1) if pairs.shape[-1] else np.zeros(len(pairs))
+    decoherence = pairs.var(axis=-1) if pairs.shape[-1] else np.zeros(len(pairs))
+
+    return compute_consciousness_batch(
+        density_matrices, connectivity, entropy, spectral["qft_noise"], decoherence
+    )["C(t)"]
+
+def _c_t_batched(eeg_data: np.ndarray, sfreq: float, window_size: int, hop: int, max_windows: int = None,
+                 block: int = CT_BLOCK_WINDOWS) -> list:
+    unmixed, cleaned = clean_eeg(eeg_data, sfreq, unmixed=True)
+
+    def windowed(data):
+        # windows x channels x samples, as a strided view over the recording
+        windows = sliding_window_view(data, window_size, axis=1)[:, ::hop].transpose(1, 0, 2)
+        return windows if max_windows is None else windows[:max_windows]
+
+    # the views cost nothing; only `block` windows at a time are copied and transformed
+    cleaned_windows, unmixed_windows = windowed(cleaned), windowed(unmixed)
+    block = max(1, block)
+    return np.concatenate([
+        _c_t_block(cleaned_windows[i:i + block], unmixed_windows[i:i + block], sfreq)
+        for i in range(0, len(cleaned_windows), block)
+    ]).tolist()
+
+def compute_c_sigma(eeg_data: np.ndarray, sfreq: float, time_windows: int = 10, hop: int = None,
+                    batched: bool = True) -> dict:
     """
     Computes C_Σ(t) as time-averaged C(t) with coherence optimization.
     Args:
         eeg_data: EEG data (channels x samples).
         sfreq: Sampling frequency (Hz).
-        time_windows: Number of time windows for averaging.
+        time_windows: Number of time windows for averaging; sets the window length.
+        hop: Samples between window starts for overlapping sliding windows; defaults
+            to the window length, giving time_windows adjacent windows.
+        batched: Clean the recording once and compute all windows as one
+            (windows x channels x samples) tensor; False runs the full pipeline per window.
     Returns:
         Dictionary with C_Σ(t), C(t) values, and optimized frequencies.
     """
+    from models.optimization import optimize_frequencies
+
     window_size = eeg_data.shape[1] // time_windows
-    c_t_values = []
-    
-    for i in range(time_windows):
-        window_data = eeg_data[:, i*window_size:(i+1)*window_size]
-        features = analyze_eeg_band(window_data, sfreq)
-        rho = np.array(features["density_matrix"]).reshape((-1, -1))
-        c_t = compute_consciousness(
-            rho.flatten().tolist(),
-            features["connectivity_wpli"],
-            features["entropy"],
-            features["qft_noise"],
-            features["decoherence"]
-        )["C(t)"]
-        c_t_values.append(c_t)
-    
+    if window_size == 0:
+        raise ValueError("Recording shorter than the number of time windows")
+    if hop is not None and hop < 1:
+        raise ValueError("Hop must be at least 1 sample")
+
+    if batched:
+        c_t_values = _c_t_batched(eeg_data, sfreq, window_size, hop or window_size,
+                                  max_windows=None if hop else time_windows)
+    else:
+        starts = range(0, eeg_data.shape[1] - window_size + 1, hop) if hop else range(0, time_windows * window_size, window_size)
+        c_t_values = []
+        for start in starts:
+            window_data = eeg_data[:, start:start + window_size]
+            features = analyze_eeg_band(window_data, sfreq, features=C_FEATURES)
+            c_t = compute_consciousness(
+                features["density_matrix"],
+                features["connectivity_wpli"],
+                features["entropy"],
+                features["qft_noise"],
+                features["decoherence"]
+            )["C(t)"]
+            c_t_values.append(c_t)
+
     opt_freqs = optimize_frequencies(eeg_data, sfreq)
     c_sigma = float(np.mean(c_t_values))
-    
+
     return {
         "C_sigma(t)": c_sigma,
         "C(t)_values": c_t_values,
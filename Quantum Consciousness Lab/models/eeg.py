@@ -1,118 +1,258 @@
 import mne
 import numpy as np
-from mne.preprocessing import ICA
-from mne_connectivity import spectral_connectivity
-from scipy.fft import fft, fftfreq
-from scipy.signal import hilbert
-import pywt
+from scipy.fft import fft, fftfreq, rfft, rfftfreq
 import tensorly as tl
 import tensorly.decomposition
-import torch
-import torch.nn as nn
-
-class EEGCNN(nn.Module):
-    def __init__(self):
-        super().__init__()
-        self.conv1 = nn.Conv1d(4, 16, kernel_size=3)
-        self.fc = nn.Linear(16 * 998, 4 * 1000)
-    
-    def forward(self, x):
-        x = torch.relu(self.conv1(x))
-        x = x.view(x.size(0), -1)
-        return self.fc(x)
-
-def analyze_eeg_band(eeg_data: np.ndarray, sfreq: float) -> dict:
-    """
-    Analyzes EEG data with FFT, wavelet, Hilbert, tensor decomposition, and CNN artifact correction.
-    Args:
-        eeg_data: EEG data (channels x samples).
-        sfreq: Sampling frequency (Hz).
-    Returns:
-        Dictionary with band powers, connectivity, ErrP, and decomposition results.
-    """
-    if not isinstance(eeg_data, np.ndarray) or eeg_data.size == 0:
-        raise ValueError("Invalid EEG data")
-    if sfreq <= 0:
-        raise ValueError("Sampling frequency must be positive")
+from models.artifacts import artifact_store
+from models.cache import feature_cache, feature_key
+from models import synchrony, wavelet
+
+# Bump when stage implementations change so cached features are invalidated.
+PIPELINE_VERSION = "5"
+
+BANDS = {
+    'delta': (1, 4),
+    'theta': (4, 8),
+    'alpha': (8, 12),
+    'beta': (12, 30),
+    'gamma': (30, 100)
+}
+
+# Pipeline stages. Each stage reads the outputs of its dependencies from the
+# shared context dict and adds its own; analyze_eeg_band only runs the stages
+# needed for the requested features.
 
+def _stage_raw(ctx: dict) -> dict:
+    eeg_data, sfreq = ctx["eeg_data"], ctx["sfreq"]
     info = mne.create_info(ch_names=[f'ch{i+1}' for i in range(eeg_data.shape[0])], sfreq=sfreq, ch_types='eeg')
-    raw = mne.io.RawArray(eeg_data, info)
+    return {"raw": mne.io.RawArray(eeg_data, info)}
 
-    # ICA
-    ica = ICA(n_components=min(20, eeg_data.shape[0]), random_state=42)
-    ica.fit(raw)
-    raw_clean = ica.apply(raw.copy())
+def _stage_ica(ctx: dict) -> dict:
+    # ICA and CNN are calibrated per montage (models.artifacts); here they are only applied
+    raw = ctx["raw"]
+    model = ctx.get("artifact_model") or artifact_store().model(ctx["eeg_data"], ctx["sfreq"], raw.ch_names,
+                                                                ctx.get("subject"))
+    return {"artifact_model": model, "raw_clean": mne.io.RawArray(model.unmix(ctx["eeg_data"]), raw.info)}
 
-    # CNN artifact correction
-    model = EEGCNN()
-    eeg_tensor = torch.tensor(raw_clean.get_data(), dtype=torch.float32).unsqueeze(0)
-    cleaned_data = model(eeg_tensor).squeeze().detach().numpy()
+def _stage_cnn(ctx: dict) -> dict:
+    return {"cleaned_data": ctx["artifact_model"].denoise(ctx["raw_clean"].get_data())}
 
-    # FFT
+def _stage_fft(ctx: dict) -> dict:
+    cleaned_data = ctx["cleaned_data"]
     n_samples = cleaned_data.shape[1]
     fft_vals = fft(cleaned_data, axis=1)
-    freqs = fftfreq(n_samples, 1/sfreq)
+    freqs = fftfreq(n_samples, 1/ctx["sfreq"])
     psd = np.abs(fft_vals)**2 / n_samples
+    return {"fft_frequencies": freqs, "fft_power": psd, "qft_noise": float(np.std(psd))}
 
-    # Wavelet
-    scales = np.arange(1, 128)
-    coeffs, wavelet_freqs = pywt.cwt(cleaned_data, scales, 'morl', sampling_period=1/sfreq)
-
-    # Hilbert
-    analytic_signal = hilbert(cleaned_data, axis=1)
-    amplitude = np.abs(analytic_signal)
-    phase = np.angle(analytic_signal)
-    phase_sync = float(np.mean(np.cos(phase[:, :, None] - phase[:, None, :])))
-
-    # Tensor decomposition
-    tensor = tl.tensor(cleaned_data)
-    factors = tl.decomposition.parafac(tensor, rank=3)
-
-    bands = {
-        'delta': (1, 4),
-        'theta': (4, 8),
-        'alpha': (8, 12),
-        'beta': (12, 30),
-        'gamma': (30, 100)
-    }
+def _stage_band_power(ctx: dict) -> dict:
+    freqs, psd = ctx["fft_frequencies"], ctx["fft_power"]
     band_power = {}
-    wavelet_power = {}
-    for band, (low, high) in bands.items():
+    for band, (low, high) in BANDS.items():
         fft_idx = np.logical_and(freqs >= low, freqs <= high)
-        wavelet_idx = np.logical_and(wavelet_freqs >= low, wavelet_freqs <= high)
         band_power[band] = float(np.mean(psd[:, fft_idx]))
-        wavelet_power[band] = float(np.mean(np.abs(coeffs[wavelet_idx])**2))
+    return {"band_power": band_power}
+
+def _stage_wavelet(ctx: dict) -> dict:
+    coeffs, wavelet_freqs = wavelet.cwt(ctx["cleaned_data"], wavelet.DEFAULT_SCALES, 'morl', sampling_period=1/ctx["sfreq"])
+    return {"wavelet_coeffs": coeffs, "wavelet_frequencies": wavelet_freqs}
+
+def _stage_scalogram(ctx: dict) -> dict:
+    # wavelet power block-averaged over `decimate` samples, without the scales x channels x samples cube
+    result = wavelet.scalogram(ctx["cleaned_data"], ctx["sfreq"], wavelet.DEFAULT_SCALES, decimate=ctx.get("decimate", 8))
+    return {"wavelet_scalogram": result["power"], "scalogram_frequencies": result["frequencies"]}
+
+def _stage_wavelet_power(ctx: dict) -> dict:
+    # only the scales inside BANDS are transformed, chunk by chunk, without keeping the coefficients
+    return {"wavelet_power": wavelet.band_power(ctx["cleaned_data"], ctx["sfreq"], BANDS)}
 
-    # WPLI
-    con, _, _, _, _ = spectral_connectivity(raw_clean, method='wpli', fmin=1, fmax=100)
-    connectivity = float(np.mean(con))
+def _stage_hilbert(ctx: dict) -> dict:
+    # mean cos(phi_i - phi_j) over channel pairs and samples, without a channels x channels x samples array
+    return {"phase_sync": synchrony.phase_sync(ctx["cleaned_data"])}
 
-    # ErrP
+def _stage_tensor(ctx: dict) -> dict:
+    tensor = tl.tensor(ctx["cleaned_data"])
+    factors = tl.decomposition.parafac(tensor, rank=3)
+    return {"tensor_factors": factors[1]}
+
+def _stage_wpli(ctx: dict) -> dict:
+    wpli = synchrony.connectivity_matrix(ctx["raw_clean"].get_data(), ctx["sfreq"], "wpli", fmin=1, fmax=100)
+    pairs = synchrony.upper_triangle(wpli)
+    return {"wpli_matrix": wpli, "connectivity_wpli": float(np.mean(pairs)) if pairs.size else 0.0,
+            "decoherence": float(np.var(pairs)) if pairs.size else 0.0}
+
+def _stage_errp(ctx: dict) -> dict:
+    sfreq = ctx["sfreq"]
     time_window = int(0.2 * sfreq), int(0.5 * sfreq)
-    errp_data = raw_clean.get_data()[:, time_window[0]:time_window[1]]
+    errp_data = ctx["raw_clean"].get_data()[:, time_window[0]:time_window[1]]
     errp_fft = fft(errp_data, axis=1)
     errp_freqs = fftfreq(errp_data.shape[1], 1/sfreq)
     errp_idx = np.logical_and(errp_freqs >= 4, errp_freqs <= 8)
-    errp_power = float(np.mean(np.abs(errp_fft[:, errp_idx])**2))
+    return {"errp_power": float(np.mean(np.abs(errp_fft[:, errp_idx])**2))}
 
-    # Density matrix
-    band_values = np.array([band_power[band] for band in bands])
+def _stage_density(ctx: dict) -> dict:
+    band_values = np.array([ctx["band_power"][band] for band in BANDS])
     rho = np.diag(band_values / np.sum(band_values))
     s_vn = -np.sum(band_values * np.log2(band_values + 1e-10)) / np.sum(band_values)
+    return {"density_matrix": rho.flatten(), "entropy": float(s_vn)}
+
+# name -> (dependencies, stage function)
+STAGES = {
+    "raw": ((), _stage_raw),
+    "ica": (("raw",), _stage_ica),
+    "cnn": (("ica",), _stage_cnn),
+    "fft": (("cnn",), _stage_fft),
+    "band_power": (("fft",), _stage_band_power),
+    "wavelet": (("cnn",), _stage_wavelet),
+    "scalogram": (("cnn",), _stage_scalogram),
+    "wavelet_power": (("cnn",), _stage_wavelet_power),
+    "hilbert": (("cnn",), _stage_hilbert),
+    "tensor": (("cnn",), _stage_tensor),
+    "wpli": (("ica",), _stage_wpli),
+    "errp": (("ica",), _stage_errp),
+    "density": (("band_power",), _stage_density),
+}
+
+# Public output -> stage that produces it.
+FEATURES = {
+    "band_power": "band_power",
+    "wavelet_power": "wavelet_power",
+    "connectivity_wpli": "wpli",
+    "wpli_matrix": "wpli",
+    "errp_power": "errp",
+    "density_matrix": "density",
+    "entropy": "density",
+    "qft_noise": "fft",
+    "decoherence": "wpli",
+    "fft_frequencies": "fft",
+    "fft_power": "fft",
+    "wavelet_coeffs": "wavelet",
+    "wavelet_frequencies": "wavelet",
+    "wavelet_scalogram": "scalogram",
+    "scalogram_frequencies": "scalogram",
+    "phase_sync": "hilbert",
+    "tensor_factors": "tensor",
+}
+
+# Features consumed by models.consciousness.compute_consciousness.
+C_FEATURES = ["density_matrix", "connectivity_wpli", "entropy", "qft_noise", "decoherence"]
+
+def resolve_stages(features) -> list:
+    """
+    Returns the stages needed to compute the given features, in execution order.
+    """
+    unknown = [f for f in features if f not in FEATURES]
+    if unknown:
+        raise ValueError(f"Unknown EEG features: {unknown}")
+    order = []
+    def visit(stage):
+        if stage in order:
+            return
+        for dep in STAGES[stage][0]:
+            visit(dep)
+        order.append(stage)
+    for feature in features:
+        visit(FEATURES[feature])
+    return order
+
+def clean_eeg(eeg_data: np.ndarray, sfreq: float, subject: str = None, unmixed: bool = False):
+    """
+    Runs the ICA and CNN artifact-correction stages and returns the cleaned data,
+    or (ICA-cleaned data, cleaned data) with unmixed=True.
+    """
+    ctx = {"eeg_data": eeg_data, "sfreq": sfreq, "subject": subject}
+    for stage in ("raw", "ica", "cnn"):
+        ctx.update(STAGES[stage][1](ctx))
+    if unmixed:
+        return ctx["raw_clean"].get_data(), ctx["cleaned_data"]
+    return ctx["cleaned_data"]
+
+def spectral_features(data: np.ndarray, sfreq: float) -> dict:
+    """
+    Vectorized band power and QFT noise over any leading axes.
+    Args:
+        data: EEG data (... x channels x samples), e.g. windows x channels x samples.
+        sfreq: Sampling frequency (Hz).
+    Returns:
+        Dictionary with "band_power" (... x bands, ordered as BANDS) and "qft_noise" (...).
+    """
+    n_samples = data.shape[-1]
+    psd = np.abs(rfft(data, axis=-1))**2 / n_samples
+    freqs = rfftfreq(n_samples, 1/sfreq)
+    band_power = np.stack([
+        psd[..., np.logical_and(freqs >= low, freqs <= high)].mean(axis=(-2, -1))
+        for low, high in BANDS.values()
+    ], axis=-1)
+
+    # std of the two-sided spectrum, counting mirrored bins twice
+    weights = np.full(freqs.shape, 2.0)
+    weights[0] = 1.0
+    if n_samples % 2 == 0:
+        weights[-1] = 1.0
+    total = data.shape[-2] * n_samples
+    mean = (psd * weights).sum(axis=(-2, -1)) / total
+    var = (weights * (psd - mean[..., None, None])**2).sum(axis=(-2, -1)) / total
+    return {"band_power": band_power, "qft_noise": np.sqrt(var)}
+
+def _readonly(value):
+    # cached arrays are shared between calls, so callers get views they cannot modify
+    if isinstance(value, np.ndarray):
+        view = value.view()
+        view.flags.writeable = False
+        return view
+    if isinstance(value, (list, tuple)):
+        return [_readonly(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _readonly(v) for k, v in value.items()}
+    return value
+
+def _to_builtin(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (list, tuple)):
+        return [_to_builtin(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _to_builtin(v) for k, v in value.items()}
+    return value
+
+def analyze_eeg_band(eeg_data: np.ndarray, sfreq: float, features: list = None, cache: bool = True,
+                     as_arrays: bool = False, subject: str = None, decimate: int = 8) -> dict:
+    """
+    Analyzes EEG data with FFT, wavelet, Hilbert, tensor decomposition, and CNN artifact correction.
+    Args:
+        eeg_data: EEG data (channels x samples).
+        sfreq: Sampling frequency (Hz).
+        features: Outputs to compute (see FEATURES); None computes all of them.
+        cache: Reuse features already computed for identical data (see models.cache).
+        as_arrays: Return spectra and decompositions as read-only NumPy arrays instead of lists.
+        subject: Subject whose fitted artifact-correction model to use (see models.artifacts).
+        decimate: Samples averaged per column of wavelet_scalogram.
+    Returns:
+        Dictionary with band powers, connectivity, ErrP, and decomposition results.
+    """
+    if not isinstance(eeg_data, np.ndarray) or eeg_data.size == 0:
+        raise ValueError("Invalid EEG data")
+    if sfreq <= 0:
+        raise ValueError("Sampling frequency must be positive")
+    features = list(FEATURES) if features is None else list(features)
+
+    ctx = {"eeg_data": eeg_data, "sfreq": sfreq, "subject": subject, "decimate": decimate}
+    if cache:
+        # features depend on the fitted artifact model, so a refit must not hit entries of the old one
+        model = ctx["artifact_model"] = artifact_store().model(eeg_data, sfreq, subject=subject)
+        key = feature_key(eeg_data, sfreq, {"pipeline": PIPELINE_VERSION, "artifact_model": model.key,
+                                            "artifact_fit": model.fingerprint(), "decimate": decimate})
+    cached = feature_cache.get(key, {}) if cache else {}
+    missing = [feature for feature in features if feature not in cached]
+
+    if missing:
+        for stage in resolve_stages(missing):
+            ctx.update(STAGES[stage][1](ctx))
+        computed = {feature: ctx[feature] for feature in FEATURES if feature in ctx}
+        if cache:
+            feature_cache.put(key, computed)
+        cached = {**cached, **computed}
 
-    return {
-        "band_power": band_power,
-        "wavelet_power": wavelet_power,
-        "connectivity_wpli": connectivity,
-        "errp_power": errp_power,
-        "density_matrix": rho.flatten().tolist(),
-        "entropy": s_vn,
-        "qft_noise": float(np.std(psd)),
-        "decoherence": float(np.var(con)),
-        "fft_frequencies": freqs.tolist(),
-        "fft_power": psd.tolist(),
-        "wavelet_coeffs": coeffs.tolist(),
-        "wavelet_frequencies": wavelet_freqs.tolist(),
-        "phase_sync": phase_sync,
-        "tensor_factors": [f.tolist() for f in factors[1]]
-      }
+    if as_arrays:
+        return {feature: _readonly(cached[feature]) for feature in features}
+    return {feature: _to_builtin(cached[feature]) for feature in features}
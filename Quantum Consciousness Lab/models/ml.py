@@ -1,52 +1,70 @@
-from sklearn.svm import SVC
-from sklearn.ensemble import RandomForestClassifier
-from xgboost import XGBClassifier
-from pennylane import qnn
 import numpy as np
 from models.eeg import analyze_eeg_band
+from models.registry import predict
+
+BAND_ORDER = ['delta', 'theta', 'alpha', 'beta', 'gamma']
+
+def eeg_feature_vector(eeg_data: np.ndarray, sfreq: float) -> np.ndarray:
+    """
+    Band powers, WPLI and entropy (7,) used by classify_eeg.
+    """
+    features = analyze_eeg_band(eeg_data, sfreq, features=["band_power", "connectivity_wpli", "entropy"])
+    return np.array([features["band_power"][band] for band in BAND_ORDER] + [features["connectivity_wpli"], features["entropy"]])
+
+def emotion_feature_vector(eeg_data: np.ndarray, sfreq: float) -> np.ndarray:
+    """
+    Band powers (5,) used by classify_emotion.
+    """
+    features = analyze_eeg_band(eeg_data, sfreq, features=["band_power"])
+    return np.array([features["band_power"][band] for band in BAND_ORDER])
+
+def hybrid_feature_vector(eeg_data: np.ndarray, sfreq: float) -> np.ndarray:
+    """
+    Band powers and WPLI (6,) used by hybrid_classifier.
+    """
+    features = analyze_eeg_band(eeg_data, sfreq, features=["band_power", "connectivity_wpli"])
+    return np.array([features["band_power"][band] for band in BAND_ORDER] + [features["connectivity_wpli"]])
+
+def classify_eeg_batch(X: np.ndarray, version: str = None) -> list:
+    """
+    Classifies EEG feature vectors (n x 7) with the registered SVM.
+    """
+    result = predict("svm_eeg", X, version)
+    return [{"prediction": p.item(), "probabilities": [probs.tolist()], "classes": result["classes"], "model_version": result["version"]}
+            for p, probs in zip(result["predictions"], result["probabilities"])]
+
+def classify_emotion_batch(X: np.ndarray, version: str = None) -> list:
+    """
+    Classifies emotion feature vectors (n x 5) with the registered RandomForest.
+    """
+    result = predict("rf_emotion", X, version)
+    return [{"emotion": [p.item()], "classes": result["classes"], "model_version": result["version"]}
+            for p in result["predictions"]]
+
+def hybrid_classifier_batch(X: np.ndarray) -> list:
+    """
+    Averages the registered QNN and XGBoost probabilities for hybrid feature vectors (n x 6).
+    """
+    qnn = predict("qnn_hybrid", X)
+    xgb = predict("xgb_hybrid", X)
+    ensemble = 0.5 * qnn["probabilities"] + 0.5 * xgb["probabilities"]
+    return [{"prediction": int(np.argmax(probs)), "probabilities": probs.tolist(),
+             "model_version": {"qnn": qnn["version"], "xgb": xgb["version"]}} for probs in ensemble]
 
 def classify_eeg(eeg_data: np.ndarray, sfreq: float) -> dict:
     """
     Classifies EEG patterns using SVM.
     """
-    features = analyze_eeg_band(eeg_data, sfreq)
-    X = np.array([features["band_power"][band] for band in ['delta', 'theta', 'alpha', 'beta', 'gamma']] + [features["connectivity_wpli"], features["entropy"]])
-    
-    model = SVC(probability=True)
-    model.fit(X.reshape(1, -1), [0])  # Placeholder training
-    prediction = model.predict(X.reshape(1, -1))
-    return {"prediction": int(prediction[0]), "probabilities": model.predict_proba(X.reshape(1, -1)).tolist(), "classes": ["normal", "altered"]}
+    return classify_eeg_batch(eeg_feature_vector(eeg_data, sfreq)[None])[0]
 
 def classify_emotion(eeg_data: np.ndarray, sfreq: float) -> dict:
     """
     Classifies emotions using RandomForest.
     """
-    features = analyze_eeg_band(eeg_data, sfreq)
-    X = np.array([features["band_power"][band] for band in ['delta', 'theta', 'alpha', 'beta', 'gamma']])
-    model = RandomForestClassifier()
-    model.fit(X.reshape(1, -1), [0])
-    return {"emotion": model.predict(X.reshape(1, -1)).tolist(), "classes": ["happy", "sad", "neutral"]}
+    return classify_emotion_batch(emotion_feature_vector(eeg_data, sfreq)[None])[0]
 
 def hybrid_classifier(eeg_data: np.ndarray, sfreq: float) -> dict:
     """
     Combines QNN and XGBoost for hybrid classification.
     """
-    features = analyze_eeg_band(eeg_data, sfreq)
-    inputs = np.array([features["band_power"][band] for band in ['delta', 'theta', 'alpha', 'beta', 'gamma']] + [features["connectivity_wpli"]])
-    
-    dev = qml.device("default.qubit", wires=4)
-    @qml.qnode(dev)
-    def qnn_circuit(inputs, weights):
-        qml.AngleEmbedding(inputs[:4], wires=range(4))
-        qml.StronglyEntanglingLayers(weights, wires=range(4))
-        return [qml.expval(qml.PauliZ(i)) for i in range(4)]
-    
-    weight_shapes = {"weights": (3, 4, 3)}
-    qnn_model = qnn.KerasLayer(qnn_circuit, weight_shapes, output_dim=4)
-    qnn_pred = qnn_model(inputs)
-    
-    xgb_model = XGBClassifier()
-    xgb_pred = xgb_model.predict_proba(inputs.reshape(1, -1))
-    
-    ensemble_pred = 0.5 * qnn_pred + 0.5 * xgb_pred[0]
-    return {"prediction": np.argmax(ensemble_pred), "probabilities": ensemble_pred.tolist()}
+    return hybrid_classifier_batch(hybrid_feature_vector(eeg_data, sfreq)[None])[0]
@@ -6,7 +6,7 @@ def neuromorphic_simulation(eeg_data: np.ndarray, sfreq: float) -> dict:
     """
     Simulates EEG data on neuromorphic hardware.
     """
-    features = analyze_eeg_band(eeg_data, sfreq)
+    features = analyze_eeg_band(eeg_data, sfreq, features=["band_power"])
     spikes = np.array([features["band_power"][band] for band in ['delta', 'theta', 'alpha', 'beta', 'gamma']])
     
     chip = Loihi2()
@@ -1,9 +1,10 @@
 import torch
 import torch.optim as optim
 from stable_baselines3 import PPO, DQN
+from stable_baselines3.common.callbacks import BaseCallback
 import gym
 from pennylane import qaoa
-from models.eeg import analyze_eeg_band
+from models.eeg import analyze_eeg_band, C_FEATURES
 from models.consciousness import compute_consciousness
 import numpy as np
 
@@ -19,17 +20,16 @@ class ConsciousnessEnv(gym.Env):
         self.observation_space = gym.spaces.Box(low=0, high=1, shape=(7,))
     
     def reset(self):
-        features = analyze_eeg_band(self.eeg_data, self.sfreq)
+        features = analyze_eeg_band(self.eeg_data, self.sfreq, features=["band_power", "connectivity_wpli", "entropy"])
         self.state = np.array([
             features["band_power"][band] for band in ['delta', 'theta', 'alpha', 'beta', 'gamma']
         ] + [features["connectivity_wpli"], features["entropy"]])
         return self.state
     
     def step(self, action):
-        features = analyze_eeg_band(self.eeg_data, self.sfreq)
-        rho = np.array(features["density_matrix"]).reshape((-1, -1))
+        features = analyze_eeg_band(self.eeg_data, self.sfreq, features=C_FEATURES)
         c_t = compute_consciousness(
-            rho.flatten().tolist(),
+            features["density_matrix"],
             features["connectivity_wpli"],
             features["entropy"],
             features["qft_noise"],
@@ -39,11 +39,24 @@ class ConsciousnessEnv(gym.Env):
         done = False
         return self.state, reward, done, {}
 
+class ProgressCallback(BaseCallback):
+    """
+    Reports training progress as a fraction of total timesteps.
+    """
+    def __init__(self, progress, total_timesteps: int):
+        super().__init__()
+        self.progress = progress
+        self.total_timesteps = total_timesteps
+
+    def _on_step(self) -> bool:
+        self.progress(min(self.num_timesteps / self.total_timesteps, 1.0))
+        return True
+
 def optimize_frequencies(eeg_data: np.ndarray, sfreq: float, n_iterations: int = 100) -> dict:
     """
     Optimizes frequencies f1, f2 to maximize ErrP power.
     """
-    features = analyze_eeg_band(eeg_data, sfreq)
+    features = analyze_eeg_band(eeg_data, sfreq, features=["errp_power"])
     errp_power = features["errp_power"]
     
     f1 = torch.tensor([4.0], requires_grad=True)
@@ -58,31 +71,31 @@ def optimize_frequencies(eeg_data: np.ndarray, sfreq: float, n_iterations: int =
     
     return {"f1": float(f1), "f2": float(f2)}
 
-def stabilize_coherence(eeg_data: np.ndarray, sfreq: float) -> dict:
+def stabilize_coherence(eeg_data: np.ndarray, sfreq: float, progress=None) -> dict:
     """
     Stabilizes coherence using PPO.
     """
     env = ConsciousnessEnv(eeg_data, sfreq)
     model = PPO("MlpPolicy", env, verbose=0)
-    model.learn(total_timesteps=1000)
+    model.learn(total_timesteps=1000, callback=ProgressCallback(progress, 1000) if progress else None)
     
     obs = env.reset()
     action, _ = model.predict(obs)
     return {"optimized_f1": float(action[0]), "optimized_f2": float(action[1])}
 
-def stabilize_coherence_dqn(eeg_data: np.ndarray, sfreq: float) -> dict:
+def stabilize_coherence_dqn(eeg_data: np.ndarray, sfreq: float, progress=None) -> dict:
     """
     Stabilizes coherence using DQN.
     """
     env = ConsciousnessEnv(eeg_data, sfreq)
     model = DQN("MlpPolicy", env, verbose=0, learning_rate=0.001)
-    model.learn(total_timesteps=2000)
+    model.learn(total_timesteps=2000, callback=ProgressCallback(progress, 2000) if progress else None)
     
     obs = env.reset()
     action, _ = model.predict(obs)
     return {"optimized_f1": float(action[0]), "optimized_f2": float(action[1])}
 
-def qaoa_feedback(eeg_data: np.ndarray, sfreq: float) -> dict:
+def qaoa_feedback(eeg_data: np.ndarray, sfreq: float, progress=None) -> dict:
     """
     Uses QAOA for coherence optimization.
     """
@@ -94,6 +107,8 @@ def qaoa_feedback(eeg_data: np.ndarray, sfreq: float) -> dict:
     
     params = pnp.random.uniform(0, np.pi, 2)
     opt = qml.AdamOptimizer()
-    for _ in range(50):
+    for i in range(50):
         params = opt.step(qaoa_circuit, params)
+        if progress:
+            progress((i + 1) / 50)
     return {"optimized_params": params.tolist()}
@@ -1,39 +1,141 @@
+import functools
 import pennylane as qml
 from pennylane import numpy as pnp
 import numpy as np
 from models.eeg import analyze_eeg_band
 
-def initialize_wave_packet(eeg_data: np.ndarray, sfreq: float, t: float = 0.0) -> dict:
+FREQUENCY_BANDS = [(1, 4), (4, 8), (8, 12), (12, 30), (30, 100)]
+
+# Circuit registry: devices and QNodes are built once per (device, wires) and
+# reused; everything that varies per call is passed in as a circuit argument.
+
+@functools.lru_cache(maxsize=None)
+def get_device(name: str, wires: int):
     """
-    Initializes |ψ(t)> as a multi-frequency wave packet.
+    Returns a shared PennyLane device.
     """
-    features = analyze_eeg_band(eeg_data, sfreq)
-    band_power = features["band_power"]
-    frequencies = [(1, 4), (4, 8), (8, 12), (12, 30), (30, 100)]
-    amplitudes = pnp.array([band_power[band] for band in ['delta', 'theta', 'alpha', 'beta', 'gamma']])
-    amplitudes = amplitudes / pnp.sum(amplitudes)
-    
-    n_qubits = len(frequencies)
-    dev = qml.device("default.qubit", wires=n_qubits)
-    
-    @qml.qnode(dev)
-    def wave_packet_circuit():
-        for i, (freq_range, amp) in enumerate(zip(frequencies, amplitudes)):
-            freq = (freq_range[0] + freq_range[1]) / 2
-            qml.RX(amp * pnp.cos(2 * pnp.pi * freq * t), wires=i)
-            qml.RY(amp * pnp.sin(2 * pnp.pi * freq * t), wires=i)
+    return qml.device(name, wires=wires)
+
+@functools.lru_cache(maxsize=None)
+def wave_packet_qnode(n_qubits: int):
+    @qml.qnode(get_device("default.qubit", n_qubits))
+    def wave_packet_circuit(rx, ry):
+        for i in range(n_qubits):
+            qml.RX(rx[..., i], wires=i)
+            qml.RY(ry[..., i], wires=i)
             qml.Hadamard(wires=i)
         for i in range(n_qubits - 1):
             qml.CNOT(wires=[i, i + 1])
         return qml.state()
-    
-    state = wave_packet_circuit()
+    return wave_packet_circuit
+
+@functools.lru_cache(maxsize=None)
+def fluctuation_qnode(n_wires: int):
+    @qml.qnode(get_device("default.mixed", n_wires))
+    def fluctuation_circuit(rho, phases):
+        qml.QubitDensityMatrix(rho, wires=range(n_wires))
+        for i in range(n_wires):
+            qml.PhaseShift(phases[..., i], wires=i)
+        qml.QFT(wires=range(n_wires))
+        return qml.probs()
+    return fluctuation_circuit
+
+@functools.lru_cache(maxsize=None)
+def ansatz_qnode(n_qubits: int):
+    @qml.qnode(get_device("default.qubit", n_qubits))
+    def ansatz_circuit(params):
+        for i in range(n_qubits):
+            qml.RX(params[i], wires=i)
+            qml.RY(params[i + n_qubits], wires=i)
+        for i in range(n_qubits - 1):
+            qml.CNOT(wires=[i, i + 1])
+        return qml.state()
+    return ansatz_circuit
+
+@functools.lru_cache(maxsize=None)
+def error_correction_qnode():
+    @qml.qnode(get_device("default.mixed", 3))
+    def error_correction_circuit(rho):
+        qml.QubitDensityMatrix(rho, wires=[0])
+        qml.CNOT(wires=[0, 1])
+        qml.CNOT(wires=[0, 2])
+        return qml.state()
+    return error_correction_circuit
+
+def band_amplitudes(band_power: dict) -> np.ndarray:
+    amplitudes = np.array([band_power[band] for band in ['delta', 'theta', 'alpha', 'beta', 'gamma']])
+    return amplitudes / np.sum(amplitudes)
+
+@functools.lru_cache(maxsize=None)
+def _cnot_ladder_permutation(n_qubits: int) -> np.ndarray:
+    # CNOT(i, i+1) for i = 0..n-2 maps basis index x to y; return y -> x for gathering
+    bits = (np.arange(2**n_qubits)[:, None] >> np.arange(n_qubits - 1, -1, -1)) & 1
+    for i in range(n_qubits - 1):
+        bits[:, i + 1] ^= bits[:, i]
+    targets = bits @ (1 << np.arange(n_qubits - 1, -1, -1))
+    return np.argsort(targets)
+
+def wave_packet_states(amplitudes: np.ndarray, t, density_matrix: bool = False) -> dict:
+    """
+    Closed-form |ψ(t)> of the wave-packet circuit, vectorized over recordings and times.
+
+    Each qubit is H·RY·RX|0>, so the state is a Kronecker product of single-qubit
+    states followed by the fixed CNOT-ladder permutation; wave_packet_qnode is
+    the reference implementation.
+    Args:
+        amplitudes: Normalized band amplitudes (... x n_bands), e.g. recordings x bands.
+        t: Time value or array of time values (T,).
+        density_matrix: Also return |ψ><ψ|.
+    Returns:
+        Dictionary with "statevector" (... x T x 2**n_bands) and optionally
+        "density_matrix" (... x T x 2**n_bands x 2**n_bands).
+    """
+    amplitudes = np.asarray(amplitudes, dtype=float)
+    t = np.atleast_1d(np.asarray(t, dtype=float))
+    n_qubits = amplitudes.shape[-1]
+    freqs = np.array([(low + high) / 2 for low, high in FREQUENCY_BANDS[:n_qubits]])
+
+    phase = 2 * np.pi * freqs * t[:, None]
+    half_rx = amplitudes[..., None, :] * np.cos(phase) / 2
+    half_ry = amplitudes[..., None, :] * np.sin(phase) / 2
+    c, s = np.cos(half_ry), np.sin(half_ry)
+    v0 = c * np.cos(half_rx) + 1j * s * np.sin(half_rx)
+    v1 = s * np.cos(half_rx) - 1j * c * np.sin(half_rx)
+    qubits = np.stack([v0 + v1, v0 - v1], axis=-1) / np.sqrt(2)
+
+    state = qubits[..., 0, :]
+    for i in range(1, n_qubits):
+        state = (state[..., :, None] * qubits[..., i, None, :]).reshape(state.shape[:-1] + (-1,))
+    state = state[..., _cnot_ladder_permutation(n_qubits)]
+
+    result = {"statevector": state}
+    if density_matrix:
+        result["density_matrix"] = state[..., :, None] * np.conj(state[..., None, :])
+    return result
+
+def initialize_wave_packet(eeg_data: np.ndarray, sfreq: float, t: float = 0.0, method: str = "analytic") -> dict:
+    """
+    Initializes |ψ(t)> as a multi-frequency wave packet.
+    method="circuit" simulates the PennyLane circuit instead of the closed form.
+    """
+    features = analyze_eeg_band(eeg_data, sfreq, features=["band_power"])
+    amplitudes = band_amplitudes(features["band_power"])
+    freqs = np.array([(low + high) / 2 for low, high in FREQUENCY_BANDS])
+
+    if method == "circuit":
+        state = wave_packet_qnode(len(FREQUENCY_BANDS))(
+            amplitudes * np.cos(2 * np.pi * freqs * t), amplitudes * np.sin(2 * np.pi * freqs * t)
+        )
+    elif method == "analytic":
+        state = wave_packet_states(amplitudes, t)["statevector"][0]
+    else:
+        raise ValueError(f"Unknown method: {method}")
     rho = pnp.outer(state, pnp.conj(state))
-    
+
     return {
         "statevector": state.tolist(),
         "density_matrix": rho.tolist(),
-        "frequencies": [(f[0] + f[1]) / 2 for f in frequencies],
+        "frequencies": freqs.tolist(),
         "amplitudes": amplitudes.tolist()
     }
 
@@ -41,59 +143,36 @@ def sample_vacuum_fluctuations(rho: np.ndarray, n_samples: int = 100) -> float:
     """
     Simulates vacuum fluctuations as phase noise.
     """
-    dev = qml.device("default.mixed", wires=int(np.log2(rho.shape[0])))
-    
-    @qml.qnode(dev)
-    def fluctuation_circuit():
-        qml.QubitDensityMatrix(rho, wires=range(int(np.log2(rho.shape[0]))))
-        for i in range(int(np.log2(rho.shape[0]))):
-            qml.PhaseShift(pnp.random.uniform(0, 0.1), wires=i)
-        qml.QFT(wires=range(int(np.log2(rho.shape[0]))))
-        return qml.probs()
-    
-    noises = [fluctuation_circuit() for _ in range(n_samples)]
-    return float(pnp.mean([pnp.std(probs) for probs in noises]))
+    n_wires = int(np.log2(rho.shape[0]))
+    # all random phase shifts run as one broadcast execution: probs is (n_samples, 2**n_wires)
+    phases = np.random.uniform(0, 0.1, size=(n_samples, n_wires))
+    probs = fluctuation_qnode(n_wires)(rho, phases)
+    return float(np.mean(np.std(np.reshape(probs, (n_samples, -1)), axis=1)))
 
-def vqe_optimize_wave_packet(eeg_data: np.ndarray, sfreq: float, n_iterations: int = 100) -> dict:
+def vqe_optimize_wave_packet(eeg_data: np.ndarray, sfreq: float, n_iterations: int = 100, progress=None) -> dict:
     """
     Optimizes |ψ(t)> using Variational Quantum Eigensolver.
     """
-    features = analyze_eeg_band(eeg_data, sfreq)
-    band_power = features["band_power"]
-    amplitudes = pnp.array([band_power[band] for band in ['delta', 'theta', 'alpha', 'beta', 'gamma']])
-    amplitudes = amplitudes / pnp.sum(amplitudes)
-    
-    n_qubits = len(amplitudes)
-    dev = qml.device("default.qubit", wires=n_qubits)
-    
-    def ansatz(params):
-        for i in range(n_qubits):
-            qml.RX(params[i], wires=i)
-            qml.RY(params[i + n_qubits], wires=i)
-        for i in range(n_qubits - 1):
-            qml.CNOT(wires=[i, i + 1])
-    
-    @qml.qnode(dev)
+    features = analyze_eeg_band(eeg_data, sfreq, features=["band_power"])
+    n_qubits = len(band_amplitudes(features["band_power"]))
+    circuit = ansatz_qnode(n_qubits)
+
     def cost_fn(params):
-        ansatz(params)
-        state = qml.state()
+        state = circuit(params)
         rho = pnp.outer(state, pnp.conj(state))
-        return -pnp.trace(rho @ rho)
-    
+        return -pnp.real(pnp.trace(rho @ rho))
+
     params = pnp.random.uniform(0, np.pi, 2 * n_qubits, requires_grad=True)
     opt = qml.AdamOptimizer(stepsize=0.1)
-    
-    for _ in range(n_iterations):
+
+    for i in range(n_iterations):
         params = opt.step(cost_fn, params)
-    
-    @qml.qnode(dev)
-    def optimized_circuit():
-        ansatz(params)
-        return qml.state()
-    
-    state = optimized_circuit()
+        if progress:
+            progress((i + 1) / n_iterations)
+
+    state = circuit(params)
     rho = pnp.outer(state, pnp.conj(state))
-    
+
     return {
         "statevector": state.tolist(),
         "density_matrix": rho.tolist(),
@@ -104,11 +183,4 @@ def apply_error_correction(rho: np.ndarray) -> np.ndarray:
     """
     Applies quantum error correction (bit-flip code).
     """
-    dev = qml.device("default.mixed", wires=3)
-    @qml.qnode(dev)
-    def error_correction_circuit():
-        qml.QubitDensityMatrix(rho, wires=[0])
-        qml.CNOT(wires=[0, 1])
-        qml.CNOT(wires=[0, 2])
-        return qml.state()
-    return error_correction_circuit()
+    return error_correction_qnode()(rho)
@@ -0,0 +1,270 @@
+import argparse
+import os
+import threading
+import warnings
+from typing import NamedTuple
+import joblib
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+MODEL_DIR = os.getenv("QCL_MODEL_DIR", os.path.join("data", "pretrained_models"))
+
+PLACEHOLDER = "placeholder"
+
+def _svc():
+    from sklearn.svm import SVC
+    return SVC(probability=True)
+
+def _random_forest():
+    from sklearn.ensemble import RandomForestClassifier
+    return RandomForestClassifier()
+
+def _xgboost():
+    from xgboost import XGBClassifier
+    return XGBClassifier()
+
+def _qnn():
+    import pennylane as qml
+    from pennylane import qnn
+    from models.quantum import get_device
+
+    @qml.qnode(get_device("default.qubit", 4), interface="torch")
+    def qnn_circuit(inputs, weights):
+        qml.AngleEmbedding(inputs[..., :4], wires=range(4))
+        qml.StronglyEntanglingLayers(weights, wires=range(4))
+        return [qml.expval(qml.PauliZ(i)) for i in range(4)]
+
+    return qnn.TorchLayer(qnn_circuit, {"weights": (3, 4, 3)})
+
+class ModelSpec(NamedTuple):
+    build: object
+    format: str
+    classes: list
+    n_features: int
+    features: str
+
+# name -> how to build, persist and feed a model; `features` names the models.ml feature-vector function.
+MODEL_SPECS = {
+    "svm_eeg": ModelSpec(_svc, "joblib", ["normal", "altered"], 7, "eeg_feature_vector"),
+    "rf_emotion": ModelSpec(_random_forest, "joblib", ["happy", "sad", "neutral"], 5, "emotion_feature_vector"),
+    "xgb_hybrid": ModelSpec(_xgboost, "xgboost", ["0", "1", "2", "3"], 6, "hybrid_feature_vector"),
+    "qnn_hybrid": ModelSpec(_qnn, "torch", ["0", "1", "2", "3"], 6, "hybrid_feature_vector"),
+}
+
+EXTENSIONS = {"joblib": ".joblib", "xgboost": ".json", "torch": ".pth"}
+
+def _load(spec: ModelSpec, path: str):
+    if spec.format == "joblib":
+        return joblib.load(path)
+    model = spec.build()
+    if spec.format == "xgboost":
+        model.load_model(path)
+    else:
+        import torch
+        model.load_state_dict(torch.load(path))
+    return model
+
+def _save(spec: ModelSpec, model, path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if spec.format == "joblib":
+        joblib.dump(model, path)
+    elif spec.format == "xgboost":
+        model.save_model(path)
+    else:
+        import torch
+        torch.save(model.state_dict(), path)
+
+def _fit(spec: ModelSpec, model, X: np.ndarray, y: np.ndarray, epochs: int = 50):
+    if spec.format != "torch":
+        model.fit(X, y)
+        return model
+    import torch
+    inputs = torch.tensor(X, dtype=torch.float32)
+    targets = torch.tensor(y, dtype=torch.long)
+    opt = torch.optim.Adam(model.parameters(), lr=0.05)
+    for _ in range(epochs):
+        opt.zero_grad()
+        loss = torch.nn.functional.cross_entropy(model(inputs), targets)
+        loss.backward()
+        opt.step()
+    return model
+
+def _labels(model, probabilities: np.ndarray) -> np.ndarray:
+    # probability columns follow model.classes_, the labels it was fitted on; torch models have none
+    columns = np.argmax(probabilities, axis=1)
+    classes = getattr(model, "classes_", None)
+    return columns if classes is None else np.asarray(classes)[columns]
+
+def _predict_proba(spec: ModelSpec, model, X: np.ndarray) -> np.ndarray:
+    if spec.format != "torch":
+        return model.predict_proba(X)
+    import torch
+    with torch.no_grad():
+        return torch.softmax(model(torch.tensor(X, dtype=torch.float32)), dim=-1).numpy()
+
+class ModelRegistry:
+    """
+    Loads persisted classifiers once and keeps them in memory for inference.
+
+    Artifacts live in `model_dir/<name>/<version><ext>`; a flat `<name><ext>`
+    file is treated as version "0". When no usable artifact exists, a
+    placeholder model is fitted once on synthetic data (with a warning) so the
+    API keeps working until `train` has been run.
+    """
+    def __init__(self, model_dir: str = MODEL_DIR, specs: dict = None):
+        self.model_dir = model_dir
+        self.specs = specs or MODEL_SPECS
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _spec(self, name: str) -> ModelSpec:
+        if name not in self.specs:
+            raise ValueError(f"Unknown model: {name}")
+        return self.specs[name]
+
+    def _path(self, name: str, version: str) -> str:
+        ext = EXTENSIONS[self._spec(name).format]
+        if version == "0":
+            return os.path.join(self.model_dir, name + ext)
+        return os.path.join(self.model_dir, name, version + ext)
+
+    def versions(self, name: str) -> list:
+        """
+        Persisted versions of a model, oldest first.
+        """
+        ext = EXTENSIONS[self._spec(name).format]
+        versions = ["0"] if os.path.isfile(self._path(name, "0")) else []
+        directory = os.path.join(self.model_dir, name)
+        if os.path.isdir(directory):
+            found = [f[:-len(ext)] for f in os.listdir(directory) if f.endswith(ext)]
+            versions += sorted(found, key=lambda v: (not v.isdigit(), int(v) if v.isdigit() else 0, v))
+        return versions
+
+    def _placeholder(self, name: str, reason: str):
+        spec = self._spec(name)
+        warnings.warn(f"Model {name}: {reason}; using an untrained placeholder")
+        model = spec.build()
+        if spec.format != "torch":
+            rng = np.random.default_rng(0)
+            X = rng.random((8 * len(spec.classes), spec.n_features))
+            model = _fit(spec, model, X, np.arange(len(X)) % len(spec.classes))
+        return model
+
+    def get(self, name: str, version: str = None) -> tuple:
+        """
+        Returns (version, model), loading it on first use. version=None selects the latest.
+        """
+        with self._lock:
+            key = (name, version)
+            if key not in self._models:
+                available = self.versions(name)
+                resolved = version or (available[-1] if available else PLACEHOLDER)
+                if version is not None and version not in available:
+                    raise ValueError(f"Model {name} has no version {version}")
+                if resolved == PLACEHOLDER:
+                    model = self._placeholder(name, f"no artifact in {self.model_dir}")
+                else:
+                    try:
+                        model = _load(self._spec(name), self._path(name, resolved))
+                    except Exception as e:
+                        if version is not None:
+                            raise
+                        model, resolved = self._placeholder(name, f"cannot load version {resolved} ({e})"), PLACEHOLDER
+                self._models[key] = (resolved, model)
+            return self._models[key]
+
+    def load_all(self):
+        """
+        Loads the latest version of every registered model, e.g. at startup.
+        Models whose dependencies are missing are skipped with a warning.
+        """
+        for name in self.specs:
+            try:
+                self.get(name)
+            except ImportError as e:
+                warnings.warn(f"Model {name} not loaded: {e}")
+
+    def predict(self, name: str, X: np.ndarray, version: str = None) -> dict:
+        """
+        Runs a warm model on a batch of feature vectors.
+        Args:
+            name: Registered model name, e.g. "svm_eeg".
+            X: Feature matrix (n_samples x n_features).
+            version: Artifact version; the latest when omitted.
+        Returns:
+            Dictionary with model, version, predicted labels (as in the training
+            data), probabilities and class names.
+        """
+        spec = self._spec(name)
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        if X.shape[1] != spec.n_features:
+            raise ValueError(f"Model {name} expects {spec.n_features} features, got {X.shape[1]}")
+        resolved, model = self.get(name, version)
+        probabilities = _predict_proba(spec, model, X)
+        return {
+            "model": name,
+            "version": resolved,
+            "predictions": _labels(model, probabilities),
+            "probabilities": probabilities,
+            "classes": spec.classes
+        }
+
+    def train(self, name: str, X: np.ndarray, y: np.ndarray, version: str = None) -> str:
+        """
+        Fits a model offline and persists it as a new version, which becomes the latest.
+        """
+        spec = self._spec(name)
+        if version is None:
+            numbered = [int(v) for v in self.versions(name) if v.isdigit()]
+            version = str(max(numbered, default=0) + 1)
+        model = _fit(spec, spec.build(), np.asarray(X, dtype=float), np.asarray(y))
+        _save(spec, model, self._path(name, version))
+        with self._lock:
+            self._models[(name, version)] = self._models[(name, None)] = (version, model)
+        return version
+
+def load_dataset(name: str, path: str) -> tuple:
+    """
+    Loads (X, y) for a model from an .npz dataset.
+
+    The file holds either feature vectors ("X", "y") or raw recordings
+    ("eeg_data": recordings x channels x samples, "sfreq", "labels"), which are
+    turned into the model's feature vectors.
+    """
+    dataset = np.load(path)
+    if "X" in dataset:
+        return dataset["X"], dataset["y"]
+    from models import ml
+    features = getattr(ml, MODEL_SPECS[name].features)
+    sfreq = float(dataset["sfreq"])
+    return np.stack([features(recording, sfreq) for recording in dataset["eeg_data"]]), dataset["labels"]
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def model_registry() -> ModelRegistry:
+    global _registry
+    # double-checked so concurrent first calls share one instance
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry()
+    return _registry
+
+def predict(name: str, X: np.ndarray, version: str = None) -> dict:
+    return model_registry().predict(name, X, version)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train a registered classifier from a stored dataset.")
+    parser.add_argument("model", choices=sorted(MODEL_SPECS))
+    parser.add_argument("dataset", help=".npz with X/y feature vectors or eeg_data/sfreq/labels recordings")
+    parser.add_argument("--version", default=None)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    args = parser.parse_args(argv)
+    X, y = load_dataset(args.model, args.dataset)
+    version = ModelRegistry(args.model_dir).train(args.model, X, y, args.version)
+    print(f"Saved {args.model} version {version} ({len(X)} samples) to {args.model_dir}")
+
+if __name__ == "__main__":
+    main()
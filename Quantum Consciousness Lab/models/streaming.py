@@ -0,0 +1,140 @@
+import os
+import numpy as np
+from dotenv import load_dotenv
+from scipy.fft import rfft, rfftfreq
+from models.eeg import BANDS
+from models.consciousness import compute_consciousness_batch
+
+load_dotenv()
+# bounds for client-chosen stream settings: ring buffer size and how often a window is transformed
+STREAM_MAX_WINDOW_SECONDS = float(os.getenv("QCL_STREAM_MAX_WINDOW_SECONDS", "30"))
+STREAM_MAX_WINDOW_SAMPLES = int(os.getenv("QCL_STREAM_MAX_WINDOW_SAMPLES", "131072"))
+STREAM_MIN_HOP_SECONDS = float(os.getenv("QCL_STREAM_MIN_HOP_SECONDS", "0.05"))
+
+def stream_settings(sfreq: float, window_seconds=2.0, hop_seconds=0.25) -> tuple:
+    """
+    Validates client-supplied window and hop lengths (s) and clamps them to the configured bounds.
+    Returns:
+        Tuple of (window_seconds, hop_seconds).
+    """
+    for name, value in (("sfreq", sfreq), ("window_seconds", window_seconds), ("hop_seconds", hop_seconds)):
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not np.isfinite(value) or value <= 0:
+            raise ValueError(f"{name} must be a positive number, got {value!r}")
+    if hop_seconds > window_seconds:
+        raise ValueError("hop_seconds must not exceed window_seconds")
+    max_window = min(STREAM_MAX_WINDOW_SECONDS, STREAM_MAX_WINDOW_SAMPLES / sfreq)
+    window_seconds = min(max(window_seconds, STREAM_MIN_HOP_SECONDS), max_window)
+    hop_seconds = min(max(hop_seconds, STREAM_MIN_HOP_SECONDS), window_seconds)
+    return float(window_seconds), float(hop_seconds)
+
+class StreamingCEngine:
+    """
+    Incremental C(t) estimator for one EEG stream.
+
+    Samples go into a fixed-size ring buffer. Every `hop` samples the latest
+    window is tapered and transformed once, and band powers, the PSD and the
+    WPLI cross-spectrum terms are updated as exponential moving averages, so
+    the cost of a chunk is proportional to its length, not to the recording.
+    """
+    def __init__(self, n_channels: int, sfreq: float, window_seconds: float = 2.0,
+                 hop_seconds: float = 0.25, smoothing: float = 0.3):
+        if sfreq <= 0:
+            raise ValueError("Sampling frequency must be positive")
+        if window_seconds <= 0 or hop_seconds <= 0:
+            raise ValueError("Window and hop lengths must be positive")
+        self.n_channels = n_channels
+        self.sfreq = sfreq
+        self.window = max(int(window_seconds * sfreq), 2)
+        self.hop = max(int(hop_seconds * sfreq), 1)
+        if self.hop > self.window:
+            raise ValueError("Hop must not exceed the window length")
+        self.smoothing = smoothing
+
+        self._buffer = np.zeros((n_channels, self.window))
+        self._pos = 0
+        self.n_samples = 0
+        self._pending = 0
+
+        self._taper = np.hanning(self.window)
+        self._taper_norm = np.sum(self._taper**2)
+        freqs = rfftfreq(self.window, 1/sfreq)
+        self._band_idx = [np.logical_and(freqs >= low, freqs <= high) for low, high in BANDS.values()]
+        self._wpli_idx = np.logical_and(freqs >= 1, freqs <= 100)
+        self._pairs = np.triu_indices(n_channels, k=1)
+
+        self._psd = None
+        self._imag = None
+        self._abs_imag = None
+
+    def _write(self, chunk: np.ndarray):
+        n = chunk.shape[1]
+        end = self._pos + n
+        if end <= self.window:
+            self._buffer[:, self._pos:end] = chunk
+        else:
+            split = self.window - self._pos
+            self._buffer[:, self._pos:] = chunk[:, :split]
+            self._buffer[:, :n - split] = chunk[:, split:]
+        self._pos = end % self.window
+        self.n_samples += n
+
+    def _ordered_window(self) -> np.ndarray:
+        return np.concatenate([self._buffer[:, self._pos:], self._buffer[:, :self._pos]], axis=1)
+
+    def _ema(self, old, new):
+        return new if old is None else self.smoothing * new + (1 - self.smoothing) * old
+
+    def _frame(self) -> dict:
+        window = self._ordered_window()
+        spectrum = rfft((window - window.mean(axis=1, keepdims=True)) * self._taper, axis=1)
+        self._psd = self._ema(self._psd, np.abs(spectrum)**2 / self._taper_norm)
+
+        cross = spectrum[self._pairs[0]][:, self._wpli_idx] * np.conj(spectrum[self._pairs[1]][:, self._wpli_idx])
+        self._imag = self._ema(self._imag, np.imag(cross))
+        self._abs_imag = self._ema(self._abs_imag, np.abs(np.imag(cross)))
+
+        band_values = np.array([self._psd[:, idx].mean() if idx.any() else 0.0 for idx in self._band_idx])
+        total = np.sum(band_values)
+        if total <= 0:
+            raise ValueError("Zero spectral power in stream window")
+        entropy = -np.sum(band_values * np.log2(band_values + 1e-10)) / total
+
+        if len(self._pairs[0]):
+            wpli = np.abs(self._imag) / (self._abs_imag + 1e-12)
+            connectivity, decoherence = float(np.mean(wpli)), float(np.var(wpli))
+        else:
+            connectivity, decoherence = 0.0, 0.0
+
+        c = compute_consciousness_batch(
+            np.diag(band_values / total)[None], np.array([connectivity]), np.array([entropy]),
+            np.array([np.std(self._psd)]), np.array([decoherence])
+        )
+        return {
+            "t": self.n_samples / self.sfreq,
+            "C(t)": float(c["C(t)"][0]),
+            "band_power": {band: float(v) for band, v in zip(BANDS, band_values)},
+            "connectivity_wpli": connectivity,
+            "entropy": float(entropy),
+            "qft_noise": float(c["qft_noise"][0]),
+            "decoherence": decoherence
+        }
+
+    def push(self, chunk: np.ndarray) -> list:
+        """
+        Appends a chunk (channels x samples) and returns the C(t) frames it completes.
+        """
+        chunk = np.asarray(chunk, dtype=float)
+        if chunk.ndim != 2 or chunk.shape[0] != self.n_channels:
+            raise ValueError(f"Expected a chunk with {self.n_channels} channels")
+        frames = []
+        offset = 0
+        while offset < chunk.shape[1]:
+            take = min(self.hop - self._pending, chunk.shape[1] - offset)
+            self._write(chunk[:, offset:offset + take])
+            offset += take
+            self._pending += take
+            if self._pending == self.hop:
+                self._pending = 0
+                if self.n_samples >= self.window:
+                    frames.append(self._frame())
+        return frames
@@ -0,0 +1,155 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from dotenv import load_dotenv
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.fft import rfft, rfftfreq
+from scipy.signal import hilbert
+from scipy.signal.windows import hann
+
+load_dotenv()
+SYNC_TILE_CHANNELS = int(os.getenv("QCL_SYNC_TILE_CHANNELS", "32"))
+SYNC_TILE_BYTES = int(os.getenv("QCL_SYNC_TILE_BYTES", str(64 * 1024 ** 2)))
+SYNC_WORKERS = int(os.getenv("QCL_SYNC_WORKERS", "1"))
+
+METHODS = ("plv", "wpli", "coh")
+
+def segment_spectra(data: np.ndarray, sfreq: float, fmin: float = 1.0, fmax: float = 100.0, segment: int = None,
+                    overlap: float = 0.5) -> tuple:
+    """
+    Hann-tapered spectra of overlapping segments, restricted to [fmin, fmax].
+    Args:
+        data: EEG data (channels x samples).
+        segment: Samples per segment; one second by default, shortened to a
+            quarter of the recording (7 half-overlapping segments) if that is less.
+        overlap: Fraction of overlap between consecutive segments.
+    Returns:
+        Tuple of (spectra as complex64, channels x segments x frequencies; frequencies in Hz).
+    """
+    n_samples = data.shape[-1]
+    segment = segment or min(int(sfreq), n_samples // 4)
+    hop = max(1, int(segment * (1 - overlap)))
+    # phase statistics over a single segment are 1 by construction
+    if segment < 2 or segment > n_samples or (n_samples - segment) // hop + 1 < 2:
+        raise ValueError(f"{n_samples} samples do not give at least 2 segments of {segment} samples")
+    freqs = rfftfreq(segment, 1 / sfreq)
+    idx = np.flatnonzero(np.logical_and(freqs >= fmin, freqs <= fmax))
+    if idx.size == 0:
+        raise ValueError(f"No frequency bins between {fmin} and {fmax} Hz for {segment}-sample segments")
+    taper = hann(segment, sym=False)
+    segments = sliding_window_view(data, segment, axis=-1)[:, ::hop]
+    spectra = np.empty(data.shape[:-1] + (segments.shape[1], idx.size), dtype=np.complex64)
+    # one channel at a time, so the tapered copy stays small
+    for ch in range(data.shape[0]):
+        windowed = (segments[ch] - segments[ch].mean(axis=-1, keepdims=True)) * taper
+        spectra[ch] = rfft(windowed, axis=-1)[:, idx]
+    return spectra, freqs[idx]
+
+def _tile_measures(xi: np.ndarray, xj: np.ndarray, methods: tuple, tile_bytes: int) -> dict:
+    # xi: (ti, segments, freqs), xj: (tj, segments, freqs) -> method -> (ti, tj), averaged over frequency
+    n_seg, n_freq = xi.shape[1], xi.shape[2]
+    a, b = xi.transpose(2, 0, 1), xj.transpose(2, 1, 0).conj()   # (freqs, ti, seg), (freqs, seg, tj)
+    out = {}
+    if "coh" in methods or "wpli" in methods:
+        cross = a @ b                                             # summed cross-spectra, (freqs, ti, tj)
+    if "coh" in methods:
+        pi = np.sum(np.abs(xi)**2, axis=1).T[:, :, None]
+        pj = np.sum(np.abs(xj)**2, axis=1).T[:, None, :]
+        out["coh"] = (np.abs(cross) / np.sqrt(pi * pj + 1e-30)).mean(axis=0)
+    if "plv" in methods:
+        ui, uj = a / (np.abs(a) + 1e-30), b / (np.abs(b) + 1e-30)
+        out["plv"] = (np.abs(ui @ uj) / n_seg).mean(axis=0)
+    if "wpli" in methods:
+        # mean |Im S_ij| is not a product of per-channel terms, so it is summed
+        # over segments in frequency chunks sized to stay within tile_bytes
+        denominator = np.empty(cross.shape)
+        per_freq = 2 * xi.shape[0] * xj.shape[0] * n_seg * xi.real.itemsize   # imag plus one temporary
+        step = max(1, tile_bytes // per_freq)
+        for f0 in range(0, n_freq, step):
+            fi, fj = a[f0:f0 + step], xj[:, :, f0:f0 + step].transpose(2, 1, 0)   # (fc, ti, seg), (fc, seg, tj)
+            imag = fi.imag[:, :, :, None] * fj.real[:, None]
+            imag -= fi.real[:, :, :, None] * fj.imag[:, None]
+            denominator[f0:f0 + step] = np.abs(imag, out=imag).sum(axis=2)
+        out["wpli"] = (np.abs(cross.imag) / (denominator + 1e-30)).mean(axis=0)
+    return out
+
+def connectivity_matrices(data: np.ndarray, sfreq: float, methods=("wpli",), fmin: float = 1.0, fmax: float = 100.0,
+                          segment: int = None, tile: int = SYNC_TILE_CHANNELS, tile_bytes: int = SYNC_TILE_BYTES,
+                          workers: int = SYNC_WORKERS) -> dict:
+    """
+    Channel x channel PLV, WPLI and/or coherence from segment cross-spectra.
+
+    Channel pairs are processed in tiles of `tile` x `tile` channels, so the
+    pairwise intermediates are bounded by the tile (and, for WPLI, by
+    `tile_bytes` per worker) rather than channels^2 x samples. Tiles run on
+    `workers` threads; NumPy releases the GIL in the matrix products.
+    Args:
+        data: EEG data (channels x samples), or a stack of recordings such as
+            windows x channels x samples, each measured separately.
+        methods: Any of "plv", "wpli", "coh".
+        fmin, fmax: Frequency range (Hz) averaged over.
+    Returns:
+        Dictionary of method -> symmetric (... x channels x channels) matrix;
+        the diagonal is 1 for PLV and coherence and 0 for WPLI.
+    """
+    methods = tuple(methods)
+    unknown = [m for m in methods if m not in METHODS]
+    if unknown:
+        raise ValueError(f"Unknown connectivity methods: {unknown}")
+    if tile < 1:
+        raise ValueError("Tile size must be at least 1 channel")
+    if data.ndim > 2:
+        n = data.shape[-2]
+        stacked = {m: np.empty(data.shape[:-2] + (n, n)) for m in methods}
+        for index in np.ndindex(data.shape[:-2]):
+            for method, matrix in connectivity_matrices(data[index], sfreq, methods, fmin, fmax, segment, tile,
+                                                        tile_bytes, workers).items():
+                stacked[method][index] = matrix
+        return stacked
+    spectra, _ = segment_spectra(data, sfreq, fmin, fmax, segment)
+    n = spectra.shape[0]
+    result = {m: np.empty((n, n)) for m in methods}
+    blocks = [(i, min(i + tile, n)) for i in range(0, n, tile)]
+    pairs = [(bi, bj) for k, bi in enumerate(blocks) for bj in blocks[k:]]
+
+    def run(pair):
+        (i0, i1), (j0, j1) = pair
+        values = _tile_measures(spectra[i0:i1], spectra[j0:j1], methods, tile_bytes)
+        for method, block in values.items():
+            result[method][i0:i1, j0:j1] = block
+            result[method][j0:j1, i0:i1] = block.T
+
+    if workers > 1 and len(pairs) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(run, pairs))
+    else:
+        for pair in pairs:
+            run(pair)
+    for method in methods:
+        np.fill_diagonal(result[method], 0.0 if method == "wpli" else 1.0)
+    return result
+
+def connectivity_matrix(data: np.ndarray, sfreq: float, method: str = "wpli", **kwargs) -> np.ndarray:
+    return connectivity_matrices(data, sfreq, (method,), **kwargs)[method]
+
+def upper_triangle(matrix: np.ndarray) -> np.ndarray:
+    """
+    Values of the distinct channel pairs, over any leading axes.
+    """
+    i, j = np.triu_indices(matrix.shape[-1], k=1)
+    return matrix[..., i, j]
+
+def phase_sync(data: np.ndarray, tile: int = SYNC_TILE_CHANNELS) -> float:
+    """
+    Mean of cos(phi_i - phi_j) over all channel pairs (i, j) and samples.
+
+    Equal to mean_t |mean_i exp(i phi_i(t))|^2, which needs one running sum
+    over channels (done `tile` channels at a time) instead of a
+    channels x channels x samples array.
+    """
+    n_channels = data.shape[0]
+    total = np.zeros(data.shape[-1], dtype=complex)
+    for c0 in range(0, n_channels, tile):
+        analytic = hilbert(data[c0:c0 + tile], axis=-1)
+        total += np.sum(np.exp(1j * np.angle(analytic)), axis=0)
+    return float(np.mean(np.abs(total / n_channels)**2))
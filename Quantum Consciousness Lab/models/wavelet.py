@@ -0,0 +1,155 @@
+import os
+import numpy as np
+import pywt
+from dotenv import load_dotenv
+from scipy.fft import fft, ifft, irfft, next_fast_len, rfft
+
+load_dotenv()
+WAVELET_CHUNK_SAMPLES = int(os.getenv("QCL_WAVELET_CHUNK_SAMPLES", "4096"))
+
+# The scale grid analyze_eeg_band has always used; bands select from it.
+DEFAULT_SCALES = np.arange(1, 128)
+
+def scale_frequencies(scales, sfreq: float, wavelet: str = "morl") -> np.ndarray:
+    """
+    Pseudo-frequency (Hz) of each scale, as returned by pywt.cwt.
+    """
+    return np.atleast_1d(pywt.scale2frequency(wavelet, np.asarray(scales, dtype=float), 12)) * sfreq
+
+def band_scales(bands: dict, sfreq: float, wavelet: str = "morl", scales=None, per_band: int = None) -> dict:
+    """
+    Scales whose frequency lies in each band.
+    Args:
+        bands: band -> (low, high) in Hz.
+        scales: Candidate scales; DEFAULT_SCALES by default.
+        per_band: Instead of filtering the candidates, place this many
+            log-spaced scales across each band.
+    Returns:
+        Dictionary of band -> scales array (possibly empty).
+    """
+    if per_band is not None:
+        center = scale_frequencies([1.0], sfreq, wavelet)[0]
+        return {band: center / np.geomspace(high, low, per_band) for band, (low, high) in bands.items()}
+    scales = DEFAULT_SCALES if scales is None else np.asarray(scales)
+    freqs = scale_frequencies(scales, sfreq, wavelet)
+    return {band: scales[np.logical_and(freqs >= low, freqs <= high)] for band, (low, high) in bands.items()}
+
+def _filters(scales, wavelet: str) -> list:
+    # pywt.cwt with method="conv" computes -sqrt(s) * diff(conv(x, k_s)) and
+    # crops it to the input length, where k_s is the integrated wavelet
+    # resampled at scale s. That equals one convolution with the filter
+    # g_s = -sqrt(s) * diff([0, k_s, 0]) read at a fixed offset.
+    wavelet = pywt.DiscreteContinuousWavelet(wavelet)
+    int_psi, x = pywt.integrate_wavelet(wavelet, precision=12)
+    int_psi = np.conj(int_psi) if wavelet.complex_cwt else int_psi
+    step = x[1] - x[0]
+    filters = []
+    for scale in np.atleast_1d(scales):
+        j = (np.arange(scale * (x[-1] - x[0]) + 1) / (scale * step)).astype(int)
+        j = j[j < int_psi.size]
+        kernel = int_psi[j][::-1]
+        if kernel.size < 2:
+            raise ValueError(f"Selected scale of {scale} too small.")
+        g = -np.sqrt(scale) * np.diff(np.concatenate([[0], kernel, [0]]))
+        filters.append((g, 1 + (kernel.size - 2) // 2))
+    return filters
+
+def iter_cwt(data: np.ndarray, scales, wavelet: str = "morl", chunk: int = WAVELET_CHUNK_SAMPLES):
+    """
+    Continuous wavelet transform in FFT-based chunks over time.
+
+    Yields (scale index, start, stop, coefficients) with coefficients shaped
+    (..., stop - start), equal to pywt.cwt(data, scales, wavelet)[index] over
+    those samples. Each chunk is transformed once and convolved with every
+    scale's filter by overlap-save, so memory is bounded by one chunk of one
+    scale rather than scales x channels x samples.
+    """
+    data = np.asarray(data, dtype=float)
+    filters = _filters(scales, wavelet)
+    is_complex = any(np.iscomplexobj(g) for g, _ in filters)
+    n = data.shape[-1]
+    before = max(g.size - 1 - offset for g, offset in filters)
+    after = max(offset for _, offset in filters)
+    chunk = max(1, min(chunk, n))
+    nfft = next_fast_len(chunk + before + after, real=not is_complex)
+    forward, inverse = (fft, ifft) if is_complex else (rfft, irfft)
+    spectra = [forward(g, nfft) for g, _ in filters]
+    for start in range(0, n, chunk):
+        stop = min(start + chunk, n)
+        # samples [start - before, start - before + nfft), zero outside the recording
+        first = start - before
+        segment = np.zeros(data.shape[:-1] + (nfft,))
+        segment[..., max(first, 0) - first:min(first + nfft, n) - first] = data[..., max(first, 0):min(first + nfft, n)]
+        segment = forward(segment, axis=-1)
+        for i, ((_, offset), spectrum) in enumerate(zip(filters, spectra)):
+            lo = before + offset
+            yield i, start, stop, inverse(segment * spectrum, nfft, axis=-1)[..., lo:lo + stop - start]
+
+def cwt(data: np.ndarray, scales, wavelet: str = "morl", sampling_period: float = 1.0,
+        chunk: int = WAVELET_CHUNK_SAMPLES, dtype=np.float32) -> tuple:
+    """
+    Drop-in for pywt.cwt returning `dtype` coefficients (complex64 for complex wavelets).
+    """
+    dtype = np.result_type(dtype, np.complex64) if pywt.ContinuousWavelet(wavelet).complex_cwt else dtype
+    data = np.asarray(data)
+    coeffs = np.empty((len(np.atleast_1d(scales)),) + data.shape, dtype=dtype)
+    for i, start, stop, block in iter_cwt(data, scales, wavelet, chunk):
+        coeffs[i, ..., start:stop] = block
+    return coeffs, scale_frequencies(scales, 1 / sampling_period, wavelet)
+
+def band_power(data: np.ndarray, sfreq: float, bands: dict, wavelet: str = "morl", scales=None,
+               per_band: int = None, chunk: int = WAVELET_CHUNK_SAMPLES) -> dict:
+    """
+    Mean wavelet power per band without materializing the coefficients.
+    Args:
+        data: EEG data (channels x samples).
+        sfreq: Sampling frequency (Hz).
+        bands: band -> (low, high) in Hz.
+        scales, per_band: Scale selection (see band_scales); only scales
+            inside a band are transformed.
+    Returns:
+        Dictionary of band -> mean |coefficient|^2 over its scales, channels
+        and samples (NaN for a band without scales).
+    """
+    selected = band_scales(bands, sfreq, wavelet, scales, per_band)
+    unique = np.unique(np.concatenate([s for s in selected.values()] + [np.empty(0)]))
+    if unique.size == 0:
+        return {band: float("nan") for band in bands}
+    totals = np.zeros(unique.size)
+    for i, _, _, block in iter_cwt(data, unique, wavelet, chunk):
+        totals[i] += np.sum(np.abs(block)**2)
+    mean_power = totals / np.asarray(data).size
+    return {band: float(mean_power[np.searchsorted(unique, s)].mean()) if s.size else float("nan")
+            for band, s in selected.items()}
+
+def scalogram(data: np.ndarray, sfreq: float, scales=None, decimate: int = 8, bands: dict = None,
+              wavelet: str = "morl", per_band: int = None, chunk: int = WAVELET_CHUNK_SAMPLES) -> dict:
+    """
+    Wavelet power block-averaged over `decimate` samples, as float32.
+    Args:
+        data: EEG data (channels x samples).
+        scales: Scales to compute; with `bands`, only those inside the bands.
+        decimate: Samples per output column; a trailing partial block is dropped.
+    Returns:
+        Dictionary with "power" (scales x channels x samples // decimate),
+        "frequencies" (Hz per scale) and "times" (s, start of each block).
+    """
+    if decimate < 1:
+        raise ValueError("Decimation factor must be at least 1")
+    if bands is not None:
+        selected = band_scales(bands, sfreq, wavelet, scales, per_band)
+        scales = np.unique(np.concatenate([s for s in selected.values()] + [np.empty(0)]))
+    scales = DEFAULT_SCALES if scales is None else np.atleast_1d(scales)
+    data = np.asarray(data)
+    n_blocks = data.shape[-1] // decimate
+    power = np.zeros((scales.size,) + data.shape[:-1] + (n_blocks,), dtype=np.float32)
+    if scales.size and n_blocks:
+        chunk = max(decimate, chunk // decimate * decimate)
+        for i, start, stop, block in iter_cwt(data[..., :n_blocks * decimate], scales, wavelet, chunk):
+            values = np.abs(block)**2
+            power[i, ..., start // decimate:stop // decimate] = values.reshape(values.shape[:-1] + (-1, decimate)).mean(axis=-1)
+    return {
+        "power": power,
+        "frequencies": scale_frequencies(scales, sfreq, wavelet),
+        "times": np.arange(n_blocks) * decimate / sfreq
+    }
@@ -2,7 +2,7 @@ import websocket
 import json
 import numpy as np
 from models.eeg import analyze_eeg_band
-from services.visualization import compute_attractor
+from services.visualization import delay_embedding_attractor
 
 def stream_ar_vr_brain(eeg_data, sfreq, ws_url: str = "ws://localhost:9000"):
     """
@@ -10,11 +10,11 @@ def stream_ar_vr_brain(eeg_data, sfreq, ws_url: str = "ws://localhost:9000"):
     """
     ws = websocket.WebSocket()
     ws.connect(ws_url)
-    features = analyze_eeg_band(eeg_data, sfreq)
-    trajectory = compute_attractor(eeg_data, sfreq)
+    features = analyze_eeg_band(eeg_data, sfreq, features=["band_power"])
+    attractor = delay_embedding_attractor(eeg_data, sfreq)
     data = {
         "band_power": features["band_power"],
-        "trajectory": trajectory["pca"].tolist()
+        "trajectory": attractor["trajectory"].tolist()
     }
     ws.send(json.dumps(data))
     ws.close()
@@ -0,0 +1,300 @@
+import argparse
+import csv
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from dotenv import load_dotenv
+from api.encoding import SPECTRA, flatten
+from api.executor import PROCESS_START_METHOD
+
+load_dotenv()
+BATCH_WORKERS = int(os.getenv("QCL_BATCH_WORKERS", str(os.cpu_count() or 1)))
+
+RECORDING_EXTENSIONS = (".edf", ".fif", ".fif.gz", ".npy")
+MANIFEST_EXTENSIONS = (".txt", ".csv")
+
+def _analyze(eeg_data: np.ndarray, sfreq: float, subject: str = None, features: list = None) -> dict:
+    from models.eeg import FEATURES, analyze_eeg_band
+    features = features or [f for f in FEATURES if f not in SPECTRA]
+    return analyze_eeg_band(eeg_data, sfreq, features=features, as_arrays=True, subject=subject)
+
+def _c_sigma(eeg_data: np.ndarray, sfreq: float, **_) -> dict:
+    from models.consciousness import compute_c_sigma
+    return compute_c_sigma(eeg_data, sfreq)
+
+def _classifier(name: str):
+    def run(eeg_data: np.ndarray, sfreq: float, **_) -> dict:
+        from models import ml
+        return getattr(ml, name)(eeg_data, sfreq)
+    run.__name__ = name
+    return run
+
+# task -> fn(eeg_data, sfreq, subject=, features=) returning a (nested) result dict
+TASKS = {
+    "analyze": _analyze,
+    "c_sigma": _c_sigma,
+    "classify_eeg": _classifier("classify_eeg"),
+    "classify_emotion": _classifier("classify_emotion"),
+    "hybrid_classifier": _classifier("hybrid_classifier"),
+}
+
+def _is_recording(path: str) -> bool:
+    return path.lower().endswith(RECORDING_EXTENSIONS)
+
+def read_manifest(path: str, sfreq: float = None) -> list:
+    """
+    Recordings listed in a manifest: a .txt with one path per line, or a .csv
+    with a `path` column and optional `sfreq` and `subject` columns. Relative
+    paths are resolved against the manifest's directory.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, newline="") as f:
+        if path.lower().endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [{"path": line.strip()} for line in f if line.strip() and not line.lstrip().startswith("#")]
+    recordings = []
+    for row in rows:
+        if not row.get("path"):
+            raise ValueError(f"Manifest {path} has a row without a path")
+        recordings.append({
+            "path": os.path.join(base, row["path"]),
+            "sfreq": float(row["sfreq"]) if row.get("sfreq") else sfreq,
+            "subject": row.get("subject") or None
+        })
+    return recordings
+
+def find_recordings(inputs: list, sfreq: float = None) -> list:
+    """
+    Expands directories (recursively), manifests and files into recordings.
+    Args:
+        inputs: Paths to directories, manifests (.txt/.csv) or EDF/FIF/.npy files.
+        sfreq: Sampling rate for .npy files without one in their manifest.
+    Returns:
+        List of {"path", "sfreq", "subject"} dicts, without duplicates.
+    """
+    recordings = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                recordings += [{"path": os.path.join(root, name), "sfreq": sfreq, "subject": None}
+                               for name in sorted(files) if _is_recording(name)]
+        elif item.lower().endswith(MANIFEST_EXTENSIONS):
+            recordings += read_manifest(item, sfreq)
+        elif _is_recording(item):
+            recordings.append({"path": item, "sfreq": sfreq, "subject": None})
+        else:
+            raise ValueError(f"Not a directory, manifest or EDF/FIF/.npy recording: {item}")
+    seen, unique = set(), []
+    for recording in recordings:
+        recording["path"] = os.path.abspath(recording["path"])
+        if recording["path"] not in seen:
+            seen.add(recording["path"])
+            unique.append(recording)
+    return unique
+
+def load_recording(recording: dict) -> tuple:
+    """
+    Loads a recording's EEG channels.
+    Returns:
+        Tuple of (EEG data as channels x samples, sampling rate).
+    """
+    path = recording["path"]
+    if path.lower().endswith(".npy"):
+        if not recording.get("sfreq"):
+            raise ValueError(f"{path}: .npy recordings need a sampling rate (--sfreq or a manifest sfreq column)")
+        data = np.load(path)
+        if data.ndim != 2:
+            raise ValueError(f"{path}: expected a channels x samples array, got shape {data.shape}")
+        return data, recording["sfreq"]
+    import mne
+    if path.lower().endswith(".edf"):
+        raw = mne.io.read_raw_edf(path, preload=True, verbose="error")
+    else:
+        raw = mne.io.read_raw_fif(path, preload=True, verbose="error")
+    raw.pick("eeg")
+    return raw.get_data(), raw.info["sfreq"]
+
+def checkpoint_key(recording: dict, tasks: list, features: list = None) -> str:
+    """
+    Identifies a recording's results: its path, size and mtime plus the task configuration,
+    the pipeline version and the subject's artifact calibrations.
+    """
+    from models.artifacts import calibrations
+    from models.eeg import PIPELINE_VERSION
+    stat = os.stat(recording["path"])
+    config = {"path": recording["path"], "size": stat.st_size, "mtime": stat.st_mtime_ns, "tasks": list(tasks),
+              "features": features, "sfreq": recording.get("sfreq"), "subject": recording.get("subject"),
+              "pipeline": PIPELINE_VERSION, "artifact_fit": calibrations(recording.get("subject"))}
+    return hashlib.blake2b(json.dumps(config, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+def _init_worker(tasks: list):
+    # warm each worker once: heavy imports, fitted models and one BLAS/torch thread per process
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+    if any(task.startswith("classify") or task == "hybrid_classifier" for task in tasks):
+        from models.registry import model_registry
+        model_registry().load_all()
+
+def process_recording(recording: dict, tasks: list, features: list, part_path: str) -> dict:
+    """
+    Runs the tasks on one recording and writes its row to `part_path` (.npz).
+    """
+    started = time.perf_counter()
+    try:
+        eeg_data, sfreq = load_recording(recording)
+        results = {task: TASKS[task](eeg_data, sfreq, subject=recording.get("subject"), features=features)
+                   for task in tasks}
+        row = {"path": recording["path"], "subject": recording.get("subject") or "", "sfreq": float(sfreq),
+               "n_channels": eeg_data.shape[0], "n_samples": eeg_data.shape[1],
+               "seconds": time.perf_counter() - started, **dict(flatten(results))}
+        tmp = f"{part_path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp, **row)
+        os.replace(tmp, part_path)
+        return {"path": recording["path"], "ok": True, "seconds": row["seconds"], "error": None}
+    except Exception as e:
+        return {"path": recording["path"], "ok": False, "seconds": time.perf_counter() - started,
+                "error": f"{type(e).__name__}: {e}"}
+
+def _columns(rows: list) -> dict:
+    columns = {}
+    for row in rows:
+        for key in row:
+            columns.setdefault(key, [])
+    for row in rows:
+        for key, values in columns.items():
+            values.append(row.get(key))
+    return columns
+
+def write_table(rows: list, output: str):
+    """
+    Writes one row per recording to Parquet (requires pyarrow) or .npz.
+
+    In .npz, a column whose values all have the same shape is stacked into
+    one array; ragged or partly missing columns are object arrays.
+    """
+    columns = _columns(rows)
+    tmp = f"{output}.tmp"
+    if output.lower().endswith(".parquet"):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Parquet output requires pyarrow; use a .npz output instead")
+        table = pa.table({key: pa.array([None if v is None else np.asarray(v).tolist() for v in values])
+                          for key, values in columns.items()})
+        pq.write_table(table, tmp)
+    elif output.lower().endswith(".npz"):
+        arrays = {}
+        for key, values in columns.items():
+            if all(v is not None for v in values) and len({np.shape(v) for v in values}) == 1:
+                arrays[key] = np.stack([np.asarray(v) for v in values]) if values else np.empty(0)
+            else:
+                arrays[key] = np.empty(len(values), dtype=object)
+                arrays[key][:] = values
+        with open(tmp, "wb") as f:
+            np.savez_compressed(f, **arrays)
+    else:
+        raise ValueError(f"Output must be .parquet or .npz: {output}")
+    os.replace(tmp, output)
+
+def run_batch(recordings: list, tasks: list, output: str, features: list = None, workers: int = BATCH_WORKERS,
+              progress=None, force: bool = False) -> dict:
+    """
+    Runs tasks over recordings on a process pool, resumable from per-recording checkpoints.
+
+    Each recording's row is written to `<output>.parts/<key>.npz` as soon as
+    it finishes; recordings whose checkpoint exists are skipped, so an
+    interrupted run continues where it stopped. Failed recordings are
+    reported and retried on the next run. The table is then assembled from
+    the checkpoints in input order.
+    Args:
+        recordings: Output of find_recordings.
+        tasks: Names from TASKS, run in order on each recording (later tasks reuse the
+            worker's feature cache).
+        output: .parquet or .npz path.
+        workers: Processes; 1 runs in this process.
+        progress: Optional callable(done, total, status) per finished recording.
+        force: Reprocess recordings that already have a checkpoint, e.g. after retraining a classifier.
+    Returns:
+        Dictionary with counts, failures and the output path.
+    """
+    unknown = [task for task in tasks if task not in TASKS]
+    if unknown:
+        raise ValueError(f"Unknown tasks: {unknown}")
+    if not output.lower().endswith((".parquet", ".npz")):
+        raise ValueError(f"Output must be .parquet or .npz: {output}")
+    parts = f"{output}.parts"
+    os.makedirs(parts, exist_ok=True)
+    part_paths = [os.path.join(parts, checkpoint_key(r, tasks, features) + ".npz") for r in recordings]
+    todo = [(r, p) for r, p in zip(recordings, part_paths) if force or not os.path.exists(p)]
+    skipped = len(recordings) - len(todo)
+
+    failed = []
+    def report(done: int, status: dict):
+        if not status["ok"]:
+            failed.append(status)
+        if progress is not None:
+            progress(skipped + done, len(recordings), status)
+
+    if workers > 1 and len(todo) > 1:
+        context = multiprocessing.get_context(PROCESS_START_METHOD)
+        with ProcessPoolExecutor(min(workers, len(todo)), mp_context=context, initializer=_init_worker,
+                                 initargs=(list(tasks),)) as pool:
+            futures = [pool.submit(process_recording, r, list(tasks), features, p) for r, p in todo]
+            for done, future in enumerate(as_completed(futures), 1):
+                report(done, future.result())
+    else:
+        if todo:
+            _init_worker(list(tasks))
+        for done, (r, p) in enumerate(todo, 1):
+            report(done, process_recording(r, list(tasks), features, p))
+
+    rows = []
+    for path in part_paths:
+        if os.path.exists(path):
+            with np.load(path, allow_pickle=True) as part:
+                rows.append({key: part[key][()] if part[key].ndim == 0 else part[key] for key in part.files})
+    write_table(rows, output)
+    return {"recordings": len(recordings), "processed": len(todo) - len(failed), "skipped": skipped,
+            "failed": failed, "output": output}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze a directory or manifest of EEG recordings on all cores.")
+    parser.add_argument("inputs", nargs="+", help="directories, manifests (.txt/.csv) or EDF/FIF/.npy files")
+    parser.add_argument("--output", "-o", required=True, help="results table, .parquet or .npz")
+    parser.add_argument("--tasks", nargs="+", default=["analyze"], choices=sorted(TASKS))
+    parser.add_argument("--features", nargs="+", default=None,
+                        help="analyze_eeg_band features (default: all except full spectra)")
+    parser.add_argument("--sfreq", type=float, default=None, help="sampling rate of .npy recordings")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--force", action="store_true", help="reprocess recordings that have a checkpoint")
+    args = parser.parse_args(argv)
+
+    # one thread per worker process; the pool provides the parallelism
+    if args.workers > 1:
+        for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+            os.environ.setdefault(var, "1")
+
+    recordings = find_recordings(args.inputs, args.sfreq)
+
+    def progress(done, total, status):
+        outcome = f"{status['seconds']:.1f}s" if status["ok"] else status["error"]
+        print(f"[{done}/{total}] {status['path']} {outcome}", flush=True)
+
+    summary = run_batch(recordings, args.tasks, args.output, args.features, args.workers, progress, args.force)
+    print(f"{summary['processed']} processed, {summary['skipped']} already done, {len(summary['failed'])} failed; "
+          f"results in {summary['output']}")
+    return 1 if summary["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
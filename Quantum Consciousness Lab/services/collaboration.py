@@ -1,16 +1,17 @@
-from pymongo import MongoClient
-import os
-from dotenv import load_dotenv
+from database.writebehind import write_behind
 
-load_dotenv()
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
-
-client = MongoClient(MONGO_URI)
-db = client["consciousness_lab"]
+DB_NAME = "consciousness_lab"
 
 def create_collaboration_session(user_id: str, data: dict):
     """
     Creates a shared session for collaborative analysis.
     """
-    session_id = db["collaborations"].insert_one({"user_id": user_id, "data": data}).inserted_id
+    session_id = write_behind(DB_NAME, "collaborations").insert({"user_id": user_id, "data": data})
+    return {"session_id": str(session_id)}
+
+async def create_collaboration_session_async(user_id: str, data: dict):
+    """
+    create_collaboration_session for async handlers; returns without waiting for the write.
+    """
+    session_id = await write_behind(DB_NAME, "collaborations").insert_async({"user_id": user_id, "data": data})
     return {"session_id": str(session_id)}
@@ -3,7 +3,8 @@ import numpy as np
 import plotly.graph_objects as go
 from dash import Dash, dcc, html
 from scipy.integrate import odeint
-from sklearn.decomposition import PCA
+from numpy.lib.stride_tricks import sliding_window_view
+from sklearn.decomposition import IncrementalPCA
 from models.eeg import analyze_eeg_band
 
 def visualize_eeg(eeg_data, sfreq):
@@ -17,29 +18,148 @@ def visualize_eeg(eeg_data, sfreq):
     fig.update_layout(title="EEG Time Series", xaxis_title="Time", yaxis_title="Amplitude")
     return fig
 
+def visualize_eeg_range(reader, start_ns: int, stop_ns: int, n_points: int = 2000, channels: list = None):
+    """
+    Visualizes a stored EEG range from a database.timeseries.TileReader as a
+    min/max envelope around the bucket mean, without loading the raw samples.
+    """
+    view = reader.read(start_ns, stop_ns, n_points, channels)
+    times = (view["times"] - start_ns) / 1e9
+    fig = go.Figure()
+    for i, name in enumerate(channels or range(len(view["mean"]))):
+        fig.add_trace(go.Scatter(x=np.concatenate([times, times[::-1]]), y=np.concatenate([view["max"][i], view["min"][i][::-1]]),
+                                 fill="toself", opacity=0.3, line=dict(width=0), showlegend=False))
+        fig.add_trace(go.Scatter(x=times, y=view["mean"][i], name=str(name)))
+    fig.update_layout(title="EEG Time Series", xaxis_title="Time (s)", yaxis_title="Amplitude")
+    return fig
+
 def compute_attractor(eeg_data: np.ndarray, sfreq: float) -> dict:
     """
-    Computes Lorenz and PCA attractors with Lyapunov exponent.
+    Computes Lorenz and PCA attractors with the Lyapunov exponent and spectrum.
     """
     def lorenz(state, t, sigma=10, rho=28, beta=8/3):
         x, y, z = state
         return [sigma * (y - x), x * (rho - z) - y, x * y - beta * z]
     
-    features = analyze_eeg_band(eeg_data, sfreq)
+    features = analyze_eeg_band(eeg_data, sfreq, features=["band_power", "connectivity_wpli", "entropy"])
     initial_state = [features["band_power"]["theta"], features["connectivity_wpli"], features["entropy"]]
     t = np.linspace(0, 10, 1000)
     trajectory = odeint(lorenz, initial_state, t)
     
-    data = np.array([features["band_power"][band] for band in ['delta', 'theta', 'alpha', 'beta', 'gamma']] + [features["connectivity_wpli"], features["entropy"]])
-    pca = PCA(n_components=3)
-    pca_trajectory = pca.fit_transform(np.repeat(data.reshape(1, -1), 1000, axis=0))
+    pca_trajectory = delay_embedding_attractor(eeg_data, sfreq)["trajectory"]
     
-    lyapunov = compute_lyapunov_exponent(trajectory)
-    return {"lorenz": trajectory, "pca": pca_trajectory, "lyapunov": lyapunov}
+    lyapunov = compute_lyapunov_exponent_batched(trajectory)
+    spectrum = compute_lyapunov_spectrum(np.array(initial_state), dt=t[1] - t[0], n_steps=len(t) - 1)
+    return {"lorenz": trajectory, "pca": pca_trajectory, "lyapunov": lyapunov, "lyapunov_spectrum": spectrum}
+
+class DelayEmbeddingPCA:
+    """
+    Incremental PCA of a delay-embedded multichannel signal.
+
+    Each point stacks x[c, i], x[c, i + delay], ..., x[c, i + (dim - 1) * delay]
+    over all channels. Windows are strided views of the signal, so only the
+    rows of one chunk are ever copied; partial_fit carries the last
+    (dim - 1) * delay samples over so chunks of a stream join seamlessly.
+    """
+    def __init__(self, embedding_dim: int = 8, delay: int = 1, n_components: int = 3, stride: int = 1):
+        if embedding_dim < 1 or delay < 1 or stride < 1:
+            raise ValueError("embedding_dim, delay and stride must be positive")
+        self.embedding_dim = embedding_dim
+        self.delay = delay
+        self.stride = stride
+        self.pca = IncrementalPCA(n_components=n_components)
+        self._tail = None
+        self._leftover = None
+        self._seen = 0
+
+    @property
+    def span(self) -> int:
+        return (self.embedding_dim - 1) * self.delay + 1
+
+    def windows(self, data: np.ndarray, first: int = 0) -> np.ndarray:
+        """
+        Strided view (n_points x channels x embedding_dim) of the embedding, without copying.
+        """
+        data = np.asarray(data)
+        if data.shape[-1] < self.span:
+            return np.empty((0, data.shape[0], self.embedding_dim), dtype=data.dtype)
+        view = sliding_window_view(data, self.span, axis=-1)[:, first::self.stride, ::self.delay]
+        return view.transpose(1, 0, 2)
+
+    def partial_fit(self, chunk: np.ndarray):
+        """
+        Updates the PCA with the embedding points completed by a new chunk (channels x samples).
+        """
+        data = chunk if self._tail is None else np.concatenate([self._tail, chunk], axis=-1)
+        start = self._seen - (0 if self._tail is None else self._tail.shape[-1])
+        rows = self.windows(data, (-start) % self.stride)
+        rows = rows.reshape(len(rows), -1)
+        if self._leftover is not None:
+            rows = np.concatenate([self._leftover, rows])
+        # IncrementalPCA needs at least n_components rows per batch
+        if len(rows) < self.pca.n_components:
+            self._leftover = rows
+        else:
+            self.pca.partial_fit(rows)
+            self._leftover = None
+        self._tail = data[:, -(self.span - 1):] if self.span > 1 else None
+        self._seen += chunk.shape[-1]
+        return self
+
+    def flush(self):
+        """
+        Fits rows still held back for being fewer than n_components, if the PCA has seen nothing yet.
+        """
+        if self._leftover is not None and not hasattr(self.pca, "components_"):
+            self.pca.partial_fit(self._leftover)
+        self._leftover = None
+        return self
+
+    def transform(self, data: np.ndarray, chunk_size: int = 4096) -> np.ndarray:
+        """
+        Projects the embedding of a whole recording, chunk by chunk.
+        """
+        points = self.windows(data)
+        return np.concatenate([
+            self.pca.transform(points[i:i + chunk_size].reshape(-1, points.shape[1] * points.shape[2]))
+            for i in range(0, len(points), chunk_size)
+        ] or [np.empty((0, self.pca.n_components))])
+
+def delay_embedding_attractor(eeg_data: np.ndarray, sfreq: float, embedding_dim: int = 8, delay: int = None,
+                              n_components: int = 3, max_points: int = 1000, chunk_seconds: float = 10.0) -> dict:
+    """
+    Attractor of the EEG itself: sliding-window PCA of its delay embedding.
+    Args:
+        eeg_data: EEG (channels x samples); may be a np.memmap of a long recording.
+        embedding_dim: Delayed copies per channel.
+        delay: Delay in samples (defaults to 20 ms).
+        max_points: Points in the returned trajectory; the embedding is strided to fit.
+        chunk_seconds: Samples fitted per partial_fit call, which bounds memory.
+    Returns:
+        Dictionary with the trajectory (points x n_components) and embedding settings.
+    """
+    eeg_data = np.atleast_2d(eeg_data)
+    delay = delay or max(1, int(round(0.02 * sfreq)))
+    n_points = eeg_data.shape[-1] - (embedding_dim - 1) * delay
+    if n_points < n_components:
+        raise ValueError(f"Recording too short for a {embedding_dim}-dimensional embedding with delay {delay}")
+    model = DelayEmbeddingPCA(embedding_dim, delay, n_components, stride=max(1, -(-n_points // max_points)))
+    chunk = max(int(chunk_seconds * sfreq), model.span)
+    for start in range(0, eeg_data.shape[-1], chunk):
+        model.partial_fit(eeg_data[:, start:start + chunk])
+    model.flush()
+    return {
+        "trajectory": model.transform(eeg_data),
+        "explained_variance_ratio": model.pca.explained_variance_ratio_,
+        "embedding_dim": embedding_dim,
+        "delay": delay,
+        "stride": model.stride
+    }
 
 def compute_lyapunov_exponent(trajectory: np.ndarray, dt: float = 0.01) -> float:
     """
     Computes the largest Lyapunov exponent.
+    Reference implementation (two odeint solves per point) for compute_lyapunov_exponent_batched.
     """
     def lorenz(state, t):
         sigma, rho, beta = 10, 28, 8/3
@@ -56,6 +176,76 @@ def compute_lyapunov_exponent(trajectory: np.ndarray, dt: float = 0.01) -> float
         divergence += np.log(np.linalg.norm(next_perturbed - next_state) / 1e-5)
     return divergence / (n * dt)
 
+def lorenz_rhs(states: np.ndarray, sigma: float = 10, rho: float = 28, beta: float = 8/3) -> np.ndarray:
+    """
+    Lorenz vector field for an array of states (... x 3).
+    """
+    x, y, z = states[..., 0], states[..., 1], states[..., 2]
+    return np.stack([sigma * (y - x), x * (rho - z) - y, x * y - beta * z], axis=-1)
+
+def rk4_step(f, states: np.ndarray, dt: float, substeps: int = 1) -> np.ndarray:
+    """
+    Advances a batch of states by dt with classical RK4.
+    """
+    h = dt / substeps
+    for _ in range(substeps):
+        k1 = f(states)
+        k2 = f(states + h / 2 * k1)
+        k3 = f(states + h / 2 * k2)
+        k4 = f(states + h * k3)
+        states = states + h / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+    return states
+
+def compute_lyapunov_exponent_batched(trajectory: np.ndarray, dt: float = 0.01, substeps: int = 4) -> float:
+    """
+    Same estimator as compute_lyapunov_exponent, with every base and perturbed
+    point advanced together by one batched RK4 step instead of 2 odeint calls
+    per point. The perturbations are drawn in one call from the same global
+    np.random stream, so both functions see identical noise for the same seed.
+    """
+    n = len(trajectory)
+    states = np.asarray(trajectory[:-1], dtype=float)
+    perturbed = states + np.random.normal(0, 1e-5, (n - 1, 3))
+    advanced = rk4_step(lorenz_rhs, np.concatenate([states, perturbed]), dt, substeps)
+    distances = np.linalg.norm(advanced[n - 1:] - advanced[:n - 1], axis=1)
+    return float(np.sum(np.log(distances / 1e-5)) / (n * dt))
+
+def _lorenz_variational(y: np.ndarray, sigma: float = 10, rho: float = 28, beta: float = 8/3) -> np.ndarray:
+    # y is (... x 4 x 3): the state followed by the rows of the tangent matrix T; returns (f(state), J(state) @ T)
+    x, yy, z = y[..., 0, 0, None], y[..., 0, 1, None], y[..., 0, 2, None]
+    t0, t1, t2 = y[..., 1, :], y[..., 2, :], y[..., 3, :]
+    return np.stack([
+        lorenz_rhs(y[..., 0, :], sigma, rho, beta),
+        sigma * (t1 - t0),
+        (rho - z) * t0 - t1 - x * t2,
+        yy * t0 + x * t1 - beta * t2
+    ], axis=-2)
+
+def compute_lyapunov_spectrum(initial_state: np.ndarray, dt: float = 0.01, n_steps: int = 1000,
+                              substeps: int = 1, transient: int = 0) -> np.ndarray:
+    """
+    Full Lorenz Lyapunov spectrum by integrating the tangent (variational)
+    equations alongside the trajectory, re-orthonormalizing with QR each step.
+    Args:
+        initial_state: Starting point (3,) or a batch of starting points (... x 3).
+        dt: Step between re-orthonormalizations.
+        n_steps: Number of steps averaged over.
+        transient: Steps integrated first and discarded.
+    Returns:
+        Exponents from largest to smallest (... x 3); they sum to -(sigma + 1 + beta).
+    """
+    initial_state = np.asarray(initial_state, dtype=float)
+    y = np.concatenate([initial_state[..., None, :], np.broadcast_to(np.eye(3), initial_state.shape[:-1] + (3, 3))], axis=-2)
+    log_stretch = np.zeros(initial_state.shape)
+    for step in range(transient + n_steps):
+        y = rk4_step(_lorenz_variational, y, dt, substeps)
+        q, r = np.linalg.qr(y[..., 1:, :])
+        diag = np.diagonal(r, axis1=-2, axis2=-1)
+        y[..., 1:, :] = q * np.where(diag < 0, -1.0, 1.0)[..., None, :]
+        if step >= transient:
+            log_stretch += np.log(np.abs(diag))
+    return np.sort(log_stretch / (n_steps * dt), axis=-1)[..., ::-1]
+
 def visualize_attractor(trajectory: dict):
     """
     Visualizes Lorenz and PCA attractors.
@@ -0,0 +1,14 @@
+import sys
+import pytest
+
+@pytest.fixture(autouse=True)
+def artifact_dir(tmp_path, monkeypatch):
+    """Keeps artifact-model calibrations made by tests out of the model directory."""
+    directory = str(tmp_path / "artifacts")
+    monkeypatch.setenv("QCL_ARTIFACT_DIR", directory)
+    # already imported: the directory was read at import and the store singleton may exist
+    artifacts = sys.modules.get("models.artifacts")
+    if artifacts is not None:
+        monkeypatch.setattr(artifacts, "ARTIFACT_DIR", directory)
+        monkeypatch.setattr(artifacts, "_store", artifacts.ArtifactStore(directory))
+    return directory
@@ -0,0 +1,93 @@
+import os
+import threading
+import pytest
+import numpy as np
+import torch
+from models.artifacts import ArtifactModel, ArtifactStore, EEGCNN, main, montage_key
+
+def test_eegcnn_accepts_any_montage():
+    """Tests that the fully convolutional CNN keeps any (channels, samples) shape."""
+    model = EEGCNN()
+    for shape in [(1, 4, 1000), (2, 32, 257)]:
+        x = torch.rand(shape)
+        out = model(x)
+        assert out.shape == x.shape
+        assert torch.allclose(out, x)
+
+def test_artifact_model_is_affine_and_persisted(tmp_path):
+    eeg_data = np.random.rand(4, 1000)
+    sfreq = 256
+    model = ArtifactModel.fit(eeg_data, sfreq, epochs=2)
+    new_data = np.random.rand(4, 600)
+    assert np.allclose(model.unmix(new_data), model.projection @ new_data + model.offset[:, None])
+    model.save(str(tmp_path))
+    loaded = ArtifactModel.load(model.key, str(tmp_path))
+    assert loaded.ch_names == model.ch_names
+    assert np.allclose(loaded.apply(new_data), model.apply(new_data), atol=1e-6)
+
+def test_artifact_store_serves_calibrated_models(tmp_path):
+    """Tests that montages are only fitted by calibration and otherwise left uncorrected."""
+    store = ArtifactStore(str(tmp_path))
+    sfreq = 256
+    data = np.random.rand(4, 1000)
+    with pytest.warns(UserWarning):
+        identity = store.model(data, sfreq)
+    assert not identity.fitted and identity.fingerprint() == "identity"
+    assert np.allclose(identity.apply(data), data, atol=1e-6)
+    first = store.fit(data, sfreq, epochs=1)
+    assert store.model(np.random.rand(4, 2000), sfreq) is first
+    assert ArtifactStore(str(tmp_path)).get(first.key).fingerprint() == first.fingerprint()
+    with pytest.warns(UserWarning):
+        assert store.model(np.random.rand(6, 1000), sfreq).key != first.key
+    assert montage_key(["Fz", "Cz"], sfreq, "s01") != montage_key(["Cz", "Fz"], sfreq, "s01")
+
+def test_refits_replace_the_saved_pair(tmp_path):
+    """Tests that a refit swaps the manifest to a new pair, seen by other stores, and removes the old one."""
+    store, other = ArtifactStore(str(tmp_path)), ArtifactStore(str(tmp_path))
+    first = store.fit(np.random.rand(4, 1000), 256, epochs=1)
+    assert other.get(first.key).fingerprint() == first.fingerprint()
+    second = store.fit(np.random.rand(4, 1000) * 2, 256, epochs=1)
+    assert other.get(first.key).fingerprint() == second.fingerprint() != first.fingerprint()
+    assert sorted(os.listdir(tmp_path)) == sorted([f"{first.key}.json", f"{first.key}.lock",
+                                                   f"{first.key}-{second.fingerprint()}.npz",
+                                                   f"{first.key}-{second.fingerprint()}.pth"])
+
+def test_concurrent_calibrations_fit_once(tmp_path, monkeypatch):
+    """Tests that concurrent calibrations of a montage without refit share one fit."""
+    fits = []
+    fit = ArtifactModel.fit.__func__
+    def counted(cls, *args, **kwargs):
+        fits.append(1)
+        return fit(cls, *args, **kwargs)
+    monkeypatch.setattr(ArtifactModel, "fit", classmethod(counted))
+    data = np.random.rand(4, 1000)
+    models = []
+    threads = [threading.Thread(target=lambda: models.append(ArtifactStore(str(tmp_path)).fit(data, 256, refit=False, epochs=1)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(fits) == 1 and len({model.fingerprint() for model in models}) == 1
+
+def test_calibration_cli(tmp_path):
+    recording = tmp_path / "calibration.npz"
+    np.savez(recording, eeg_data=np.random.rand(4, 1000), sfreq=256, ch_names=np.array(["Fz", "Cz", "Pz", "Oz"]))
+    main([str(recording), "--subject", "s01", "--epochs", "1", "--artifact-dir", str(tmp_path / "artifacts")])
+    assert ArtifactStore(str(tmp_path / "artifacts")).get(montage_key(["Fz", "Cz", "Pz", "Oz"], 256, "s01")) is not None
+
+def test_denoise_in_chunks_matches_one_pass():
+    """Tests that overlapped chunks reproduce a single pass over the recording."""
+    model = ArtifactModel.fit(np.random.rand(4, 2000), 256, epochs=1, window=256)
+    data = np.random.rand(4, 3000)
+    with torch.inference_mode():
+        full = model.cnn(torch.tensor(data, dtype=torch.float32).unsqueeze(0)).squeeze(0).numpy()
+    assert np.allclose(model.denoise(data, chunk=300), full, atol=1e-5)
+
+def test_training_is_capped_and_refits_change_fingerprint(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    first = store.fit(np.random.rand(4, 5000), 256)
+    before = first.fingerprint()
+    first.train(first.unmix(np.random.rand(4, 5000)), epochs=1, window=128, max_windows=8, batch_size=4)
+    assert first.fingerprint() != before
+    assert store.fit(np.random.rand(4, 1000), 256, epochs=1).fingerprint() != first.fingerprint()
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from services import batch
+
+def _summary(eeg_data, sfreq, **_):
+    return {"mean": float(eeg_data.mean()), "band_power": {"alpha": eeg_data.std(axis=1)}}
+
+@pytest.fixture
+def recordings(tmp_path, monkeypatch):
+    monkeypatch.setitem(batch.TASKS, "summary", _summary)
+    for i in range(3):
+        np.save(tmp_path / f"rec{i}.npy", np.random.rand(4, 1000))
+    (tmp_path / "notes.txt").write_text("not a recording")
+    return tmp_path
+
+def test_find_recordings_from_directory_and_manifest(recordings):
+    """Tests directory scanning and .csv manifests with per-recording sampling rates."""
+    found = batch.find_recordings([str(recordings)], sfreq=256)
+    assert [r["path"].rsplit("/", 1)[1] for r in found] == ["rec0.npy", "rec1.npy", "rec2.npy"]
+    manifest = recordings / "manifest.csv"
+    manifest.write_text("path,sfreq,subject\nrec1.npy,512,s01\n")
+    listed = batch.find_recordings([str(manifest)])
+    assert listed[0]["sfreq"] == 512 and listed[0]["subject"] == "s01"
+    with pytest.raises(ValueError):
+        batch.find_recordings([str(recordings / "rec0.txt.bak")])
+
+def test_run_batch_writes_columns_and_resumes(recordings):
+    found = batch.find_recordings([str(recordings)], sfreq=256)
+    output = str(recordings / "results.npz")
+    summary = batch.run_batch(found, ["summary"], output, workers=1)
+    assert summary["processed"] == 3 and not summary["failed"]
+    with np.load(output, allow_pickle=True) as table:
+        assert table["summary/band_power/alpha"].shape == (3, 4)
+        assert table["n_samples"].tolist() == [1000] * 3
+        assert table["path"][0].endswith("rec0.npy")
+
+    np.save(recordings / "rec3.npy", np.random.rand(4, 500))
+    summary = batch.run_batch(batch.find_recordings([str(recordings)], sfreq=256), ["summary"], output, workers=1)
+    assert (summary["processed"], summary["skipped"]) == (1, 3)
+    with np.load(output, allow_pickle=True) as table:
+        assert len(table["summary/mean"]) == 4
+
+def test_failed_recordings_are_reported_and_retried(recordings):
+    """Tests that a failure is not checkpointed."""
+    found = batch.find_recordings([str(recordings)])
+    output = str(recordings / "results.npz")
+    summary = batch.run_batch(found, ["summary"], output, workers=1)
+    assert len(summary["failed"]) == 3
+    assert "sampling rate" in summary["failed"][0]["error"]
+    for r in found:
+        r["sfreq"] = 256
+    assert batch.run_batch(found, ["summary"], output, workers=1)["processed"] == 3
+
+def test_checkpoints_follow_pipeline_and_calibration(recordings, monkeypatch):
+    """Tests that a pipeline bump, a recalibration or force reprocess checkpointed recordings."""
+    from models import eeg
+    from models.artifacts import artifact_store
+    found = batch.find_recordings([str(recordings)], sfreq=256)
+    output = str(recordings / "results.npz")
+    assert batch.run_batch(found, ["summary"], output, workers=1)["processed"] == 3
+    assert batch.run_batch(found, ["summary"], output, workers=1, force=True)["processed"] == 3
+    artifact_store().fit(np.random.rand(4, 1000), 256, epochs=1)
+    assert batch.run_batch(found, ["summary"], output, workers=1)["processed"] == 3
+    assert batch.run_batch(found, ["summary"], output, workers=1)["skipped"] == 3
+    monkeypatch.setattr(eeg, "PIPELINE_VERSION", eeg.PIPELINE_VERSION + "-next")
+    assert batch.run_batch(found, ["summary"], output, workers=1)["processed"] == 3
@@ -0,0 +1,48 @@
+import asyncio
+import numpy as np
+import pytest
+from api.batching import MicroBatcher
+
+def test_concurrent_items_share_one_batch():
+    """Tests that concurrent submissions run as one vectorized call."""
+    shapes = []
+
+    def batch_fn(X):
+        shapes.append(X.shape)
+        return list(X.sum(axis=1))
+
+    batcher = MicroBatcher("test_sum", batch_fn, max_batch_size=8, max_latency_ms=50)
+
+    async def run():
+        return await asyncio.gather(*(batcher.submit(np.full(3, i, dtype=float)) for i in range(5)))
+
+    assert asyncio.run(run()) == [0.0, 3.0, 6.0, 9.0, 12.0]
+    assert shapes == [(5, 3)]
+    assert batcher.stats()["mean_batch_size"] == 5
+
+def test_full_batch_flushes_without_waiting():
+    """Tests that max_batch_size splits the work."""
+    sizes = []
+
+    def batch_fn(X):
+        sizes.append(len(X))
+        return list(X)
+
+    batcher = MicroBatcher("test_split", batch_fn, max_batch_size=4, max_latency_ms=1000)
+
+    async def run():
+        return await asyncio.wait_for(asyncio.gather(*(batcher.submit(np.array([i])) for i in range(8))), 0.5)
+
+    asyncio.run(run())
+    assert sizes == [4, 4]
+
+def test_batch_errors_reach_every_caller():
+    def batch_fn(X):
+        raise ValueError("bad batch")
+
+    batcher = MicroBatcher("test_error", batch_fn, max_latency_ms=1)
+
+    async def run():
+        return await asyncio.gather(batcher.submit(np.zeros(2)), batcher.submit(np.zeros(2)), return_exceptions=True)
+
+    assert all(isinstance(r, ValueError) for r in asyncio.run(run()))
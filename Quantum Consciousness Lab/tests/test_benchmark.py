@@ -1,10 +1,42 @@
-import time
 import numpy as np
-from models.eeg import analyze_eeg_band
+from benchmarks import harness
+from benchmarks.harness import compare, measure
 
 def test_benchmark_eeg_processing():
+    from models.eeg import analyze_eeg_band
     eeg_data = np.random.rand(4, 1000)
     sfreq = 256
-    start = time.time()
-    analyze_eeg_band(eeg_data, sfreq)
-    assert time.time() - start < 1.0
+    result = measure(lambda: analyze_eeg_band(eeg_data, sfreq, cache=False), repeats=3)
+    assert result["wall"]["median"] < 1.0
+
+def test_measure_records_time_and_memory():
+    """Tests wall-time statistics, peak RSS and traced allocations."""
+    result = measure(lambda: np.ones(10**6).sum(), repeats=3)
+    assert result["repeats"] == 3
+    assert 0 < result["wall"]["min"] <= result["wall"]["median"]
+    assert result["alloc_peak_bytes"] >= 8 * 10**6
+    assert result["peak_rss_bytes"] > 0
+
+def test_parameterized_cases_are_stored_and_compared(tmp_path, monkeypatch):
+    monkeypatch.setattr(harness, "BENCHMARKS", {})
+    @harness.benchmark("sum", channels=[4, 64], seconds=[1, 10])
+    def summing(channels, seconds):
+        data = np.random.rand(channels, seconds * 256)
+        return lambda: data.sum()
+    @harness.benchmark("broken")
+    def broken():
+        raise ImportError("optional dependency missing")
+
+    assert [case for case, _, _ in harness.cases(quick=True)] == ["sum[channels=4,seconds=1]", "broken"]
+    report = harness.run(names="sum", repeats=2)
+    assert len(report["results"]) == 4
+    assert harness.run(names="broken")["results"]["broken"]["error"].startswith("ImportError")
+
+    path = str(tmp_path / "baseline.json")
+    harness.save(report, path)
+    baseline = harness.load(path)
+    slower = {"results": {case: {**result, "wall": {"median": result["wall"]["median"] * 2}}
+                          for case, result in baseline["results"].items()}}
+    rows = compare(baseline, slower, threshold=0.2)
+    assert all(row["regression"] for row in rows if row["metric"] == "wall.median")
+    assert not any(row["regression"] for row in compare(baseline, baseline))
@@ -0,0 +1,40 @@
+import pytest
+import numpy as np
+from models.cache import FeatureCache, LRUCache, feature_key
+
+def test_feature_key():
+    """Tests that keys depend on data, sfreq and config."""
+    eeg_data = np.random.rand(4, 1000)
+    key = feature_key(eeg_data, 256)
+    assert key == feature_key(eeg_data.copy(), 256)
+    assert key != feature_key(eeg_data, 512)
+    assert key != feature_key(eeg_data, 256, {"pipeline": "2"})
+    assert key != feature_key(eeg_data.astype(np.float32), 256)
+
+def test_lru_eviction_by_size():
+    """Tests that the least recently used entries are evicted first."""
+    cache = LRUCache(max_bytes=2 * 8000)
+    cache.put("a", np.zeros(1000))
+    cache.put("b", np.zeros(1000))
+    cache.get("a")
+    cache.put("c", np.zeros(1000))
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+    assert cache.size <= cache.max_bytes
+
+def test_feature_cache_merge_and_disk(tmp_path):
+    """Tests merging of partial results and the on-disk tier."""
+    cache = FeatureCache(max_bytes=1024 ** 2, cache_dir=str(tmp_path))
+    cache.put("k", {"band_power": {"alpha": 1.0}})
+    cache.put("k", {"entropy": 0.5})
+    assert set(cache.get("k")) == {"band_power", "entropy"}
+    reloaded = FeatureCache(max_bytes=1024 ** 2, cache_dir=str(tmp_path))
+    assert reloaded.get("k")["entropy"] == 0.5
+
+def test_feature_cache_put_does_not_count_lookups():
+    """Tests that merging on put leaves the hit/miss counters alone."""
+    cache = FeatureCache(max_bytes=1024 ** 2)
+    cache.put("k", {"entropy": 0.5})
+    cache.put("k", {"qft_noise": 0.1})
+    assert cache.hits == 0 and cache.misses == 0
+    assert set(cache.get("k")) == {"entropy", "qft_noise"}
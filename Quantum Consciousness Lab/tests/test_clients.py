@@ -0,0 +1,29 @@
+import os
+import pytest
+from database.clients import ClientManager
+
+def test_clients_are_lazy_and_shared():
+    """Tests that clients are created on first use and reused."""
+    manager = ClientManager()
+    assert manager._clients == {}
+    assert manager.influx() is manager.influx()
+    manager.close()
+    assert manager._clients == {}
+
+def test_clients_reset_after_fork():
+    """Tests that a child process does not reuse the parent's client."""
+    manager = ClientManager()
+    parent = manager.influx()
+    manager._pid = os.getpid() + 1
+    assert manager.influx() is not parent
+    manager.close()
+    parent.close()
+
+def test_health_reports_unreachable_backends(monkeypatch):
+    monkeypatch.setattr("database.clients.INFLUX_URL", "http://127.0.0.1:9")
+    monkeypatch.setattr("database.clients.MONGO_URI", "mongodb://127.0.0.1:9/")
+    monkeypatch.setattr("database.clients.MONGO_TIMEOUT_MS", 100)
+    status = ClientManager().health()
+    assert set(status) == {"mongo", "influx"}
+    assert not status["influx"]["ok"]
+    assert status["influx"]["error"]
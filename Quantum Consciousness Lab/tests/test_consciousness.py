@@ -1,6 +1,6 @@
 import pytest
 import numpy as np
-from models.consciousness import compute_consciousness, compute_c_sigma
+from models.consciousness import compute_consciousness, compute_consciousness_batch, compute_c_sigma
 
 def test_compute_consciousness():
     rho = np.diag([0.25, 0.25, 0.25, 0.25]).flatten().tolist()
@@ -14,3 +14,37 @@ def test_compute_c_sigma():
     result = compute_c_sigma(eeg_data, sfreq)
     assert "C_sigma(t)" in result
     assert len(result["C(t)_values"]) == 10
+
+def test_compute_consciousness_batch():
+    rhos = np.array([np.diag(v / v.sum()) for v in np.random.rand(3, 4)])
+    ones = np.ones(3)
+    result = compute_consciousness_batch(rhos, 0.5 * ones, 0.1 * ones, 0.1 * ones, 0.1 * ones)
+    for i in range(3):
+        expected = compute_consciousness(rhos[i].flatten().tolist(), 0.5, 0.1, 0.1, 0.1)
+        assert np.isclose(result["C(t)"][i], expected["C(t)"])
+
+def test_compute_c_sigma_sliding_windows():
+    eeg_data = np.random.rand(4, 1000)
+    sfreq = 256
+    result = compute_c_sigma(eeg_data, sfreq, time_windows=10, hop=50)
+    assert len(result["C(t)_values"]) == 19
+
+def test_compute_c_sigma_batched_matches_per_window():
+    """Tests that the batched path computes the same C(t) as the per-window pipeline."""
+    eeg_data = np.random.rand(4, 5120)
+    sfreq = 256
+    batched = compute_c_sigma(eeg_data, sfreq, time_windows=4)
+    per_window = compute_c_sigma(eeg_data, sfreq, time_windows=4, batched=False)
+    assert np.allclose(batched["C(t)_values"], per_window["C(t)_values"], rtol=0.1)
+    sliding = compute_c_sigma(eeg_data, sfreq, time_windows=4, hop=640, batched=False)
+    assert len(sliding["C(t)_values"]) == 7
+
+def test_c_t_blocks_do_not_change_results():
+    """Tests that processing windows in blocks gives the same C(t) as one block."""
+    from models.consciousness import _c_t_batched
+    eeg_data = np.random.rand(4, 2048)
+    sfreq = 256
+    blocked = _c_t_batched(eeg_data, sfreq, 512, 64, block=5)
+    whole = _c_t_batched(eeg_data, sfreq, 512, 64, block=1000)
+    assert len(blocked) == 25
+    assert np.allclose(blocked, whole)
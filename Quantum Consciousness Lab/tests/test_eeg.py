@@ -1,6 +1,6 @@
 import pytest
 import numpy as np
-from models.eeg import analyze_eeg_band
+from models.eeg import analyze_eeg_band, resolve_stages
 
 def test_analyze_eeg_band():
     eeg_data = np.random.rand(4, 1000)
@@ -8,3 +8,40 @@ def test_analyze_eeg_band():
     result = analyze_eeg_band(eeg_data, sfreq)
     assert "band_power" in result
     assert len(result["fft_frequencies"]) > 0
+
+def test_analyze_eeg_band_selected_features():
+    eeg_data = np.random.rand(4, 1000)
+    sfreq = 256
+    result = analyze_eeg_band(eeg_data, sfreq, features=["band_power"])
+    assert set(result) == {"band_power"}
+    assert "wavelet" not in resolve_stages(["band_power"])
+    assert "wpli" not in resolve_stages(["band_power"])
+    assert "wavelet" not in resolve_stages(["wavelet_power"])
+    assert "wavelet" not in resolve_stages(["wavelet_scalogram"])
+    with pytest.raises(ValueError):
+        resolve_stages(["not_a_feature"])
+
+def test_wpli_matrix_feature():
+    eeg_data = np.random.rand(4, 1000)
+    sfreq = 256
+    result = analyze_eeg_band(eeg_data, sfreq, features=["wpli_matrix", "connectivity_wpli"], as_arrays=True)
+    assert result["wpli_matrix"].shape == (4, 4)
+    assert np.isclose(result["connectivity_wpli"], result["wpli_matrix"][np.triu_indices(4, k=1)].mean())
+
+def test_as_arrays_results_are_read_only():
+    eeg_data = np.random.rand(4, 1000)
+    sfreq = 256
+    result = analyze_eeg_band(eeg_data, sfreq, features=["fft_power"], as_arrays=True)
+    with pytest.raises(ValueError):
+        result["fft_power"][0, 0] = 0.0
+    again = analyze_eeg_band(eeg_data, sfreq, features=["fft_power"], as_arrays=True)
+    assert np.array_equal(result["fft_power"], again["fft_power"])
+
+def test_wavelet_scalogram_feature():
+    eeg_data = np.random.rand(4, 1000)
+    sfreq = 256
+    result = analyze_eeg_band(eeg_data, sfreq, features=["wavelet_scalogram", "scalogram_frequencies"], as_arrays=True,
+                              decimate=10)
+    assert result["wavelet_scalogram"].shape == (127, 4, 100)
+    assert result["wavelet_scalogram"].dtype == np.float32
+    assert len(result["scalogram_frequencies"]) == 127
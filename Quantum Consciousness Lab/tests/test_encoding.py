@@ -0,0 +1,56 @@
+import io
+import pytest
+import numpy as np
+from fastapi import HTTPException
+from api.encoding import decimate_spectra, encode_npz, encode_response, spectra_features
+
+def mock_result():
+    return {
+        "band_power": {"alpha": 1.0, "beta": 2.0},
+        "entropy": 0.3,
+        "fft_frequencies": np.fft.fftfreq(1000, 1 / 256),
+        "fft_power": np.random.rand(4, 1000),
+        "wavelet_coeffs": np.random.rand(127, 4, 1000),
+        "tensor_factors": [np.ones((4, 3)), np.ones((1000, 3))]
+    }
+
+def test_decimate_spectra():
+    """Tests FFT and wavelet decimation."""
+    result = decimate_spectra(mock_result(), factor=10)
+    assert result["fft_power"].shape == (4, 50)
+    assert result["wavelet_coeffs"].shape == (127, 4, 100)
+    assert result["wavelet_coeffs"].dtype == np.float32
+
+def test_encode_npz():
+    """Tests that arrays round-trip as typed buffers."""
+    result = mock_result()
+    archive = np.load(io.BytesIO(encode_npz(result)))
+    assert np.array_equal(archive["fft_power"], result["fft_power"])
+    assert float(archive["band_power/alpha"]) == 1.0
+    assert archive["tensor_factors/1"].shape == (1000, 3)
+
+def test_encode_response_negotiation():
+    assert encode_response(mock_result(), "application/x-npz").media_type == "application/x-npz"
+    assert encode_response(mock_result(), None).media_type == "application/json"
+
+def test_encode_response_missing_codec_is_not_acceptable():
+    """Tests that an uninstalled binary codec is 406 rather than a bad request."""
+    try:
+        import pyarrow
+        pytest.skip("pyarrow is installed")
+    except ImportError:
+        pass
+    with pytest.raises(HTTPException) as excinfo:
+        encode_response(mock_result(), "application/vnd.apache.arrow.stream")
+    assert excinfo.value.status_code == 406
+
+def test_decimated_responses_use_the_scalogram():
+    """Tests that decimated responses never request the full wavelet cube."""
+    features = ["band_power", "fft_power", "wavelet_coeffs", "wavelet_frequencies", "wavelet_scalogram", "scalogram_frequencies"]
+    assert spectra_features(features, "decimated") == ["band_power", "fft_power", "wavelet_scalogram", "scalogram_frequencies"]
+    assert spectra_features(features, "full") == ["band_power", "fft_power", "wavelet_coeffs", "wavelet_frequencies"]
+    assert spectra_features(features, "summary") == ["band_power"]
+    scalogram = np.random.rand(127, 4, 125).astype(np.float32)
+    result = decimate_spectra({"wavelet_scalogram": scalogram, "scalogram_frequencies": np.arange(127.0)}, factor=8)
+    assert result["wavelet_coeffs"] is scalogram
+    assert "wavelet_scalogram" not in result and len(result["wavelet_frequencies"]) == 127
@@ -0,0 +1,32 @@
+import asyncio
+import time
+import pytest
+from fastapi import HTTPException
+from api.executor import EndpointLimiter, offload
+
+def test_offload_runs_off_loop():
+    """Tests that blocking calls run in the thread pool."""
+    async def run():
+        return await offload("test_sleep", time.sleep, 0.01), await offload("test_sum", sum, [1, 2, 3])
+    assert asyncio.run(run()) == (None, 6)
+
+def test_limiter_rejects_when_queue_full():
+    """Tests 429 back-pressure once concurrency and queue depth are exhausted."""
+    limiter = EndpointLimiter("test", concurrency=1, queue_depth=1)
+
+    async def hold():
+        async with limiter:
+            await asyncio.sleep(0.05)
+
+    async def run():
+        first = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        second = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as exc:
+            async with limiter:
+                pass
+        await asyncio.gather(first, second)
+        return exc.value.status_code
+
+    assert asyncio.run(run()) == 429
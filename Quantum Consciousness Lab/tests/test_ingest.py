@@ -0,0 +1,24 @@
+import io
+import pytest
+import numpy as np
+from api.ingest import decode_eeg, eeg_from_message
+
+def test_decode_raw_float32():
+    """Tests zero-copy decoding of a raw little-endian buffer."""
+    eeg_data = np.random.rand(4, 1000).astype("<f4")
+    result = decode_eeg(eeg_data.tobytes(), "application/octet-stream", "4,1000", "float32")
+    assert result.shape == (4, 1000)
+    assert np.array_equal(result, eeg_data)
+    with pytest.raises(ValueError):
+        decode_eeg(eeg_data.tobytes(), "application/octet-stream", "4,999", "float32")
+
+def test_decode_npy():
+    eeg_data = np.random.rand(4, 1000)
+    buffer = io.BytesIO()
+    np.save(buffer, eeg_data)
+    assert np.array_equal(decode_eeg(buffer.getvalue(), "application/x-npy"), eeg_data)
+
+def test_eeg_from_message_binary_attachment():
+    eeg_data = np.random.rand(4, 100)
+    message = {"eeg_data": eeg_data.tobytes(), "shape": [4, 100], "dtype": "float64"}
+    assert np.array_equal(eeg_from_message(message), eeg_data)
@@ -0,0 +1,81 @@
+import threading
+import time
+import pytest
+from api import jobs
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setitem(jobs.JOB_KINDS, "sleep", "time:sleep")
+    monkeypatch.setitem(jobs.JOB_KINDS, "sqrt", "math:sqrt")
+    manager = jobs.JobManager(max_workers=1, db_path=str(tmp_path / "jobs.sqlite3"))
+    yield manager
+    manager.shutdown()
+
+def wait_for(manager, job_id, timeout=30.0):
+    deadline = time.time() + timeout
+    while manager.status(job_id)["status"] not in jobs.FINISHED and time.time() < deadline:
+        time.sleep(0.05)
+    return manager.status(job_id)
+
+def test_job_lifecycle(manager):
+    """Tests submission, results and failures of background jobs."""
+    events = []
+    manager.add_listener(lambda job: events.append(job["status"]))
+    job_id = manager.submit("sqrt", 16.0)
+    assert wait_for(manager, job_id)["result"] == 4.0
+    # listeners are called just after the status is stored
+    deadline = time.time() + 5.0
+    while events[-1] != "done" and time.time() < deadline:
+        time.sleep(0.01)
+    assert events[0] == "pending" and events[-1] == "done"
+    failed = wait_for(manager, manager.submit("sqrt", -1.0))
+    assert failed["status"] == "failed"
+    assert "ValueError" in failed["error"]
+
+def test_job_cancellation(manager):
+    """Tests cancelling running and queued jobs."""
+    running = manager.submit("sleep", 30)
+    queued = manager.submit("sleep", 30)
+    while manager.status(running)["status"] != "running":
+        time.sleep(0.05)
+    assert manager.status(queued)["queue_position"] == 0
+    assert manager.cancel(queued)
+    assert manager.cancel(running)
+    assert manager.status(running)["status"] == "cancelled"
+    assert wait_for(manager, manager.submit("sqrt", 9.0))["result"] == 3.0
+    with pytest.raises(ValueError):
+        manager.submit("unknown")
+
+def test_unfinished_jobs_fail_on_restart(tmp_path):
+    """Tests that jobs left pending or running by a previous process do not stay so forever."""
+    db_path = str(tmp_path / "jobs" / "jobs.sqlite3")
+    store = jobs.JobStore(db_path)
+    store.create("a", "sqrt")
+    store.create("b", "sqrt")
+    store.update("b", status=jobs.RUNNING)
+    store.close()
+    manager = jobs.JobManager(max_workers=1, db_path=db_path)
+    try:
+        for job_id in ("a", "b"):
+            job = manager.status(job_id)
+            assert job["status"] == "failed"
+            assert "restart" in job["error"]
+    finally:
+        manager.shutdown()
+
+def test_job_manager_singleton_is_created_once(monkeypatch):
+    """Tests that concurrent first calls to job_manager() share a single manager."""
+    created = []
+    class SlowManager:
+        def __init__(self):
+            time.sleep(0.1)
+            created.append(self)
+    monkeypatch.setattr(jobs, "JobManager", SlowManager)
+    monkeypatch.setattr(jobs, "_manager", None)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(jobs.job_manager())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(created) == 1 and all(result is created[0] for result in results)
@@ -0,0 +1,29 @@
+import pytest
+from api.lazy import LazyModule, ModuleUnavailable, import_stats, lazy, prewarm
+
+def test_lazy_module_imports_on_first_use():
+    """Tests that the import happens on attribute access and is timed."""
+    module = LazyModule("json")
+    assert not module.stats()["loaded"]
+    assert module.dumps([1]) == "[1]"
+    stats = module.stats()
+    assert stats["loaded"]
+    assert stats["seconds"] >= 0
+
+def test_missing_module_is_a_503():
+    """Tests that an import failure only affects users of that module."""
+    module = LazyModule("qcl_missing_backend")
+    with pytest.raises(ModuleUnavailable) as exc:
+        module.run
+    assert exc.value.status_code == 503
+    assert "ModuleNotFoundError" in module.stats()["error"]
+    with pytest.raises(ModuleUnavailable):
+        module.load()
+
+def test_prewarm_records_every_module():
+    lazy("colorsys")
+    lazy("qcl_missing_plugin")
+    prewarm(["colorsys", "qcl_missing_plugin"]).join(timeout=5)
+    stats = import_stats()
+    assert stats["colorsys"]["loaded"]
+    assert stats["qcl_missing_plugin"]["error"]
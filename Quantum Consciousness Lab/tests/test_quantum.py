@@ -1,6 +1,6 @@
 import pytest
 import numpy as np
-from models.quantum import initialize_wave_packet
+from models.quantum import initialize_wave_packet, sample_vacuum_fluctuations, wave_packet_qnode, wave_packet_states
 
 def test_initialize_wave_packet():
     eeg_data = np.random.rand(4, 1000)
@@ -9,3 +9,28 @@ def test_initialize_wave_packet():
     assert "density_matrix" in result
     rho = np.array(result["density_matrix"])
     assert np.allclose(np.trace(rho), 1)
+
+def test_qnodes_are_reused():
+    assert wave_packet_qnode(5) is wave_packet_qnode(5)
+
+def test_sample_vacuum_fluctuations():
+    state = np.random.rand(4) + 1j * np.random.rand(4)
+    state /= np.linalg.norm(state)
+    noise = sample_vacuum_fluctuations(np.outer(state, state.conj()), n_samples=20)
+    assert isinstance(noise, float)
+    assert noise >= 0
+
+def test_wave_packet_states_match_circuit():
+    """Tests the closed-form states against the PennyLane reference circuit."""
+    amplitudes = np.random.rand(3, 5)
+    amplitudes /= amplitudes.sum(axis=1, keepdims=True)
+    t = np.linspace(0, 1, 4)
+    result = wave_packet_states(amplitudes, t, density_matrix=True)
+    assert result["statevector"].shape == (3, 4, 32)
+    assert result["density_matrix"].shape == (3, 4, 32, 32)
+    freqs = np.array([2.5, 6.0, 10.0, 21.0, 65.0])
+    for k in range(3):
+        for j, tj in enumerate(t):
+            reference = wave_packet_qnode(5)(amplitudes[k] * np.cos(2 * np.pi * freqs * tj),
+                                             amplitudes[k] * np.sin(2 * np.pi * freqs * tj))
+            assert np.allclose(result["statevector"][k, j], reference)
@@ -0,0 +1,51 @@
+import pytest
+import numpy as np
+from models.registry import ModelRegistry
+
+def test_placeholder_when_no_artifact(tmp_path):
+    """Tests that a missing artifact falls back to a placeholder with a warning."""
+    registry = ModelRegistry(str(tmp_path))
+    with pytest.warns(UserWarning):
+        result = registry.predict("svm_eeg", np.random.rand(3, 7))
+    assert result["version"] == "placeholder"
+    assert result["probabilities"].shape == (3, 2)
+
+def test_unreadable_artifact_falls_back(tmp_path):
+    """Tests that a corrupt legacy artifact is not fatal."""
+    (tmp_path / "svm_eeg.joblib").write_bytes(b"\n")
+    registry = ModelRegistry(str(tmp_path))
+    assert registry.versions("svm_eeg") == ["0"]
+    with pytest.warns(UserWarning):
+        version, _ = registry.get("svm_eeg")
+    assert version == "placeholder"
+
+def test_train_and_reload(tmp_path):
+    """Tests that trained versions are persisted and served warm."""
+    X = np.random.rand(40, 5)
+    y = np.arange(40) % 3
+    registry = ModelRegistry(str(tmp_path))
+    assert registry.train("rf_emotion", X, y) == "1"
+    assert registry.train("rf_emotion", X, y) == "2"
+    assert registry.versions("rf_emotion") == ["1", "2"]
+
+    reloaded = ModelRegistry(str(tmp_path))
+    result = reloaded.predict("rf_emotion", X[:4])
+    assert result["version"] == "2"
+    assert result["classes"] == ["happy", "sad", "neutral"]
+    assert reloaded.get("rf_emotion")[1] is reloaded.get("rf_emotion")[1]
+    assert reloaded.predict("rf_emotion", X[:4], version="1")["version"] == "1"
+
+def test_feature_count_is_checked(tmp_path):
+    with pytest.raises(ValueError):
+        ModelRegistry(str(tmp_path)).predict("svm_eeg", np.random.rand(2, 5))
+
+def test_predictions_are_training_labels(tmp_path):
+    """Tests that predictions are the fitted labels, not probability column indices."""
+    rng = np.random.default_rng(0)
+    y = np.repeat([2, 5, 9], 20)
+    X = rng.random((60, 5)) + y[:, None]
+    registry = ModelRegistry(str(tmp_path))
+    registry.train("rf_emotion", X, y)
+    result = registry.predict("rf_emotion", X)
+    assert set(result["predictions"].tolist()) <= {2, 5, 9}
+    assert np.array_equal(result["predictions"], registry.get("rf_emotion")[1].predict(X))
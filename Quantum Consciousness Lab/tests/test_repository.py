@@ -0,0 +1,52 @@
+import pytest
+import numpy as np
+from database.repository import DatasetStore, LocalChunkBackend, add_dataset, compress, decompress, get_dataset
+
+def test_compress_roundtrip():
+    """Tests shuffled zlib chunks."""
+    block = np.random.rand(4, 1000).astype(np.float32)
+    assert np.array_equal(decompress(compress(block), block.dtype, block.shape), block)
+
+def test_ranged_reads(tmp_path):
+    """Tests channel and time-slice reads across chunk boundaries."""
+    eeg_data = np.random.rand(10, 5000)
+    store = DatasetStore(LocalChunkBackend(str(tmp_path)), chunk_channels=4, chunk_samples=1024)
+    store.put("session", {"eeg": eeg_data}, channel_names=[f"E{i}" for i in range(10)], sfreq=256)
+    assert store.meta("session")["arrays"]["eeg"]["shape"] == [10, 5000]
+    assert np.allclose(store.read("session", "eeg"), eeg_data.astype(np.float32))
+    part = store.read("session", "eeg", channels=[9, 2, 3], start=1000, stop=3100)
+    assert np.allclose(part, eeg_data[[9, 2, 3], 1000:3100].astype(np.float32))
+    assert np.allclose(store.read("session", "eeg", channels=["E5"], start=4090), eeg_data[[5], 4090:].astype(np.float32))
+    assert store.read("session", "eeg", start=10, stop=10).shape == (10, 0)
+
+def test_add_dataset_splits_arrays(tmp_path):
+    """Tests that arrays leave the metadata document."""
+    store = DatasetStore(LocalChunkBackend(str(tmp_path)))
+    result = add_dataset({"eeg": np.random.rand(4, 1000), "labels": [0, 1, 1], "subject": "s01", "sfreq": 256}, "s01", store)
+    assert result == {"status": "added"}
+    meta = store.meta("s01")
+    assert meta["attrs"] == {"subject": "s01", "sfreq": 256}
+    assert set(meta["arrays"]) == {"eeg", "labels"}
+    assert get_dataset("s01", "labels", store=store).tolist() == [0, 1, 1]
+    assert store.names() == ["s01"]
+    store.delete("s01")
+    with pytest.raises(KeyError):
+        store.meta("s01")
+
+def test_put_replaces_old_chunks(tmp_path):
+    """Tests that re-storing a dataset leaves no chunks of the previous layout behind."""
+    store = DatasetStore(LocalChunkBackend(str(tmp_path)), chunk_channels=2, chunk_samples=100)
+    store.put("s01", {"eeg": np.random.rand(6, 1000)})
+    replacement = np.random.rand(2, 50)
+    store.put("s01", {"eeg": replacement})
+    assert sorted(f for f in (tmp_path / "s01").iterdir() if f.suffix == ".chunk") == [tmp_path / "s01" / "eeg.0.0.chunk"]
+    assert np.allclose(store.read("s01", "eeg"), replacement.astype(np.float32))
+
+def test_add_dataset_keeps_scalars_in_attrs(tmp_path):
+    store = DatasetStore(LocalChunkBackend(str(tmp_path)))
+    add_dataset({"eeg": np.random.rand(2, 100), "sfreq": np.array(256.0), "trials": np.int64(3)}, "s02", store)
+    meta = store.meta("s02")
+    assert meta["attrs"] == {"sfreq": 256.0, "trials": 3}
+    assert set(meta["arrays"]) == {"eeg"}
+    with pytest.raises(ValueError):
+        store.put("s03", {"x": np.array(1.0)})
@@ -0,0 +1,31 @@
+import pytest
+import numpy as np
+from models.streaming import StreamingCEngine, stream_settings, STREAM_MAX_WINDOW_SECONDS, STREAM_MIN_HOP_SECONDS
+
+def test_streaming_engine_emits_at_hop():
+    """Tests that C(t) frames are emitted once per hop after the first full window."""
+    sfreq = 256
+    engine = StreamingCEngine(4, sfreq, window_seconds=1.0, hop_seconds=0.25)
+    eeg_data = np.random.rand(4, 4 * sfreq)
+    frames = []
+    for start in range(0, eeg_data.shape[1], 100):
+        frames.extend(engine.push(eeg_data[:, start:start + 100]))
+    assert len(frames) == 13
+    assert frames[0]["t"] == 1.0
+    assert all("C(t)" in frame for frame in frames)
+
+def test_streaming_engine_rejects_channel_mismatch():
+    engine = StreamingCEngine(4, 256)
+    with pytest.raises(ValueError):
+        engine.push(np.random.rand(3, 100))
+
+def test_stream_settings_are_validated_and_clamped():
+    """Tests that client-supplied window and hop lengths cannot be unbounded or non-positive."""
+    assert stream_settings(256, 2.0, 0.25) == (2.0, 0.25)
+    window, hop = stream_settings(256, 1e9, 1e-9)
+    assert window == STREAM_MAX_WINDOW_SECONDS and hop == STREAM_MIN_HOP_SECONDS
+    for window, hop in [(0, 0.25), (2.0, -1), ("2", 0.25), (float("nan"), 0.25), (1.0, 2.0)]:
+        with pytest.raises(ValueError):
+            stream_settings(256, window, hop)
+    with pytest.raises(ValueError):
+        StreamingCEngine(4, 256, window_seconds=0)
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from scipy.signal import hilbert
+from models.synchrony import connectivity_matrices, connectivity_matrix, phase_sync, segment_spectra, upper_triangle
+
+def test_connectivity_matrices_match_direct_computation():
+    """Tests tiled PLV, WPLI and coherence against the full cross-spectrum."""
+    eeg_data = np.random.rand(6, 1000)
+    sfreq = 256
+    spectra, _ = segment_spectra(eeg_data, sfreq)
+    spectra = spectra.astype(complex)
+    cross = np.einsum('isf,jsf->ijsf', spectra, spectra.conj())
+    power = np.mean(np.abs(spectra)**2, axis=1)
+    with np.errstate(invalid="ignore"):
+        expected = {
+            "plv": np.abs(np.mean(cross / np.abs(cross), axis=2)).mean(axis=-1),
+            "wpli": (np.abs(cross.imag.mean(axis=2)) / np.abs(cross.imag).mean(axis=2)).mean(axis=-1),
+            "coh": (np.abs(cross.mean(axis=2)) / np.sqrt(power[:, None] * power[None])).mean(axis=-1),
+        }
+    result = connectivity_matrices(eeg_data, sfreq, ("plv", "wpli", "coh"), tile=4, tile_bytes=4096, workers=2)
+    for method, matrix in result.items():
+        assert matrix.shape == (6, 6)
+        assert np.allclose(matrix, matrix.T)
+        assert np.allclose(upper_triangle(matrix), upper_triangle(expected[method]), atol=1e-5)
+    assert np.allclose(np.diag(result["plv"]), 1.0)
+    with pytest.raises(ValueError):
+        connectivity_matrix(eeg_data, sfreq, "granger")
+
+def test_phase_sync_matches_channel_pairs():
+    eeg_data = np.random.rand(6, 1000)
+    phase = np.angle(hilbert(eeg_data, axis=1))
+    expected = np.mean(np.cos(phase[:, None, :] - phase[None, :, :]))
+    assert np.isclose(phase_sync(eeg_data, tile=4), expected)
+
+def test_connectivity_matrices_over_window_stack():
+    data = np.random.default_rng(3).standard_normal((3, 5, 1024))
+    stacked = connectivity_matrices(data, 256, ("wpli", "plv"))
+    assert stacked["wpli"].shape == (3, 5, 5)
+    for w in range(3):
+        single = connectivity_matrices(data[w], 256, ("wpli", "plv"))
+        assert np.allclose(stacked["wpli"][w], single["wpli"])
+        assert np.allclose(stacked["plv"][w], single["plv"])
+    assert upper_triangle(stacked["wpli"]).shape == (3, 10)
+
+def test_short_recordings_use_several_segments():
+    """Tests that a window of one second or less is not measured over a single segment."""
+    eeg_data = np.random.default_rng(4).standard_normal((4, 256))
+    spectra, _ = segment_spectra(eeg_data, 256)
+    assert spectra.shape[1] >= 2
+    assert upper_triangle(connectivity_matrix(eeg_data, 256, "wpli")).max() < 1.0
+    with pytest.raises(ValueError):
+        segment_spectra(eeg_data, 256, segment=256)
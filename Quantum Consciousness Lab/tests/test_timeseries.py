@@ -0,0 +1,123 @@
+import pytest
+import numpy as np
+from database.timeseries import ArraySource, EEGTimeseriesWriter, FileSink, InfluxSource, TileReader, flux_string, iter_chunks, line_protocol, sample_times_ns
+
+def test_line_protocol_wide():
+    """Tests one line per sample with one field per channel at ns precision."""
+    data = np.array([[1.5, -2.0, 3.25], [0.1, 0.2, 0.3]])
+    times = sample_times_ns(1_700_000_000_000_000_000, 0, 3, 1000)
+    lines = line_protocol(data, times).decode().splitlines()
+    assert lines[0] == "eeg ch0=1.5,ch1=0.1 1700000000000000000"
+    assert lines[2] == "eeg ch0=3.25,ch1=0.3 1700000000002000000"
+
+def test_line_protocol_round_trips_and_skips_non_finite():
+    """Tests float64 round-trips and that NaN/inf samples are left out instead of breaking the batch."""
+    data = np.array([[1 / 3, np.nan, 2.0], [np.pi, np.nan, np.inf]])
+    lines = line_protocol(data, sample_times_ns(0, 0, 3, 1000)).decode().splitlines()
+    assert len(lines) == 2
+    values = dict(field.split("=") for field in lines[0].split(" ")[1].split(","))
+    assert float(values["ch0"]) == 1 / 3 and float(values["ch1"]) == np.pi
+    assert lines[1] == "eeg ch0=2.0 2000000"
+    tagged = line_protocol(data, sample_times_ns(0, 0, 3, 1000), layout="tagged").decode()
+    assert "nan" not in tagged and "inf" not in tagged
+    assert len(tagged.splitlines()) == 3
+
+def test_line_protocol_tagged():
+    data = np.random.rand(4, 10)
+    lines = line_protocol(data, sample_times_ns(0, 0, 10, 256), layout="tagged").decode().splitlines()
+    assert len(lines) == 40
+    assert lines[10].startswith("eeg,channel=ch1 amplitude=")
+
+def test_writer_batches_to_file_sink(tmp_path):
+    """Tests chunked writes to a local file sink."""
+    eeg_data = np.random.rand(4, 1000)
+    sfreq = 256
+    writer = EEGTimeseriesWriter(FileSink(str(tmp_path / "eeg.lp")), batch_rows=300)
+    stats = writer.write(eeg_data, sfreq, start_ns=0)
+    assert stats["rows"] == 1000
+    assert stats["batches"] == 4
+    assert stats["rows_per_sec"] > 0
+    lines = (tmp_path / "eeg.lp").read_text().splitlines()
+    times = sorted(int(line.rsplit(" ", 1)[1]) for line in lines)
+    assert times == sample_times_ns(0, 0, 1000, sfreq).tolist()
+
+def test_writer_retries_failed_batches(tmp_path):
+    """Tests that transient sink errors are retried."""
+    class FlakySink(FileSink):
+        failures = 2
+
+        def write(self, body):
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError("influx unavailable")
+            super().write(body)
+
+    writer = EEGTimeseriesWriter(FlakySink(str(tmp_path / "eeg.lp")), max_pending=1, backoff=0.001)
+    stats = writer.write(np.random.rand(2, 50), 256)
+    assert stats["retries"] == 2
+    assert len((tmp_path / "eeg.lp").read_text().splitlines()) == 50
+
+def test_writer_raises_after_retries(tmp_path):
+    class DownSink:
+        def write(self, body):
+            raise ConnectionError("influx unavailable")
+
+    with pytest.raises(ConnectionError):
+        EEGTimeseriesWriter(DownSink(), retries=1, backoff=0.001).write(np.random.rand(2, 50), 256)
+
+def test_array_source_read_and_chunks():
+    """Tests raw range reads and chunked paging."""
+    eeg_data = np.random.rand(4, 1000)
+    sfreq = 256
+    source = ArraySource(eeg_data, sfreq, start_ns=10**18)
+    times, block = source.read(10**18, 10**18 + 10**9, ["ch2"])
+    assert np.allclose(block, eeg_data[2:3, :256])
+    assert times[1] - times[0] == 3906250
+    chunks = list(iter_chunks(source, 10**18, 10**18 + 4 * 10**9, 10**9))
+    assert np.allclose(np.concatenate([data for _, data in chunks], axis=1), eeg_data)
+
+def test_tile_reader_downsamples_and_caches():
+    """Tests min/max/mean buckets and the tile cache."""
+    eeg_data = np.random.rand(4, 256 * 60)
+    sfreq = 256
+    reader = TileReader(ArraySource(eeg_data, sfreq), tile_points=64)
+    view = reader.read(0, 60 * 10**9, n_points=500)
+    assert view["mean"].shape == (4, len(view["times"]))
+    assert len(view["times"]) <= 500
+    samples = sample_times_ns(0, 0, eeg_data.shape[1], sfreq) // view["bucket_ns"]
+    bucket = samples == view["times"][3] // view["bucket_ns"]
+    assert np.allclose(view["mean"][:, 3], eeg_data[:, bucket].mean(axis=1))
+    assert np.allclose(view["min"][:, 3], eeg_data[:, bucket].min(axis=1))
+    assert np.allclose(view["max"][:, 3], eeg_data[:, bucket].max(axis=1))
+
+    misses = reader.cache.misses
+    assert reader.read(10 * 10**9, 30 * 10**9, n_points=160)["bucket_ns"] == view["bucket_ns"]
+    assert reader.cache.misses == misses
+
+def test_flux_string_escapes():
+    """Tests that names cannot terminate or interpolate into a Flux string."""
+    assert flux_string("ch0") == '"ch0"'
+    assert flux_string('Fp1" or true or "') == '"Fp1\\" or true or \\""'
+    assert flux_string("a\\b${x}") == '"a\\\\b\\${x}"'
+
+class CSVQueryClient:
+    """Client whose query API answers every Flux query with fixed CSV rows."""
+    def __init__(self, rows):
+        self.rows = rows
+    def query_api(self):
+        return self
+    def query_csv(self, flux, org=None, dialect=None):
+        return iter(self.rows)
+
+def test_influx_source_reads_sparse_pivot_as_nan():
+    """Tests that empty cells of a pivoted query, and channels with no column, read as NaN."""
+    rows = [
+        ["", "result", "table", "_time", "_measurement", "ch0", "ch1"],
+        ["", "_result", "0", "2024-01-01T00:00:00Z", "eeg", "1.5", ""],
+        ["", "_result", "0", "2024-01-01T00:00:00.001Z", "eeg", "", "2.5"],
+    ]
+    times, values = InfluxSource(client=CSVQueryClient(rows)).read(0, 1)
+    assert times.tolist() == [1704067200000000000, 1704067200001000000]
+    np.testing.assert_array_equal(values, [[1.5, np.nan], [np.nan, 2.5]])
+    _, values = InfluxSource(client=CSVQueryClient(rows)).read(0, 1, channels=["ch1", "ch2"])
+    np.testing.assert_array_equal(values, [[np.nan, 2.5], [np.nan, np.nan]])
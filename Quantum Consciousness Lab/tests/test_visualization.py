@@ -0,0 +1,44 @@
+import pytest
+import numpy as np
+from scipy.integrate import odeint
+from services.visualization import DelayEmbeddingPCA, delay_embedding_attractor, compute_lyapunov_exponent, compute_lyapunov_exponent_batched, compute_lyapunov_spectrum, lorenz_rhs
+
+def test_batched_lyapunov_matches_reference():
+    """Tests the batched RK4 estimator against the odeint reference."""
+    trajectory = odeint(lambda state, t: lorenz_rhs(np.asarray(state)), [1.0, 1.0, 1.0], np.linspace(0, 10, 300))
+    np.random.seed(0)
+    reference = compute_lyapunov_exponent(trajectory)
+    np.random.seed(0)
+    batched = compute_lyapunov_exponent_batched(trajectory)
+    assert np.isclose(batched, reference, rtol=1e-5)
+
+def test_lyapunov_spectrum():
+    """Tests the tangent-space spectrum of the Lorenz system."""
+    spectrum = compute_lyapunov_spectrum(np.array([1.0, 1.0, 1.0]), n_steps=2000, transient=500)
+    assert spectrum.shape == (3,)
+    assert spectrum[0] > 0
+    assert np.isclose(spectrum.sum(), -(10 + 1 + 8/3), atol=1e-3)
+
+def test_lyapunov_spectrum_batch():
+    spectra = compute_lyapunov_spectrum(np.random.rand(4, 3) + 1, n_steps=200)
+    assert spectra.shape == (4, 3)
+    assert np.all(np.diff(spectra, axis=1) <= 0)
+
+def test_delay_embedding_attractor():
+    """Tests the delay-embedding PCA attractor of an EEG recording."""
+    eeg_data = np.random.rand(4, 5000)
+    sfreq = 256
+    result = delay_embedding_attractor(eeg_data, sfreq, max_points=500)
+    assert result["trajectory"].shape[1] == 3
+    assert len(result["trajectory"]) <= 500
+    assert np.all(np.diff(result["explained_variance_ratio"]) <= 0)
+
+def test_chunked_embedding_sees_every_point():
+    """Tests that streamed chunks embed the same points as the whole signal."""
+    signal = np.random.rand(3, 2000)
+    model = DelayEmbeddingPCA(embedding_dim=5, delay=4, stride=3)
+    for start in range(0, signal.shape[1], 137):
+        model.partial_fit(signal[:, start:start + 137])
+    model.flush()
+    assert model.pca.n_samples_seen_ == len(model.windows(signal))
+    assert model.windows(signal).shape[1:] == (3, 5)
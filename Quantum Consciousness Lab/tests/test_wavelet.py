@@ -0,0 +1,38 @@
+import numpy as np
+import pywt
+from models.wavelet import band_power, band_scales, cwt, scalogram
+
+BANDS = {'delta': (1, 4), 'theta': (4, 8), 'alpha': (8, 12), 'beta': (12, 30), 'gamma': (30, 100)}
+
+def test_chunked_cwt_matches_pywt():
+    """Tests that the chunked FFT transform reproduces pywt.cwt."""
+    eeg_data = np.random.rand(4, 1000)
+    sfreq = 256
+    scales = np.arange(1, 128)
+    expected, freqs = pywt.cwt(eeg_data, scales, 'morl', sampling_period=1/sfreq)
+    coeffs, wavelet_freqs = cwt(eeg_data, scales, 'morl', sampling_period=1/sfreq, chunk=300)
+    assert coeffs.dtype == np.float32
+    assert np.allclose(wavelet_freqs, freqs)
+    assert np.allclose(coeffs, expected, atol=1e-5 * np.abs(expected).max())
+
+def test_band_power_matches_full_transform():
+    eeg_data = np.random.rand(4, 1000)
+    sfreq = 256
+    coeffs, freqs = pywt.cwt(eeg_data, np.arange(1, 128), 'morl', sampling_period=1/sfreq)
+    result = band_power(eeg_data, sfreq, BANDS, chunk=256)
+    for band, (low, high) in BANDS.items():
+        idx = np.logical_and(freqs >= low, freqs <= high)
+        assert np.isclose(result[band], np.mean(np.abs(coeffs[idx])**2))
+    assert all(s.size == 3 for s in band_scales(BANDS, sfreq, per_band=3).values())
+
+def test_decimated_scalogram():
+    """Tests block-averaged float32 power restricted to the band scales."""
+    eeg_data = np.random.rand(4, 1000)
+    sfreq = 256
+    result = scalogram(eeg_data, sfreq, bands={'alpha': (8, 12)}, decimate=10)
+    assert result["power"].dtype == np.float32
+    assert result["power"].shape == (len(result["frequencies"]), 4, 100)
+    assert np.all((result["frequencies"] >= 8) & (result["frequencies"] <= 12))
+    full, _ = pywt.cwt(eeg_data, [27], 'morl')
+    assert np.isclose(scalogram(eeg_data, sfreq, scales=[27], decimate=10)["power"][0, 0, 0],
+                      np.mean(full[0, 0, :10]**2), rtol=1e-5)
@@ -0,0 +1,121 @@
+import asyncio
+import itertools
+import time
+import pytest
+from database.writebehind import WriteBehindBuffer
+
+class Collection:
+    """In-memory collection recording insert_many batches."""
+    def __init__(self, failures: int = 0):
+        self.batches = []
+        self.failures = failures
+
+    def insert_many(self, docs, ordered=True):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("mongo unavailable")
+        self.batches.append(list(docs))
+
+def buffer(collection, **kwargs):
+    return WriteBehindBuffer(collection, id_factory=itertools.count().__next__, **kwargs)
+
+def test_inserts_are_batched():
+    """Tests that queued inserts are written with one insert_many per batch."""
+    collection = Collection()
+    writes = buffer(collection, batch_size=10, max_delay=5.0)
+    ids = [writes.insert({"n": i}) for i in range(25)]
+    assert ids == list(range(25))
+    assert writes.flush(timeout=2.0)
+    assert [len(batch) for batch in collection.batches] == [10, 10, 5]
+    assert writes.stats()["inserted"] == 25
+    assert writes.stats()["pending"] == 0
+
+def test_flushes_after_max_delay():
+    """Tests the time threshold."""
+    collection = Collection()
+    writes = buffer(collection, batch_size=100, max_delay=0.05)
+    writes.insert({"n": 1})
+    time.sleep(0.3)
+    assert len(collection.batches) == 1
+
+def test_failed_batches_are_retried():
+    """Tests that an outage delays writes instead of losing them."""
+    collection = Collection(failures=2)
+    writes = buffer(collection, batch_size=5, max_delay=0.01, retry_delay=0.01)
+    for i in range(5):
+        writes.insert({"n": i})
+    assert writes.flush(timeout=2.0)
+    assert [doc["n"] for doc in collection.batches[0]] == [0, 1, 2, 3, 4]
+    assert writes.stats()["failures"] == 2
+
+def test_insert_async_waits_for_write():
+    collection = Collection()
+    writes = buffer(collection, batch_size=100, max_delay=0.01)
+
+    async def run():
+        return await writes.insert_async({"n": 1}, wait=True)
+
+    assert asyncio.run(run()) == 0
+    assert collection.batches == [[{"n": 1, "_id": 0}]]
+
+def test_full_buffer_refuses_inserts():
+    writes = buffer(Collection(failures=100), batch_size=100, max_delay=10.0, max_pending=3)
+    for i in range(3):
+        writes.insert({"n": i})
+    with pytest.raises(RuntimeError):
+        writes.insert({"n": 3})
+
+class BulkWriteError(Exception):
+    """Stand-in carrying pymongo's BulkWriteError details."""
+    def __init__(self, write_errors):
+        super().__init__("batch op errors occurred")
+        self.details = {"writeErrors": write_errors}
+
+class ValidatingCollection(Collection):
+    """Rejects documents with a "bad" field like a schema validator (code 121)."""
+    def insert_many(self, docs, ordered=True):
+        docs = list(docs)
+        self.batches.append([doc for doc in docs if "bad" not in doc])
+        errors = [{"index": i, "code": 121, "errmsg": "Document failed validation"}
+                  for i, doc in enumerate(docs) if "bad" in doc]
+        if errors:
+            raise BulkWriteError(errors)
+
+def test_invalid_documents_are_dropped():
+    """Tests that a document that can never be written does not block the queue."""
+    collection = ValidatingCollection()
+    writes = buffer(collection, batch_size=10, max_delay=0.01, retry_delay=0.01)
+    writes.insert({"n": 0})
+    bad = writes.insert({"n": 1, "bad": True}, wait=True)
+    writes.insert({"n": 2})
+    assert writes.flush(timeout=2.0)
+    assert [doc["n"] for doc in collection.batches[0]] == [0, 2]
+    with pytest.raises(RuntimeError):
+        bad.result(timeout=1.0)
+    stats = writes.stats()
+    assert stats["dropped"] == 1 and stats["inserted"] == 2 and stats["pending"] == 0
+    assert writes.dead_letters[0]["doc"]["n"] == 1
+
+def test_unretryable_batch_error_isolates_the_document():
+    class RejectingCollection(Collection):
+        def insert_many(self, docs, ordered=True):
+            docs = list(docs)
+            if any("huge" in doc for doc in docs):
+                raise ValueError("document too large")
+            self.batches.append(docs)
+
+    collection = RejectingCollection()
+    writes = buffer(collection, batch_size=10, max_delay=0.01)
+    for doc in ({"n": 0}, {"n": 1, "huge": True}, {"n": 2}):
+        writes.insert(doc)
+    assert writes.flush(timeout=2.0)
+    assert sorted(doc["n"] for batch in collection.batches for doc in batch) == [0, 2]
+    assert writes.stats()["dropped"] == 1
+
+def test_retries_are_capped():
+    writes = buffer(Collection(failures=100), batch_size=10, max_delay=0.01, retry_delay=0.01, max_retries=3)
+    future = writes.insert({"n": 0}, wait=True)
+    assert writes.flush(timeout=2.0)
+    with pytest.raises(RuntimeError):
+        future.result(timeout=1.0)
+    assert writes.stats()["failures"] == 4